@@ -8,6 +8,21 @@ import math
 import keyboard
 import json
 import os
+import sys
+
+# リポジトリ直下の共通モジュールを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cancellation import StopSignal
+from click_backends import backend_names, create_backend
+from json_store import DebouncedJsonWriter
+from pacing import PacingScheduler, format_report
+
+# クリック中の座標表示を更新する最短間隔（秒）。短い間隔のクリックで GUI のイベントが溢れないようにする
+PROGRESS_INTERVAL = 0.1
+
+# 指定できる最短のクリック間隔（秒）。これより短いとスケジューラが間隔を保てない
+MIN_INTERVAL = 0.001
 
 class AutoClickerApp:
     def __init__(self, root):
@@ -19,6 +34,13 @@ class AutoClickerApp:
         # 変数の初期化
         self.is_clicking = False
         self.click_thread = None
+        # 緊急停止でクリック間の待機をすぐに中断する
+        self.stop_signal = StopSignal()
+        # クリック間隔を刻むスケジューラ（クリック速度と間隔の誤差の表示にも使う）
+        self.pacer = None
+        # クリックの送信方式（開始時に開き、終了時に閉じる）と、方式ごとの前回のクリック速度（設定した間隔で刻んだ実測値）
+        self.click_backend = None
+        self.backend_rates = {}
         self.circle_x = 200
         self.circle_y = 200
         self.circle_radius = 30
@@ -34,6 +56,12 @@ class AutoClickerApp:
         # 座標データファイルのパス
         self.positions_file = "AutoClicker/positions.json"
         
+        # 連続編集をまとめてバックグラウンドで保存する
+        self.positions_writer = DebouncedJsonWriter(
+            self.positions_file, self.positions_snapshot,
+            on_written=self.on_positions_written, on_error=self.on_positions_save_error,
+            call_on_ui=lambda callback: self.root.after(0, callback))
+        
         # 保存された座標を読み込み
         self.load_positions()
         
@@ -87,6 +115,8 @@ class AutoClickerApp:
             
     def emergency_stop(self):
         """緊急停止"""
+        # GUI の処理より先にクリックスレッドを止める
+        self.stop_signal.request()
         try:
             stopped_something = False
             
@@ -335,6 +365,20 @@ Ctrl+Shift+Z: 緊急停止  |  ESC: 緊急停止
         click_mode_combo.grid(row=1, column=1, padx=(0, 20), pady=(10, 0), sticky=tk.W)
         click_mode_combo.set("sequence")
         
+        # クリック速度（直近1秒の実測値と、予定時刻からの遅れの分布）
+        ttk.Label(click_frame, text="クリック速度:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.rate_label = ttk.Label(click_frame, text="-")
+        self.rate_label.grid(row=2, column=1, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # 送信方式（auto: Linux では XTest → uinput → pyautogui の順に使えるものを選ぶ）
+        ttk.Label(click_frame, text="送信方式:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.backend_var = tk.StringVar(value="auto")
+        backend_combo = ttk.Combobox(click_frame, textvariable=self.backend_var,
+                                     values=backend_names(), width=15, state="readonly")
+        backend_combo.grid(row=3, column=1, padx=(0, 20), pady=(10, 0), sticky=tk.W)
+        self.backend_rates_label = ttk.Label(click_frame, text="前回の速度: -")
+        self.backend_rates_label.grid(row=3, column=2, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
         # ボタンフレーム
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=7, column=0, columnspan=2, pady=(15, 0))
@@ -364,7 +408,7 @@ Ctrl+Shift+Z: 緊急停止  |  ESC: 緊急停止
 6. クリックモードを選択：
    - single: 現在選択中の座標のみクリック
    - sequence: 座標リストの順番でクリック
-7. クリック間隔と回数を設定
+7. クリック間隔と回数を設定（間隔は 0.001 秒まで指定可能）
 8. 「クリック開始」ボタンで自動クリック開始 (または F6)
 9. 緊急停止方法：
    - マウスを画面左上隅に移動
@@ -709,8 +753,8 @@ Ctrl+Shift+Z: 緊急停止  |  ESC: 緊急停止
             count = int(self.count_var.get())
             click_mode = self.click_mode_var.get()
             
-            if interval <= 0:
-                messagebox.showerror("エラー", "クリック間隔は0より大きい値を入力してください")
+            if interval < MIN_INTERVAL:
+                messagebox.showerror("エラー", f"クリック間隔は{MIN_INTERVAL}秒以上の値を入力してください")
                 return
                 
             if count < 0:
@@ -721,20 +765,54 @@ Ctrl+Shift+Z: 緊急停止  |  ESC: 緊急停止
                 messagebox.showerror("エラー", "シーケンスモードでは座標を追加してください")
                 return
                 
+            try:
+                self.click_backend = create_backend(self.backend_var.get())
+            except OSError as e:
+                messagebox.showerror("エラー", f"送信方式を開けません: {e}")
+                return
+                
             self.is_clicking = True
+            self.stop_signal.reset()
             self.start_btn.config(state="disabled")
             self.stop_btn.config(state="normal")
             
+            # 開始時刻からの締め切りで刻むので、クリックにかかった時間で間隔がずれない
+            self.pacer = PacingScheduler(interval, self.stop_signal)
+            self._update_rate_label()
+            
             # 別スレッドでクリック実行
-            self.click_thread = threading.Thread(target=self.click_worker, args=(interval, count, click_mode))
+            self.click_thread = threading.Thread(target=self.click_worker,
+                                                 args=(interval, count, click_mode, self.pacer, self.click_backend))
             self.click_thread.daemon = True
             self.click_thread.start()
             
         except ValueError:
             messagebox.showerror("エラー", "正しい数値を入力してください")
             
+    def _update_rate_label(self):
+        """1秒ごとにクリック速度の表示を更新"""
+        if self.pacer is None:
+            return
+        self.rate_label.config(text=format_report(self.pacer.snapshot()))
+        if self.is_clicking:
+            self.root.after(1000, self._update_rate_label)
+            
+    def _update_backend_rates_label(self):
+        """方式ごとの前回のクリック速度を表示（方式の最高速度ではなく、設定した間隔で実際に出た速度）"""
+        rates = " / ".join(f"{name}: {rate:,.0f} 回/秒" for name, rate in self.backend_rates.items())
+        self.backend_rates_label.config(text=f"前回の速度: {rates or '-'}")
+            
+    def _show_progress(self, text):
+        """クリック中の座標表示を更新（PROGRESS_INTERVAL 秒に1回まで）"""
+        now = time.perf_counter()
+        if now - self._progress_at < PROGRESS_INTERVAL:
+            return
+        self._progress_at = now
+        self.root.after(0, lambda: self.coord_label.config(text=text))
+            
     def stop_clicking(self):
         """自動クリックを停止"""
+        self.stop_signal.request()
         self.is_clicking = False
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
@@ -768,66 +846,83 @@ Ctrl+Shift+Z: 緊急停止  |  ESC: 緊急停止
             self.coordinate_sets = {}
             
     def save_positions(self):
-        """座標リストを保存"""
-        try:
-            data = {
-                'positions': self.positions,
-                'coordinate_sets': self.coordinate_sets
-            }
-            with open(self.positions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"座標を保存しました: {len(self.positions)}個")
-            print(f"座標セットを保存しました: {len(self.coordinate_sets)}個")
-        except Exception as e:
-            print(f"座標保存エラー: {e}")
-            messagebox.showerror("エラー", f"座標の保存に失敗しました: {str(e)}")
+        """座標リストを保存（少し待ってからバックグラウンドで書き込む）"""
+        self.positions_writer.schedule()
+    
+    def positions_snapshot(self):
+        """positions.json に書き込む内容"""
+        return {
+            'positions': self.positions,
+            'coordinate_sets': self.coordinate_sets
+        }
+    
+    def on_positions_written(self, path):
+        """座標の書き込み完了（保存スレッドから呼ばれる）"""
+        print(f"座標を保存しました: {len(self.positions)}個")
+        print(f"座標セットを保存しました: {len(self.coordinate_sets)}個")
+    
+    def on_positions_save_error(self, error):
+        """座標の書き込み失敗（保存スレッドから呼ばれる）"""
+        print(f"座標保存エラー: {error}")
+        self.root.after(0, lambda: messagebox.showerror("エラー", f"座標の保存に失敗しました: {str(error)}"))
 
-    def click_worker(self, interval, count, click_mode):
-        """クリック処理を実行するワーカースレッド"""
+    def click_worker(self, interval, count, click_mode, pacer, backend):
+        """クリック処理を実行するワーカースレッド（pacer / backend はこの実行専用のもの）"""
         try:
             clicks_done = 0
             position_index = 0
+            pacer.start()
+            self._progress_at = 0.0
+            # pyautogui 以外はフェイルセーフ（画面左上隅）を確認しないので、一定間隔で確認する
+            failsafe_at = 0.0
             
             while self.is_clicking:
-                # 停止チェックを頻繁に行う
-                if not self.is_clicking:
+                if count > 0 and clicks_done >= count:
                     break
                     
-                if count > 0 and clicks_done >= count:
+                # 次の締め切りまで待つ（停止要求があればすぐに抜ける）
+                if not pacer.wait():
                     break
                     
+                if backend.name != "pyautogui" and pyautogui.FAILSAFE:
+                    now = time.perf_counter()
+                    if now - failsafe_at >= PROGRESS_INTERVAL:
+                        failsafe_at = now
+                        pyautogui.failSafeCheck()
+                    
                 if click_mode == "single":
-                    pyautogui.click(self.circle_x, self.circle_y)
+                    backend.click(self.circle_x, self.circle_y)
+                    self.stop_signal.input_sent()
                     clicks_done += 1
                     if count > 0:
-                        self.root.after(0, lambda: self.coord_label.config(
-                            text=f"クリック中: {clicks_done}/{count} - 座標: ({self.circle_x}, {self.circle_y})"))
+                        self._show_progress(f"クリック中: {clicks_done}/{count} - 座標: ({self.circle_x}, {self.circle_y})")
                     else:
-                        self.root.after(0, lambda: self.coord_label.config(
-                            text=f"クリック中: {clicks_done}回目 - 座標: ({self.circle_x}, {self.circle_y})"))
+                        self._show_progress(f"クリック中: {clicks_done}回目 - 座標: ({self.circle_x}, {self.circle_y})")
                             
                 elif click_mode == "sequence":
                     if len(self.positions) > 0:
                         x, y = self.positions[position_index]
-                        pyautogui.click(x, y)
+                        backend.click(x, y)
+                        self.stop_signal.input_sent()
                         clicks_done += 1
                         position_index = (position_index + 1) % len(self.positions)
                         if count > 0:
-                            self.root.after(0, lambda: self.coord_label.config(
-                                text=f"クリック中: {clicks_done}/{count} - 座標{position_index+1}: ({x}, {y})"))
+                            self._show_progress(f"クリック中: {clicks_done}/{count} - 座標{position_index+1}: ({x}, {y})")
                         else:
-                            self.root.after(0, lambda: self.coord_label.config(
-                                text=f"クリック中: {clicks_done}回目 - 座標{position_index+1}: ({x}, {y})"))
-                
-                # 間隔を短く分割して停止チェックを頻繁に行う
-                for _ in range(int(interval * 10)):  # 0.1秒ごとにチェック
-                    if not self.is_clicking:
-                        break
-                    time.sleep(0.1)
+                            self._show_progress(f"クリック中: {clicks_done}回目 - 座標{position_index+1}: ({x}, {y})")
                     
         except Exception as e:
             messagebox.showerror("エラー", f"クリック中にエラーが発生しました: {str(e)}")
         finally:
+            # すぐに停止→開始された場合は self.pacer / self.click_backend が次の実行のものになっている
+            report = pacer.summary()
+            print(f"クリック速度（{backend.name}）: {format_report(report)}")
+            backend.close()
+            self.backend_rates[backend.name] = report.rate
+            self.root.after(0, self._update_backend_rates_label)
+            latency = self.stop_signal.stop_latency()
+            if latency is not None:
+                print(f"停止遅延: {latency * 1000:.1f} ms（停止要求から最後のクリックまで）")
             # GUIスレッドでボタン状態を更新
             self.root.after(0, self.stop_clicking)
             self.root.after(0, lambda: self.coord_label.config(text=f"現在の座標: ({self.circle_x}, {self.circle_y}) - 座標数: {len(self.positions)}"))
@@ -835,6 +930,7 @@ Ctrl+Shift+Z: 緊急停止  |  ESC: 緊急停止
 def main():
     # pyautoguiの設定
     pyautogui.FAILSAFE = True  # マウスを画面の左上隅に移動すると停止
+    pyautogui.PAUSE = 0  # クリックごとの既定の0.1秒の待機を無効にする（間隔は PacingScheduler で刻む）
     
     root = tk.Tk()
     app = AutoClickerApp(root)
@@ -843,6 +939,8 @@ def main():
     def on_closing():
         app.stop_clicking()
         app.cancel_position_selection()
+        # 予約中の座標データを書き出す
+        app.positions_writer.close()
         # ショートカットキーを削除
         try:
             keyboard.remove_hotkey('f6')
@@ -0,0 +1,121 @@
+"""
+クリックの送信方式
+pyautogui.click はクリックごとにポインタの移動・フェイルセーフ確認・押下/解放を Python の何層もの処理で送るので、
+Linux では XTest / uinput に接続を開いたまま、移動+押下+解放を1回の送信にまとめる方式を選べるようにする
+
+    xvfb-run python click_backends.py    # 使える方式ごとのクリック速度を表示
+"""
+
+import os
+import sys
+
+# リポジトリ直下の共通モジュールを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyautogui
+
+from linux_input import BTN_LEFT, EV_ABS, EV_KEY, ABS_X, ABS_Y, SYN, UInputDevice, XTestDisplay, pack_events
+
+
+class PyAutoGuiBackend:
+    """pyautogui.click（どの OS でも使える）"""
+
+    name = "pyautogui"
+
+    def click(self, x, y):
+        pyautogui.click(x, y)
+
+    def close(self):
+        pass
+
+
+class XTestBackend:
+    """XTest で移動・押下・解放を送り、1回の XFlush でまとめて X サーバーに届ける"""
+
+    name = "xtest"
+
+    def __init__(self):
+        self.display = XTestDisplay()
+
+    def click(self, x, y):
+        display = self.display
+        display.move(x, y)
+        display.button(1, True)
+        display.button(1, False)
+        display.flush()
+
+    def close(self):
+        self.display.close()
+
+
+class UInputBackend:
+    """uinput の仮想マウス（絶対座標）に移動・押下・解放を1回の write で送る"""
+
+    name = "uinput"
+
+    def __init__(self):
+        self.device = UInputDevice([BTN_LEFT], abs_size=pyautogui.size())
+        self.press = pack_events([(EV_KEY, BTN_LEFT, 1), SYN, (EV_KEY, BTN_LEFT, 0), SYN])
+
+    def click(self, x, y):
+        # 移動と押下は別のフレームにして、アプリが押下より先に移動を受け取るようにする
+        self.device.write(pack_events([(EV_ABS, ABS_X, int(x)), (EV_ABS, ABS_Y, int(y)), SYN]) + self.press)
+
+    def close(self):
+        self.device.close()
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PyAutoGuiBackend, XTestBackend, UInputBackend)
+}
+# "auto" で試す順番（使えなければ次の方式）
+AUTO_ORDER = ("xtest", "uinput", "pyautogui")
+
+
+def backend_names():
+    """選択肢（この OS で使える可能性のある方式）"""
+    if sys.platform.startswith("linux"):
+        return ("auto",) + AUTO_ORDER
+    return ("auto", "pyautogui")
+
+
+def create_backend(name="auto"):
+    """送信方式を開く（指定した方式が使えない場合は OSError、auto なら使える方式に順に切り替える）"""
+    if name != "auto":
+        if name not in BACKENDS:
+            raise OSError(f"不明な送信方式です: {name}")
+        return BACKENDS[name]()
+    for candidate in AUTO_ORDER if sys.platform.startswith("linux") else ("pyautogui",):
+        try:
+            return BACKENDS[candidate]()
+        except OSError as e:
+            print(f"送信方式 {candidate} は使えません: {e}")
+    return PyAutoGuiBackend()
+
+
+def _benchmark(clicks=2000):
+    import time
+
+    pyautogui.PAUSE = 0
+    pyautogui.FAILSAFE = False
+    width, height = pyautogui.size()
+    print(f"画面 {width}x{height}、各 {clicks} 回のクリック（間隔なし）")
+    for name in AUTO_ORDER:
+        try:
+            backend = create_backend(name)
+        except OSError as e:
+            print(f"{name:>10}: 使えません（{e}）")
+            continue
+        try:
+            start = time.perf_counter()
+            for i in range(clicks):
+                backend.click(100 + i % 200, 100 + i % 100)
+            elapsed = time.perf_counter() - start
+        finally:
+            backend.close()
+        print(f"{name:>10}: {clicks / elapsed:>10,.0f} 回/秒（1回 {elapsed / clicks * 1e6:.1f} µs）")
+
+
+if __name__ == "__main__":
+    _benchmark()
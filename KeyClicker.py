@@ -1,12 +1,22 @@
 import tkinter as tk
 from tkinter import messagebox
 import threading
-import time
 import pyautogui
-import pygetwindow as gw  # 追加
 import platform
 
-# Linux の場合は fast_input を使って uinput から直接送信できる
+# pygetwindow は Windows / macOS 以外では読み込み時に NotImplementedError になる
+# （Linux では fast_input の最高速モードとアクティブウィンドウの追跡を使う）
+try:
+    import pygetwindow as gw  # 追加
+except (ImportError, NotImplementedError):
+    gw = None
+
+from cancellation import StopSignal
+from focus_tracker import FocusTracker
+from key_program import compile_key_program, parse_key_program
+from pacing import PacingScheduler, format_report
+
+# Linux の場合は fast_input を使って uinput / XTest から直接送信できる
 try:
     from fast_input import FastKeySender
     FAST_INPUT_AVAILABLE = True
@@ -22,10 +32,17 @@ class KeyRepeaterApp:
         self.master.title("キー連打アプリ")
         self.running = False
         self.repeat_thread = None
-        self.target_title = None  # 追加: 連打対象ウィンドウタイトル
+        self.target_window = None  # 追加: 連打対象ウィンドウ
+        # アクティブウィンドウの変化は専用スレッドで追跡し、送信ループはその値を読むだけにする
+        # （実行ごとに作り直す。X11 では _NET_ACTIVE_WINDOW の変化を待つ。問い合わせは pygetwindow が使える環境のみ）
+        self.focus_tracker = None
+        # 停止ボタンで送信間の待機をすぐに中断する
+        self.stop_signal = StopSignal()
+        # 送信間隔を絶対時刻の締め切りで刻む（速度とジッタの表示にも使う）
+        self.pacer = PacingScheduler(0, self.stop_signal)
 
         # キー入力欄
-        tk.Label(master, text="連打したいキー（例: a, space, enter）").pack(pady=5)
+        tk.Label(master, text="連打したいキー（例: a, space, ctrl+c, a:0.1, wait 0.5, enter*3）").pack(pady=5)
         self.key_entry = tk.Entry(master, width=20)
         self.key_entry.pack(pady=5)
 
@@ -36,26 +53,26 @@ class KeyRepeaterApp:
         self.stop_btn.pack(side="left", padx=10, pady=10)
 
         # 間隔設定
-        tk.Label(master, text="連打間隔（秒）").pack(pady=5)
+        tk.Label(master, text="連打間隔（秒、最高速モードでは 0 で上限なし）").pack(pady=5)
         self.interval_entry = tk.Entry(master, width=10)
         self.interval_entry.insert(0, "0.05")
         self.interval_entry.pack(pady=5)
 
         # 最高速オプション（Linux uinput）
         self.fast_mode_var = tk.BooleanVar(value=False)
-        cb_text = "最高速モード (uinput, Linux のみ)"
+        cb_text = "最高速モード (uinput / XTest, Linux のみ)"
         self.fast_mode_cb = tk.Checkbutton(master, text=cb_text, variable=self.fast_mode_var)
         self.fast_mode_cb.pack(pady=5)
 
         # クリック数表示
-        self.click_count = 0
         self.clicks_label = tk.Label(master, text="送信数: 0 / 秒")
         self.clicks_label.pack(pady=5)
+        self.latency_label = tk.Label(master, text="停止遅延: - ms")
+        self.latency_label.pack(pady=5)
 
-    def repeater(self, keys, interval):
-        idx = 0
-        change_count = 0
-        last_title = None
+    def repeater(self, steps, interval, tracker):
+        """キーを送信するワーカースレッド（tracker はこの実行専用のもの）"""
+        keys = tuple(dict.fromkeys(key for step in steps for key in step.keys))
         # for fast mode
         use_fast = bool(self.fast_mode_var.get()) and FAST_INPUT_AVAILABLE and platform.system().lower() == 'linux'
         fast_sender = None
@@ -64,60 +81,89 @@ class KeyRepeaterApp:
                 fast_sender = FastKeySender(keys)
             except Exception as e:
                 # 失敗したらフォールバック
+                print(f"最高速モードを使えないため pyautogui で送信します: {e}")
                 use_fast = False
                 fast_sender = None
 
+        # 手順を開始からの時刻ごとのイベントに1回だけコンパイルし、送信方式の形にしておく
+        # pyautogui 経由: システム安定のため手順の間は最短1フレームに制限
+        # 最高速: 入力した間隔で刻む（0 なら1巡分をまとめて待たずに送り続ける）
+        program = compile_key_program(steps, interval if use_fast else max(interval, 1.0 / 60.0))
+        if use_fast:
+            frames = program.frames(fast_sender.compile_events)
+        else:
+            frames = program.frames(
+                lambda events: tuple((pyautogui.keyDown if down else pyautogui.keyUp, key) for key, down in events))
+        frame_index = 0
+        held = frozenset()  # 押したままのキー（停止時に離す）
+        self.pacer.set_interval(program.period)
+        self.pacer.start()
+
         # 1回目のウィンドウ変更で連打開始、2回目で停止
-        while self.running:
-            try:
-                win = gw.getActiveWindow()
-                current_title = win.title if win else None
-            except Exception:
-                current_title = None
-
-            # ウィンドウタイトルが変わったらカウント
-            if current_title != last_title:
-                if last_title is not None:
-                    change_count += 1
-                last_title = current_title
-
-                # 1回目の変更で連打対象を記録
-                if change_count == 1:
-                    self.target_title = current_title
-
-                # 2回目の変更で停止
-                elif change_count == 2:
-                    self.running = False
-                    self.master.after(0, self.stop_repeater)
+        while self.running and not self.stop_signal.stopped:
+            # 変化の回数と今のウィンドウ（追跡スレッドが更新した値を読むだけ）
+            change_count, current_window = tracker.state
+
+            # 1回目の変更で連打対象を記録（アクティブウィンドウがない間は待つ）
+            if change_count == 1 and self.target_window is None and current_window is not None:
+                self.target_window = current_window
+
+            # 2回目の変更で停止
+            elif change_count >= 2:
+                self.running = False
+                self.master.after(0, self.stop_repeater)
+                break
+
+            # 連打対象ウィンドウのときだけキー送信（送信直前に停止要求を確認する）
+            if self.stop_signal.stopped:
+                break
+            if change_count == 1 and current_window == self.target_window:
+                delay, payload, after = frames[frame_index]
+                if not self.pacer.wait(delay):
                     break
-
-            # 連打対象ウィンドウのときだけキー送信
-            if self.target_title and current_title == self.target_title:
-                if use_fast and fast_sender is not None:
-                    # 最高速: uinput で可能な限り速く送信（sleep しない、ただし time.sleep(0) でスケジューリング）
-                    fast_sender.press(keys[idx])
-                    idx = (idx + 1) % len(keys)
-                    self.click_count += 1
-                    # 最小限のイールド
-                    time.sleep(0)
+                if use_fast:
+                    fast_sender.send(payload)
                 else:
-                    # pyautogui 経由: システム安定のため最短1フレームに制限
-                    min_interval = 1.0 / 60.0
-                    sleep_time = max(interval, min_interval)
-                    pyautogui.press(keys[idx])
-                    idx = (idx + 1) % len(keys)
-                    self.click_count += 1
-                    time.sleep(sleep_time)
+                    for send, key in payload:
+                        send(key)
+                self.stop_signal.input_sent()
+                held = after
+                frame_index = (frame_index + 1) % len(frames)
             else:
-                time.sleep(0.05)
-
-        # クリーンアップ
+                # 押し続けているキーは対象外のウィンドウに入力しないよう離しておく
+                held = self._release_keys(held, fast_sender)
+                self.stop_signal.sleep(0.01)
+                # 対象外のウィンドウにいた間の分は取り戻さない
+                self.pacer.resync()
+
+        # クリーンアップ（すぐに停止→開始された場合は self.focus_tracker が次の実行のものになっている）
+        tracker.stop()
+        self._release_keys(held, fast_sender)
         if fast_sender is not None:
             try:
                 fast_sender.close()
             except Exception:
                 pass
 
+    def _active_window_title(self):
+        """X11 以外でアクティブウィンドウを問い合わせる（追跡スレッドから一定間隔で呼ばれる）"""
+        win = gw.getActiveWindow()
+        return win.title if win else None
+
+    def _release_keys(self, keys, fast_sender):
+        """押したままのキーを離す（離した後の押したままのキーを返す）"""
+        if not keys:
+            return keys
+        try:
+            if fast_sender is not None:
+                fast_sender.send(fast_sender.compile_events([(key, False) for key in keys]))
+            else:
+                for key in keys:
+                    pyautogui.keyUp(key)
+        except Exception as e:
+            print(f"キーを離せませんでした: {e}")
+        return frozenset()
+
     def start_repeater(self):
         key_input = self.key_entry.get().strip()
         try:
@@ -130,28 +176,46 @@ class KeyRepeaterApp:
             messagebox.showerror("エラー", "キーを入力してください")
             return
 
-        # カンマ区切りでキーを分割し、空白を除去
-        keys = [k.strip() for k in key_input.split(",") if k.strip()]
-        if not keys:
-            messagebox.showerror("エラー", "有効なキーを入力してください")
+        # カンマ区切りの手順（キー・同時押し・押す時間・繰り返し・待ち）を解釈
+        try:
+            steps = parse_key_program(key_input)
+        except ValueError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+
+        # 今のアクティブウィンドウを基準に変化の追跡を始める
+        tracker = FocusTracker(self._active_window_title if gw is not None else None)
+        try:
+            tracker.start()
+        except OSError as e:
+            messagebox.showerror("エラー", f"アクティブウィンドウを追跡できません: {e}")
             return
+        self.focus_tracker = tracker
 
         self.running = True
-        self.target_title = None  # 連打対象ウィンドウタイトルをリセット
+        self.stop_signal.reset()
+        self.target_window = None  # 連打対象ウィンドウをリセット
         self.start_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
         self.key_entry.config(state="disabled")
         self.interval_entry.config(state="disabled")
         self.fast_mode_cb.config(state="disabled")
-        # クリックカウンタの更新を開始
-        self.click_count = 0
+        # 送信速度の表示の更新を開始
+        self.pacer.start()
         self._update_clicks_label()
-        self.repeat_thread = threading.Thread(target=self.repeater, args=(keys, interval), daemon=True)
+        self.repeat_thread = threading.Thread(target=self.repeater, args=(steps, interval, tracker),
+                                            daemon=True)
         self.repeat_thread.start()
         # 注意ウィンドウは表示しない
 
     def stop_repeater(self):
+        self.stop_signal.request()
         self.running = False
+        if self.repeat_thread is not None and self.repeat_thread is not threading.current_thread():
+            self.repeat_thread.join(timeout=1)
+        latency = self.stop_signal.stop_latency()
+        if latency is not None:
+            self.latency_label.config(text=f"停止遅延: {latency * 1000:.1f} ms")
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
         self.key_entry.config(state="normal")           # 入力欄を有効化
@@ -159,10 +223,8 @@ class KeyRepeaterApp:
         self.fast_mode_cb.config(state="normal")
 
     def _update_clicks_label(self):
-        # 1秒ごとにラベルを更新してカウンタをリセット
-        count = self.click_count
-        self.clicks_label.config(text=f"送信数: {count} / 秒")
-        self.click_count = 0
+        # 1秒ごとに直近1秒の送信速度とジッタを表示
+        self.clicks_label.config(text=f"送信数: {format_report(self.pacer.snapshot())}")
         if self.running:
             self.master.after(1000, self._update_clicks_label)
 
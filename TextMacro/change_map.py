@@ -0,0 +1,132 @@
+"""
+タイル単位の変化検出
+共有フレームを固定サイズのタイルに分割してタイルごとのチェックサムを NumPy でまとめて計算し、
+変化したタイルに掛かる矩形だけを OCR 対象にする
+"""
+
+import numpy as np
+
+
+class TileChangeMap:
+    """フレームのタイルチェックサムと、矩形 -> タイルの対応表
+
+    rects はフレーム原点からの相対座標 (x, y, width, height) のリスト。
+    """
+
+    def __init__(self, width, height, rects, tile=32, seed=0x5EED):
+        if tile % 8:
+            raise ValueError("tile は8の倍数で指定してください")
+        self.tile = tile
+        self.width = width
+        self.height = height
+        self.cols = -(-width // tile)
+        self.rows = -(-height // tile)
+        self._seed = seed
+        self._weights = None
+        self._previous = None
+
+        # 矩形 -> タイル番号の対応を1本の配列に詰めておき、判定は reduceat 1回で済ませる
+        indices = []
+        offsets = []
+        for x, y, w, h in rects:
+            c0, c1 = max(x, 0) // tile, min(x + w - 1, width - 1) // tile
+            r0, r1 = max(y, 0) // tile, min(y + h - 1, height - 1) // tile
+            offsets.append(len(indices))
+            for r in range(r0, r1 + 1):
+                indices.extend(range(r * self.cols + c0, r * self.cols + c1 + 1))
+        self._tile_index = np.asarray(indices, dtype=np.intp)
+        self._offsets = np.asarray(offsets, dtype=np.intp)
+
+    def _weights_for(self, words_per_row):
+        # 位置ごとに異なる奇数の重みを掛けて、タイル内で画素が入れ替わった場合も検出する
+        if self._weights is None or self._weights.shape[1] != words_per_row:
+            rng = np.random.default_rng(self._seed)
+            weights = rng.integers(0, 2 ** 63, size=(self.tile, words_per_row), dtype=np.uint64)
+            self._weights = (weights << np.uint64(1)) | np.uint64(1)
+        return self._weights
+
+    def checksums(self, frame):
+        """タイルごとのチェックサム (rows, cols) を計算"""
+        frame = np.ascontiguousarray(frame)
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+        pad_h = self.rows * self.tile - frame.shape[0]
+        pad_w = self.cols * self.tile - frame.shape[1]
+        if pad_h or pad_w:
+            frame = np.pad(frame, ((0, pad_h), (0, pad_w), (0, 0)))
+        channels = frame.shape[2]
+        # 1行分のバイト列を uint64 として読み替える（tile が8の倍数なので割り切れる）
+        words_per_row = self.tile * channels // 8
+        words = frame.reshape(self.rows * self.tile, -1).view(np.uint64)
+        words = words.reshape(self.rows, self.tile, self.cols, words_per_row)
+        weights = self._weights_for(words_per_row)
+        return (words * weights[None, :, None, :]).sum(axis=(1, 3), dtype=np.uint64)
+
+    def update(self, frame):
+        """フレームを取り込み、変化したタイルのマスクを返す（比較できない場合は None）"""
+        if frame.shape[:2] != (self.height, self.width):
+            # 画面端で切れた等でサイズが違うフレームは比較せず、次のフレームを基準にする
+            self._previous = None
+            return None
+        sums = self.checksums(frame)
+        previous, self._previous = self._previous, sums
+        if previous is None:
+            return None
+        return (sums != previous).ravel()
+
+    def tile_rect(self, number):
+        """タイル番号の矩形 (x, y, width, height)（フレーム原点からの相対座標）"""
+        row, col = divmod(int(number), self.cols)
+        return (col * self.tile, row * self.tile, self.tile, self.tile)
+
+    def changed_rects(self, changed_tiles):
+        """タイルの変化マスクから、各矩形が変化したかの bool 配列を返す"""
+        if not len(self._offsets):
+            return np.zeros(0, dtype=bool)
+        return np.logical_or.reduceat(changed_tiles[self._tile_index], self._offsets)
+
+
+def _benchmark(region_counts=(10, 100, 200, 500, 1000), repeat=20, width=1920, height=1080):
+    """領域ごとのハッシュとタイル変化マップの1ティックあたりの時間を比べる（tile_min_regions の根拠）"""
+    import time
+    from monitor_engine import image_digest
+
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    # 毎ティック画面の一部（小さな数字1つ分）だけが変わる想定
+    frames = []
+    for i in range(repeat):
+        f = frame.copy()
+        f[500 + i % 10:520, 900:930] = i
+        frames.append(f)
+
+    print(f"フレーム {width}x{height}, タイル 32px, {repeat}ティックの平均")
+    print(f"{'領域数':>8} {'領域ごとのハッシュ':>18} {'タイル変化マップ':>16} {'ハッシュした領域(タイル)':>24}")
+    for count in region_counts:
+        rects = [(int(x), int(y), 40, 30)
+                 for x, y in zip(rng.integers(0, width - 40, count), rng.integers(0, height - 30, count))]
+
+        start = time.perf_counter()
+        for f in frames:
+            for x, y, w, h in rects:
+                image_digest(f[y:y + h, x:x + w])
+        per_region = (time.perf_counter() - start) / repeat * 1000
+
+        # タイル経路は変化マップの更新に加えて、変化したタイルに掛かる領域だけをハッシュする
+        change_map = TileChangeMap(width, height, rects)
+        change_map.update(frame)
+        hashed = 0
+        start = time.perf_counter()
+        for f in frames:
+            changed_rects = change_map.changed_rects(change_map.update(f))
+            for number in np.flatnonzero(changed_rects):
+                x, y, w, h = rects[number]
+                image_digest(f[y:y + h, x:x + w])
+                hashed += 1
+        tiles = (time.perf_counter() - start) / repeat * 1000
+
+        print(f"{count:>8} {per_region:>15.2f} ms {tiles:>13.2f} ms {hashed / repeat:>24.1f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,109 @@
+"""
+設定ファイル監視
+regions.json / config.json の変更を検知してコールバックを呼び出す（watchdog が無ければポーリング）
+"""
+
+import os
+import threading
+
+# watchdogの動的インポート（inotify 等の OS 通知を使う）
+WATCHDOG_AVAILABLE = False
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def file_signature(path):
+    """変更検知用の (mtime_ns, size)。ファイルが無ければ None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        self.watcher.poll_once()
+
+
+class ConfigWatcher:
+    """複数ファイルの変更を監視し、変更されたパスで callback(path) を呼ぶ
+
+    OS 通知は取りこぼしや重複があるため、通知はあくまで再チェックのきっかけとして扱い、
+    実際の変更判定は常に mtime とサイズで行う。
+    """
+
+    def __init__(self, paths, callback, poll_interval=0.5):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self._signatures = {p: file_signature(p) for p in self.paths}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    def start(self):
+        """監視を開始"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        if WATCHDOG_AVAILABLE:
+            try:
+                self._observer = Observer()
+                handler = _ChangeHandler(self)
+                for directory in {os.path.dirname(p) for p in self.paths}:
+                    self._observer.schedule(handler, directory, recursive=False)
+                self._observer.start()
+            except Exception as e:
+                print(f"ファイル監視(watchdog)エラー: {e}")
+                self._observer = None
+        # watchdog があっても低頻度のポーリングは続ける（通知の取りこぼし対策）
+        interval = self.poll_interval if self._observer is None else max(self.poll_interval, 2.0)
+        self._thread = threading.Thread(target=self._poll_loop, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """監視を停止"""
+        self._stop_event.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+        self._thread = None
+
+    def mark_written(self, path):
+        """自分で書き込んだファイルの現在の状態を既知として記録する"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._signatures:
+                self._signatures[path] = file_signature(path)
+
+    def poll_once(self):
+        """全ファイルを1回チェック"""
+        changed = []
+        with self._lock:
+            for path in self.paths:
+                signature = file_signature(path)
+                if signature is not None and signature != self._signatures[path]:
+                    changed.append(path)
+                self._signatures[path] = signature
+        for path in changed:
+            try:
+                self.callback(path)
+            except Exception as e:
+                print(f"設定再読み込みエラー: {e}")
+
+    def _poll_loop(self, interval):
+        while not self._stop_event.wait(interval):
+            self.poll_once()
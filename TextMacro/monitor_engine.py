@@ -0,0 +1,821 @@
+"""
+監視エンジン
+コンパイル済み領域セットを1ティックずつ評価する。領域セットはティックの合間に差し替えられる
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from change_map import TileChangeMap
+from pixel_check import PixelBatch
+from region_model import RATE_WINDOW, ReadKey, Rect, group_contained_rects, normalize_text, parse_number
+from rule_engine import ConditionNode, walk_nodes
+from spatial_index import GridIndex, cluster_rects
+
+
+def image_digest(image):
+    """キャプチャ画像の内容ハッシュ（OCR結果キャッシュのキー）"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(str(image.shape).encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.digest()
+
+
+def union_rect(rects):
+    """矩形群を囲む最小の矩形"""
+    left = min(r.x for r in rects)
+    top = min(r.y for r in rects)
+    right = max(r.x + r.width for r in rects)
+    bottom = max(r.y + r.height for r in rects)
+    return Rect(left, top, right - left, bottom - top)
+
+
+# 矩形ごとに覚えておく「確信度は十分だがトリガーしなかった」画像の数
+NEGATIVE_CACHE_SIZE = 16
+
+
+def words_in_rect(words, origin, rect):
+    """外側の矩形の OCR 単語のうち、中心が rect 内にあるものを返す
+
+    words は外側の矩形を原点とした (文字列, left, top, width, height, 確信度) のリスト。
+    """
+    left = rect.x - origin.x
+    top = rect.y - origin.y
+    right = left + rect.width
+    bottom = top + rect.height
+    picked = []
+    for word in words:
+        cx = word[1] + word[3] / 2
+        cy = word[2] + word[4] / 2
+        if left <= cx < right and top <= cy < bottom:
+            picked.append(word)
+    return picked
+
+
+def words_text(words):
+    """単語リストを監視で照合する文字列にする"""
+    return " ".join(word[0] for word in words)
+
+
+def words_confidence(words):
+    """単語の確信度の最小値（0〜100、単語が無ければ None）"""
+    return min((word[5] for word in words), default=None)
+
+
+def crop(frame, origin, rect):
+    """共有フレームから矩形部分を切り出す（コピーしない）"""
+    x = rect.x - origin.x
+    y = rect.y - origin.y
+    return frame[y:y + rect.height, x:x + rect.width]
+
+
+class RegionState:
+    """矩形ごとの実行時状態（直前の画像ハッシュと OCR 結果）"""
+
+    __slots__ = ("digest", "text", "normalized", "number", "confidence", "negatives", "seen", "changed")
+
+    def __init__(self):
+        self.digest = None  # OCR 結果に対応する画像ハッシュ
+        self.seen = None  # 最後にキャプチャした画像ハッシュ（OCR を遅延した場合は digest と異なる）
+        self.changed = False  # このティックで seen が変わったか（ルールの changed 条件用）
+        self.text = ""
+        self.normalized = ""
+        self.number = None  # OCR 結果から取り出した数値（数値条件の判定用、OCR 結果が変わった時だけ解析）
+        self.confidence = None  # 単語の確信度の最小値（不明なら None）
+        self.negatives = None  # 画像ハッシュ -> 単語リスト（トリガーしなかった確信度の高い結果）
+
+    def set_text(self, text, confidence=None):
+        self.text = text
+        self.normalized = normalize_text(text)
+        self.number = parse_number(self.normalized)
+        self.confidence = confidence
+
+    def set_words(self, words):
+        self.set_text(words_text(words), words_confidence(words))
+
+    def remember_negative(self, digest, words):
+        if self.negatives is None:
+            self.negatives = OrderedDict()
+        self.negatives[digest] = words
+        self.negatives.move_to_end(digest)
+        while len(self.negatives) > NEGATIVE_CACHE_SIZE:
+            self.negatives.popitem(last=False)
+
+    def recall_negative(self, digest):
+        if not self.negatives:
+            return None
+        words = self.negatives.get(digest)
+        if words is not None:
+            self.negatives.move_to_end(digest)
+        return words
+
+
+class TriggerState:
+    """領域（またはルール）ごとのトリガーの状態機械"""
+
+    __slots__ = ("level", "last_fire", "recent")
+
+    def __init__(self):
+        self.level = False  # 前回の判定結果
+        self.last_fire = None  # 最後に実行した時刻
+        self.recent = None  # 最大頻度の判定用に、直近 RATE_WINDOW 秒の実行時刻
+
+    def step(self, policy, matched, now):
+        """判定結果を1つ進め、"fire" / "suppress" / "cooldown" / "rate_limited" / None を返す"""
+        previous, self.level = self.level, matched
+        if policy.mode == "rising":
+            edge = matched and not previous
+        elif policy.mode == "falling":
+            edge = previous and not matched
+        else:
+            edge = matched
+        if not edge:
+            # 一致が続いているだけなので実行しない
+            return "suppress" if matched else None
+        if policy.cooldown and self.last_fire is not None and now - self.last_fire < policy.cooldown:
+            return "cooldown"
+        if policy.max_rate is not None:
+            if self.recent is None:
+                self.recent = deque()
+            while self.recent and now - self.recent[0] >= RATE_WINDOW:
+                self.recent.popleft()
+            if len(self.recent) >= policy.max_rate:
+                return "rate_limited"
+            self.recent.append(now)
+        self.last_fire = now
+        return "fire"
+
+
+# 変化したタイルがこの数以下なら空間インデックスで逆引きし、多い場合は全矩形のマスクをまとめて計算する
+INDEX_MAX_TILES = 64
+
+
+class CaptureGroup:
+    """1回のスクリーンキャプチャで読む範囲と、その中の矩形"""
+
+    __slots__ = ("rect", "groups", "change_map", "index", "visited", "pixel_regions", "pixels")
+
+    def __init__(self, rect, groups, change_map=None, pixel_regions=()):
+        self.rect = rect
+        self.groups = groups  # 外側の ReadKey -> (含まれる ReadKey, ...)
+        self.change_map = change_map
+        self.index = None
+        if change_map is not None:
+            # 変化したタイルから、掛かっている外側の矩形を逆引きする（キャプチャ内の相対座標）
+            self.index = GridIndex(cell=change_map.tile * 4)
+            for key in groups:
+                self.index.insert((key.rect.x - rect.x, key.rect.y - rect.y, key.rect.width, key.rect.height), key)
+        # 前のティックで調べた外側の矩形（変化したままか OCR 待ちなら、タイルが変わらなくても次も調べる）
+        self.visited = groups
+        # ピクセル領域（OCR せず、キャプチャ内の全ての点をまとめて判定する）
+        self.pixel_regions = pixel_regions
+        self.pixels = None
+        if pixel_regions:
+            self.pixels = PixelBatch([(region.pixels, region.rect.x - rect.x, region.rect.y - rect.y)
+                                      for region in pixel_regions])
+
+    def keys_at_tiles(self, tiles):
+        """タイルの変化マスクから、変化したタイルに掛かる外側の ReadKey の集合を返す"""
+        numbers = np.flatnonzero(tiles)
+        if len(numbers) > INDEX_MAX_TILES:
+            mask = self.change_map.changed_rects(tiles)
+            keys = list(self.groups)
+            return {keys[i] for i in np.flatnonzero(mask)}
+        found = set()
+        for number in numbers:
+            found.update(self.index.query(self.change_map.tile_rect(number)))
+        return found
+
+
+def group_contained_keys(keys):
+    """ReadKey を OCR 設定ごとに包含関係でまとめる（設定が違う矩形の結果は共有しない）"""
+    by_profile = {}
+    for key in keys:
+        by_profile.setdefault(key.profile, []).append(key.rect)
+    groups = {}
+    for profile, rects in by_profile.items():
+        for outer, inner in group_contained_rects(rects).items():
+            groups[ReadKey(outer, profile)] = tuple(ReadKey(rect, profile) for rect in inner)
+    return groups
+
+
+class CapturePlan:
+    """有効なセット群から作るティックごとの処理計画（セット構成が変わるまで再利用）"""
+
+    __slots__ = ("sets", "keys", "groups", "captures", "region_count", "saved_per_tick", "required",
+                 "outer_of", "lazy", "rule_keys")
+
+    def __init__(self, sets, share_contained=True, tile_min_regions=None, tile_size=32, capture_gap=None):
+        self.sets = sets
+        references = []
+        pixel_regions = []
+        count = 0
+        for compiled in sets:
+            for region in compiled.regions:
+                count += 1
+                if region.pixels is not None:
+                    pixel_regions.append(region)
+                    continue
+                references.append(region.key)
+                if region.compare_key is not None:
+                    references.append(region.compare_key)
+        # 同じ矩形・同じ OCR 設定はセットをまたいでも1回だけキャプチャ・OCRする
+        self.keys = tuple(dict.fromkeys(references))
+        if share_contained:
+            # 他の矩形に含まれる矩形は、外側の OCR 結果（単語の位置）から切り出す
+            self.groups = group_contained_keys(self.keys)
+        else:
+            self.groups = {key: () for key in self.keys}
+        self.region_count = count
+        # 共有しなかった場合と比べて1ティックあたりに省ける OCR 回数
+        self.saved_per_tick = len(references) - len(self.groups)
+        # 外側の矩形ごとの、結果を否定キャッシュに入れてよい確信度（関係する領域の最大の下限）
+        outer_of = self.outer_of = {}
+        for outer, inner in self.groups.items():
+            outer_of[outer] = outer
+            for inner_key in inner:
+                outer_of[inner_key] = outer
+        self.required = dict.fromkeys(self.groups, 0)
+        for compiled in sets:
+            for region in compiled.regions:
+                if region.pixels is not None:
+                    continue
+                for key in (region.key, region.compare_key):
+                    if key is not None:
+                        outer = outer_of[key]
+                        self.required[outer] = max(self.required[outer], region.min_confidence)
+
+        # ルールからしか参照されない矩形は、ルールが必要とした時だけ OCR する
+        eager = {outer_of[key] for compiled in sets for region in compiled.regions
+                 if not region.passive and region.pixels is None
+                 for key in (region.key, region.compare_key) if key is not None}
+        self.lazy = frozenset(outer for outer in self.groups if outer not in eager)
+        self.rule_keys = frozenset(key for compiled in sets for rule in compiled.rules for key in rule.keys)
+
+        # 離れた場所にある領域群は全体を囲む1枚ではなく、近いものごとにキャプチャする
+        keys_by_rect = {}
+        for key in self.groups:
+            keys_by_rect.setdefault(key.rect, []).append(key)
+        pixels_by_rect = {}
+        for region in pixel_regions:
+            keys_by_rect.setdefault(region.rect, [])
+            pixels_by_rect.setdefault(region.rect, []).append(region)
+        outer_rects = list(keys_by_rect)
+        if not outer_rects:
+            clusters = []
+        elif capture_gap is None:
+            clusters = [(union_rect(outer_rects), outer_rects)]
+        else:
+            clusters = cluster_rects(outer_rects, gap=capture_gap)
+        # 矩形が多い場合は領域ごとのハッシュの前にタイル単位で変化を絞り込む
+        use_tiles = tile_min_regions is not None and len(self.groups) >= tile_min_regions
+        captures = []
+        for bbox, members in clusters:
+            rect = Rect(*bbox)
+            groups = {key: self.groups[key] for outer in members for key in keys_by_rect[outer]}
+            change_map = None
+            if use_tiles and groups:
+                local = [(k.rect.x - rect.x, k.rect.y - rect.y, k.rect.width, k.rect.height) for k in groups]
+                change_map = TileChangeMap(rect.width, rect.height, local, tile=tile_size)
+            pixels = tuple(region for outer in members for region in pixels_by_rect.get(outer, ()))
+            captures.append(CaptureGroup(rect, groups, change_map, pixels))
+        self.captures = tuple(captures)
+
+
+# TriggerState.step の結果 -> 統計のキー
+TRIGGER_STATS = {"fire": "fires", "suppress": "suppressed", "cooldown": "cooldowns", "rate_limited": "rate_limited"}
+
+
+class MonitorEngine:
+    """監視ループ1回分の処理を担当するエンジン
+
+    capture(bbox) -> 画像配列、recognize(image, language, profile) -> 文字列、
+    on_trigger(region) -> アクション実行、log(message) -> スレッドセーフなログ出力
+    """
+
+    def __init__(self, capture, recognize, on_trigger, log, workers=1, recognize_words=None,
+                 share_contained=True, tile_min_regions=500, capture_gap=64, recognize_batch=None,
+                 clock=time.monotonic):
+        self.capture = capture
+        self.recognize = recognize
+        # recognize_words(image, language, profile) -> [(文字列, left, top, width, height, 確信度0〜100), ...]
+        # 指定されている場合は確信度による判定と否定キャッシュを使い、
+        # share_contained なら包含される矩形の OCR を外側の1回にまとめる
+        self.recognize_words = recognize_words
+        # recognize_batch(images, language, profile) -> 画像ごとの単語リスト
+        # 指定されている場合はティック内の OCR を OCR 設定ごとに1回の呼び出しにまとめる
+        # （画像全体を1行として読むので、包含される矩形の共有は行わない）
+        self.recognize_batch = recognize_batch
+        self.share_contained = share_contained and recognize_words is not None and recognize_batch is None
+        self.on_trigger = on_trigger
+        self.log = log
+        self.clock = clock
+        self.workers = max(1, int(workers))
+        # 外側の矩形がこの数以上ならタイル変化マップを使う（None で無効）
+        self.tile_min_regions = tile_min_regions
+        # この距離以内で近接する領域を1回のキャプチャにまとめる（None で全体を1回）
+        self.capture_gap = capture_gap
+        self._pool = None
+
+        self.sets = {}  # セット名 -> CompiledRegionSet（監視開始時に全セットをコンパイル済み）
+        self.active = None  # ホットキーで切り替える主セット
+        self.concurrent = ()  # 主セットと同時に監視するセット
+        self._pending_sets = None
+        self._pending_active = None
+        self._pending_concurrent = None
+        self._swap_lock = threading.Lock()
+        self._states = {}  # ReadKey -> RegionState（全セットで共有）
+        self._language = None
+        self._plan = None
+        # 以下の3つは領域・ルール・ノードの ident をキーにし、別の領域を編集した再読み込みでも引き継ぐ
+        self._history = {}  # 領域 -> 直近フレームの一致履歴（ビット列、最下位が最新）
+        self._last_values = {}  # 領域 / ルールの数値条件ノード -> 前回読み取った数値（変化量の条件用）
+        self._fresh = []  # このティックで OCR した (外側の矩形, 画像ハッシュ, 単語リスト)
+        self._failed = set()  # このティックで OCR に失敗した ReadKey（その矩形を読む領域は判定しない）
+        self._failing = set()  # OCR の失敗をログに出した外側の ReadKey（成功するまで再度は出さない）
+        self._deferred = {}  # 外側の ReadKey -> このティックで遅延している OCR ジョブ
+        self._rule_memo = {}  # ルールのノード -> このティックの評価結果
+        self._pixels = {}  # ピクセル領域 -> このティックで範囲内だった点の割合
+        self._triggers = {}  # 領域 / ルール -> TriggerState
+
+        self.stats = {"ticks": 0, "ocr_calls": 0, "cache_hits": 0, "ocr_saved": 0, "tile_skips": 0, "captures": 0,
+                      "negative_hits": 0, "low_confidence": 0, "batches": 0, "ocr_errors": 0,
+                      "unconfirmed": 0, "lazy_ocr": 0, "lazy_skips": 0, "pixel_points": 0,
+                      "fires": 0, "suppressed": 0, "cooldowns": 0, "rate_limited": 0, "swaps": 0, "switches": 0}
+        self.set_stats = {}  # セット名 -> {"evaluations": n, "triggers": n}
+
+    @property
+    def compiled(self):
+        """現在アクティブな主セット"""
+        return self.sets.get(self.active)
+
+    def enabled_names(self):
+        """このティックで評価するセット名（主セットが先頭）"""
+        names = [self.active] if self.active is not None else []
+        names.extend(name for name in self.concurrent if name != self.active)
+        return [name for name in names if name in self.sets]
+
+    # ===== 領域セットの差し替え =====
+    def load(self, sets, active, concurrent=()):
+        """監視開始前に領域セットを設定する"""
+        with self._swap_lock:
+            self._pending_sets = None
+            self._pending_active = None
+            self._pending_concurrent = None
+            self._install(sets)
+            self.active = active
+            self.concurrent = tuple(concurrent)
+            self._plan = None
+            self.set_stats = {}
+
+    def swap(self, sets, active=None):
+        """実行中の領域セットを差し替える（次のティック開始時に反映）"""
+        with self._swap_lock:
+            self._pending_sets = sets
+            if active is not None:
+                self._pending_active = active
+
+    def switch(self, name):
+        """アクティブな領域セットを切り替える（次のティック開始時に反映）
+
+        切り替え先がコンパイル済みでなければ False を返す。
+        """
+        with self._swap_lock:
+            sets = self._pending_sets if self._pending_sets is not None else self.sets
+            if name not in sets:
+                return False
+            self._pending_active = name
+            return True
+
+    def set_concurrent(self, names):
+        """主セットと同時に監視するセットを設定する（次のティック開始時に反映）"""
+        with self._swap_lock:
+            self._pending_concurrent = tuple(names)
+
+    def _apply_pending(self):
+        with self._swap_lock:
+            sets, self._pending_sets = self._pending_sets, None
+            active, self._pending_active = self._pending_active, None
+            concurrent, self._pending_concurrent = self._pending_concurrent, None
+            if sets is not None:
+                self._install(sets)
+                self._plan = None
+                self.stats["swaps"] += 1
+                self.log(f"監視領域を再読み込みしました ({len(sets)}セット)")
+            if active is not None and active != self.active and active in self.sets:
+                self.active = active
+                self._plan = None
+                self.stats["switches"] += 1
+                self.log(f"監視領域セットを '{active}' に切り替えました")
+            if concurrent is not None and concurrent != self.concurrent:
+                self.concurrent = concurrent
+                self._plan = None
+                self.log(f"同時監視セット: {', '.join(concurrent) if concurrent else 'なし'}")
+
+    def _install(self, sets):
+        # 座標が変わらなかった領域のキャッシュは引き継ぐ（非アクティブなセットの分も保持して温めておく）
+        live = set()
+        for compiled in sets.values():
+            for region in compiled.regions:
+                live.add(region.key)
+                if region.compare_key is not None:
+                    live.add(region.compare_key)
+        self._states = {key: state for key, state in self._states.items() if key in live}
+        # 一致履歴・前回値・トリガーの状態は識別子が残っているものだけ引き継ぐ
+        owners = {region.ident for compiled in sets.values() for region in compiled.regions}
+        self._history = {ident: bits for ident, bits in self._history.items() if ident in owners}
+        # 数値条件の前回値は領域かルールのノードごとに持つ
+        owners.update(node.ident for compiled in sets.values() for rule in compiled.rules
+                      for node in walk_nodes(rule.root) if isinstance(node, ConditionNode))
+        self._last_values = {ident: value for ident, value in self._last_values.items() if ident in owners}
+        owners.update(rule.ident for compiled in sets.values() for rule in compiled.rules)
+        self._triggers = {ident: state for ident, state in self._triggers.items() if ident in owners}
+        self.sets = sets
+
+    def _state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = RegionState()
+        return state
+
+    def current_plan(self):
+        """有効なセット群の処理計画"""
+        plan = self._plan
+        if plan is None:
+            plan = self._plan = CapturePlan([self.sets[name] for name in self.enabled_names()],
+                                            share_contained=self.share_contained,
+                                            tile_min_regions=self.tile_min_regions,
+                                            capture_gap=self.capture_gap)
+        return plan
+
+    def shutdown(self):
+        """OCR ワーカーを終了"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    # ===== 認識 =====
+    def _apply_words(self, key, inner, words):
+        self._states[key].set_words(words)
+        for inner_key in inner:
+            self._states[inner_key].set_words(words_in_rect(words, key.rect, inner_key.rect))
+
+    def _recognize_into(self, key, inner, image, digest, language):
+        state = self._states[key]
+        # 領域の OCR 設定で言語が指定されていればそちらを使う
+        language = key.profile.language or language
+        if self.recognize_words is not None:
+            words = self.recognize_words(image, language, key.profile)
+            self._apply_words(key, inner, words)
+            self._fresh.append((key, digest, words))
+        else:
+            state.set_text(self.recognize(image, language, key.profile))
+        state.digest = digest
+
+    def _run_job(self, job, language):
+        try:
+            self._recognize_into(*job, language)
+        except Exception as error:
+            self._ocr_failed(job, error)
+        else:
+            self._failing.discard(job[0])
+
+    def _ocr_failed(self, job, error):
+        """OCR に失敗した矩形は状態を変えず、このティックではその矩形を読む領域を判定しない"""
+        key, inner = job[0], job[1]
+        self.stats["ocr_errors"] += 1
+        self._failed.add(key)
+        self._failed.update(inner)
+        if key not in self._failing:
+            self._failing.add(key)
+            rect = key.rect
+            self.log(f"OCRエラー ({rect.x}, {rect.y}, {rect.width}x{rect.height}): {error}")
+
+    def _recognize_batched(self, jobs, language):
+        by_profile = {}
+        for job in jobs:
+            by_profile.setdefault(job[0].profile, []).append(job)
+        for profile, group in by_profile.items():
+            try:
+                results = self.recognize_batch([job[2] for job in group], profile.language or language, profile)
+            except Exception as error:
+                for job in group:
+                    self._ocr_failed(job, error)
+                continue
+            self.stats["batches"] += 1
+            for (key, inner, image, digest), words in zip(group, results):
+                self._apply_words(key, inner, words)
+                self._states[key].digest = digest
+                self._fresh.append((key, digest, words))
+                self._failing.discard(key)
+
+    def read_frame(self, plan, language):
+        """キャプチャ範囲ごとに画面を1回ずつキャプチャし、変化した矩形だけを OCR する"""
+        jobs = []
+        self._fresh = []
+        self._failed = set()
+        self._deferred = {}
+        self._pixels = {}
+        for capture in plan.captures:
+            self._collect_jobs(capture, jobs, plan)
+        self.stats["ocr_saved"] += plan.saved_per_tick
+        if not jobs:
+            return
+        self.stats["ocr_calls"] += len(jobs)
+        if self.recognize_batch is not None:
+            self._recognize_batched(jobs, language)
+            return
+        if self.workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                self._run_job(job, language)
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        futures = [self._pool.submit(self._recognize_into, *job, language) for job in jobs]
+        # 失敗の記録はこのスレッドで行う（1つの OCR の失敗で他の領域の判定を止めない）
+        for job, future in zip(jobs, futures):
+            try:
+                future.result()
+            except Exception as error:
+                self._ocr_failed(job, error)
+            else:
+                self._failing.discard(job[0])
+
+    def _collect_jobs(self, capture, jobs, plan):
+        frame_rect = capture.rect
+        frame = self.capture((frame_rect.x, frame_rect.y,
+                              frame_rect.x + frame_rect.width, frame_rect.y + frame_rect.height))
+        self.stats["captures"] += 1
+        if capture.pixels is not None:
+            ratios = capture.pixels.evaluate(frame)
+            if ratios is not None:
+                self._pixels.update(zip(capture.pixel_regions, ratios))
+                self.stats["pixel_points"] += capture.pixels.count
+        groups = capture.groups
+        changed = None
+        visit = groups
+        if capture.change_map is not None:
+            tiles = capture.change_map.update(frame)
+            if tiles is not None:
+                # 変化したタイルに掛かる矩形と、前のティックで変化したか OCR 待ちだった矩形だけを調べる
+                changed = capture.keys_at_tiles(tiles)
+                visit = changed.union(key for key in capture.visited if self._pending(key))
+                skipped = len(groups) - len(visit)
+                self.stats["tile_skips"] += skipped
+                self.stats["cache_hits"] += skipped
+        capture.visited = visit
+        for key in visit:
+            inner = groups[key]
+            state = self._state(key)
+            for inner_key in inner:
+                self._state(inner_key)
+            if changed is not None and key not in changed and state.seen is not None:
+                # 掛かっているタイルが前のフレームから変わっていない
+                self.stats["tile_skips"] += 1
+                state.changed = False
+                for inner_key in inner:
+                    self._states[inner_key].changed = False
+                if state.digest == state.seen:
+                    self.stats["cache_hits"] += 1
+                    continue
+                # 遅延していた OCR がまだ済んでいない
+                image = crop(frame, frame_rect, key.rect)
+                digest = state.seen
+            else:
+                image = crop(frame, frame_rect, key.rect)
+                digest = image_digest(image)
+                state.changed = digest != state.seen
+                state.seen = digest
+                for inner_key in inner:
+                    if inner_key in plan.rule_keys:
+                        self._see_inner(frame, frame_rect, inner_key, state.changed)
+                if digest == state.digest:
+                    self.stats["cache_hits"] += 1
+                    continue
+            words = state.recall_negative(digest)
+            if words is not None:
+                # 以前トリガーしなかった画像に戻っただけなので OCR し直さない
+                self._apply_words(key, inner, words)
+                state.digest = digest
+                self.stats["negative_hits"] += 1
+            elif key in plan.lazy:
+                self._deferred[key] = (key, inner, image, digest)
+            else:
+                jobs.append((key, inner, image, digest))
+
+    def _pending(self, key):
+        """タイルが変わらなくても次のティックで調べる必要がある矩形か"""
+        state = self._states.get(key)
+        return state is None or state.changed or state.digest != state.seen
+
+    def _see_inner(self, frame, frame_rect, key, outer_changed):
+        # ルールが変化を見る内側の矩形は、外側が変わった時だけ自分の範囲をハッシュする
+        state = self._states[key]
+        if not outer_changed and state.seen is not None:
+            state.changed = False
+            return
+        digest = image_digest(crop(frame, frame_rect, key.rect))
+        state.changed = digest != state.seen
+        state.seen = digest
+
+    def read(self, key):
+        """矩形のこのティックの状態（遅延していた OCR が必要ならここで実行する）"""
+        job = self._deferred.pop(self._plan.outer_of[key], None)
+        if job is not None:
+            self.stats["ocr_calls"] += 1
+            self.stats["lazy_ocr"] += 1
+            if self.recognize_batch is not None:
+                self._recognize_batched([job], self._language)
+            else:
+                self._run_job(job, self._language)
+        return self._state(key)
+
+    def pixel_ratio(self, region):
+        """ピクセル領域のこのティックの範囲内の点の割合（判定できなかった場合は None）"""
+        return self._pixels.get(region)
+
+    def changed(self, key):
+        """矩形の画像が前のティックから変わったか（OCR しない）"""
+        return self._state(key).changed
+
+    def rule_value(self, node):
+        """ルールのノードを評価する（同じノードは1ティックに1回だけ）"""
+        value = self._rule_memo.get(node)
+        if value is None:
+            value = self._rule_memo[node] = node.compute(self)
+        return value
+
+    def last_value(self, owner, value):
+        """数値条件の前回値を返し、今回の値を記録する"""
+        previous = self._last_values.get(owner.ident)
+        self._last_values[owner.ident] = value
+        return previous
+
+    def result(self, key):
+        """このティックの OCR 結果 (原文, 正規化済み)"""
+        state = self._state(key)
+        return state.text, state.normalized
+
+    # ===== ティック =====
+    def tick(self, language, is_running):
+        """有効な全セットの領域を1回評価する"""
+        self._apply_pending()
+        if language != self._language:
+            # 言語が変わったら以前の OCR 結果は使えない（タイルの比較も最初からやり直す）
+            self._states.clear()
+            self._language = language
+            self._plan = None
+        self.stats["ticks"] += 1
+
+        plan = self.current_plan()
+        if not plan.captures:
+            return
+        self.read_frame(plan, language)
+
+        multiple = len(plan.sets) > 1
+        fired = set()
+        self._rule_memo = {}
+        for compiled in plan.sets:
+            stats = self.set_stats.setdefault(compiled.name, {"evaluations": 0, "triggers": 0})
+            prefix = f"{compiled.name}/" if multiple else ""
+            for region in compiled.regions:
+                if region.passive:
+                    continue
+                if not is_running():
+                    return
+                stats["evaluations"] += 1
+                if self.evaluate(region, prefix):
+                    stats["triggers"] += 1
+                    fired.add(region.key)
+                    fired.add(region.compare_key)
+                    self.on_trigger(region)
+            for rule in compiled.rules:
+                if not is_running():
+                    return
+                stats["evaluations"] += 1
+                matched = self.rule_value(rule.root)
+                if not self._failed.isdisjoint(rule.keys):
+                    continue
+                if self._trigger(rule, matched):
+                    stats["triggers"] += 1
+                    fired.update(rule.keys)
+                    state = "成立" if matched else "不成立になりました"
+                    self.log(f"[{prefix}{rule.name}] ルールが{state} → アクション実行")
+                    self.on_trigger(rule)
+        # ルールの評価で不要だった OCR
+        self.stats["lazy_skips"] += len(self._deferred)
+        self._deferred = {}
+        self._remember_negatives(plan, fired)
+
+    def _remember_negatives(self, plan, fired):
+        """確信度が十分で、どの領域もトリガーしなかった OCR 結果を否定キャッシュに入れる"""
+        for key, digest, words in self._fresh:
+            if key in fired or any(inner in fired for inner in plan.groups.get(key, ())):
+                continue
+            state = self._states.get(key)
+            if state is None:
+                continue
+            confidence = state.confidence
+            if confidence is not None and confidence < plan.required.get(key, 0):
+                continue
+            state.remember_negative(digest, words)
+        self._fresh = []
+
+    def _confident(self, key, minimum):
+        confidence = self._state(key).confidence
+        return confidence is None or confidence >= minimum
+
+    def evaluate(self, region, prefix=""):
+        """領域のアクションをこのティックで実行するか判定する"""
+        if region.key in self._failed or region.compare_key in self._failed:
+            # OCR に失敗した領域は一致履歴・前回値・トリガーの状態を変えない
+            return False
+        name = prefix + region.name
+        message = self._match(region, name)
+        matched = message is not None
+        if region.confirm_frames > 1:
+            confirmed = self._confirm(region, matched)
+            if matched and not confirmed:
+                self.stats["unconfirmed"] += 1
+            matched = confirmed
+        if not self._trigger(region, matched):
+            return False
+        self.log(message if matched else f"[{name}] 一致しなくなりました → アクション実行")
+        return True
+
+    def _trigger(self, owner, matched):
+        """トリガー方式・クールダウン・最大頻度を適用して、実行するかを返す"""
+        policy = owner.trigger
+        if policy is None:
+            result = "fire" if matched else None
+        else:
+            state = self._triggers.get(owner.ident)
+            if state is None:
+                state = self._triggers[owner.ident] = TriggerState()
+            result = state.step(policy, matched, self.clock())
+        if result is None:
+            return False
+        self.stats[TRIGGER_STATS[result]] += 1
+        return result == "fire"
+
+    def _confirm(self, region, matched):
+        """直近 confirm_window フレームのうち confirm_frames フレーム以上一致しているか
+
+        一致履歴はビット列で持つので、OCR 結果のキャッシュをそのまま使い追加の OCR は発生しない。
+        """
+        mask = (1 << region.confirm_window) - 1
+        history = ((self._history.get(region.ident, 0) << 1) | matched) & mask
+        self._history[region.ident] = history
+        return matched and bin(history).count("1") >= region.confirm_frames
+
+    def _match(self, region, name):
+        """一致した場合はログに出すメッセージ、しなければ None"""
+        if region.pixels is not None:
+            ratio = self.pixel_ratio(region)
+            if ratio is not None and ratio >= region.pixels.ratio:
+                return f"[{name}] ピクセルの色が一致: {ratio * 100:.0f}% ({region.pixels.label}) → アクション実行"
+            return None
+
+        detected_text, detected = self.result(region.key)
+
+        if region.condition is not None:
+            # 数値条件（OCR 結果が変わった時に解析済みの数値で比較する）
+            value = self._state(region.key).number
+            previous = self.last_value(region, value)
+            if value is not None and region.condition.test(value, previous) and self._gate(region, name, region.key):
+                return f"[{name}] 数値が条件を満たしました: {value:g} ({region.condition.label}) → アクション実行"
+            if region.compare_key is None:
+                return None
+
+        if region.compare_key is None:
+            # 通常のターゲット文字列照合
+            if region.matches(detected) and self._gate(region, name, region.key):
+                return f"[{name}] 文字が一致: '{detected_text}' → アクション実行"
+            return None
+
+        # 比較領域が設定されている場合は、両方のOCR結果で一致判定
+        cmp_text, cmp_normalized = self.result(region.compare_key)
+        if detected and detected == cmp_normalized:
+            if not self._gate(region, name, region.key, region.compare_key):
+                return None
+            return f"[{name}] 比較領域と一致: '{detected_text}' == '{cmp_text}' -> アクション実行"
+        if not region.compare_trigger_only and region.matches(detected):
+            # 比較は有効だがターゲット文字列も指定されている場合はそれでも判定する
+            if not self._gate(region, name, region.key):
+                return None
+            return f"[{name}] 文字が一致: '{detected_text}' → アクション実行"
+        return None
+
+    def _gate(self, region, name, *keys):
+        """一致した結果の確信度が領域の下限以上か（下限未満なら実行しない）"""
+        if not region.min_confidence or all(self._confident(key, region.min_confidence) for key in keys):
+            return True
+        self.stats["low_confidence"] += 1
+        confidence = min(c for c in (self._state(key).confidence for key in keys) if c is not None)
+        self.log(f"[{name}] 一致しましたが確信度が低いため実行しません ({confidence:.0f} < {region.min_confidence:g})")
+        return False
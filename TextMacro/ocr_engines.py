@@ -0,0 +1,190 @@
+"""
+OCR エンジン呼び出し
+領域ごとの OCR 設定（前処理・拡大・Tesseract オプション）を適用して Tesseract / EasyOCR を呼ぶ
+GUI と OCR 設定の自動調整（ocr_tuner.py）で共通に使う
+"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+# Tesseractの動的インポート
+TESSERACT_AVAILABLE = False
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    pytesseract = None
+
+# Windowsでの一般的なTesseractパス
+TESSERACT_PATHS = [
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+    r'C:\Users\{}\AppData\Local\Programs\Tesseract-OCR\tesseract.exe'.format(os.environ.get('USERNAME', '')),
+]
+
+
+def configure_tesseract():
+    """Tesseract の実行ファイルを探して動作確認する
+
+    見つかったパス（PATH 上の既定のものを使う場合は空文字列）を返す。使えない場合は例外を送出。
+    """
+    test_img = Image.new('RGB', (100, 30), color='white')
+    for path in TESSERACT_PATHS:
+        if os.path.exists(path):
+            pytesseract.pytesseract.tesseract_cmd = path
+            pytesseract.image_to_string(test_img)
+            return path
+    pytesseract.image_to_string(test_img)
+    return ""
+
+
+# ===== 前処理 =====
+def _gray(image):
+    if image.ndim == 2:
+        return image
+    rgb = image[:, :, :3].astype(np.float32)
+    return (rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.uint8)
+
+
+def _invert(image):
+    return 255 - image
+
+
+def _binary(image):
+    # 大津の方法でしきい値を決めて2値化
+    gray = _gray(image)
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total = weight[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight - mean * total) ** 2 / (weight * (total - weight))
+    threshold = int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+    return np.where(gray > threshold, 255, 0).astype(np.uint8)
+
+
+PREPROCESS_STEPS = {
+    "gray": _gray,
+    "invert": _invert,
+    "binary": _binary,
+}
+
+
+def preprocess_image(image, profile):
+    """OCR 設定の前処理と拡大（最近傍）を適用する"""
+    for step in profile.preprocess:
+        image = PREPROCESS_STEPS[step](image)
+    if profile.scale > 1:
+        image = np.repeat(np.repeat(image, profile.scale, axis=0), profile.scale, axis=1)
+    return np.ascontiguousarray(image)
+
+
+def _rescale_words(words, scale):
+    # 拡大した画像上の座標を元の画像の座標に戻す
+    if scale == 1:
+        return words
+    return [(text, x / scale, y / scale, w / scale, h / scale, confidence)
+            for text, x, y, w, h, confidence in words]
+
+
+# ===== Tesseract =====
+def tesseract_text(image, language, profile):
+    """Tesseract で文字列を認識"""
+    pil_image = Image.fromarray(preprocess_image(image, profile))
+    return pytesseract.image_to_string(pil_image, lang=profile.language or language, config=profile.config).strip()
+
+
+def tesseract_words(image, language, profile):
+    """Tesseract で単語・位置・確信度 [(文字列, left, top, width, height, 確信度0〜100), ...] を認識"""
+    data = pytesseract.image_to_data(Image.fromarray(preprocess_image(image, profile)),
+                                     lang=profile.language or language,
+                                     config=profile.config, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        text = text.strip()
+        if text:
+            words.append((text, data['left'][i], data['top'][i], data['width'][i], data['height'][i],
+                          max(float(data['conf'][i]), 0.0)))
+    return _rescale_words(words, profile.scale)
+
+
+# ===== EasyOCR =====
+def easyocr_text(reader, image, profile):
+    """EasyOCR で文字列を認識（言語は Reader 作成時に固定）"""
+    result = reader.readtext(preprocess_image(image, profile), allowlist=profile.whitelist or None)
+    return ' '.join([item[1] for item in result]).strip()
+
+
+def easyocr_words(reader, image, profile):
+    """EasyOCR で単語・位置・確信度を認識"""
+    words = []
+    for points, text, confidence in reader.readtext(preprocess_image(image, profile),
+                                                    allowlist=profile.whitelist or None):
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        words.append((text, min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys),
+                      float(confidence) * 100))
+    return _rescale_words(words, profile.scale)
+
+
+def easyocr_recognize_batch(reader, images, profile):
+    """文字検出を省略し、各画像を1つのテキスト行として認識器1回でまとめて認識する
+
+    監視領域はすでに文字をぴったり囲んでいるので検出器は不要。戻り値は画像ごとの単語リスト
+    （画像全体を1単語として [(文字列, 0, 0, width, height, 確信度0〜100)] または []）。
+    """
+    greys = [_gray(preprocess_image(image, profile)) for image in images]
+    try:
+        from easyocr import easyocr as easyocr_module
+        from easyocr.recognition import get_text
+        from easyocr.utils import get_image_list
+    except ImportError:
+        get_text = None
+
+    if get_text is None:
+        # 内部関数が使えない版では領域ごとに recognize を呼ぶ（検出は省略される）
+        texts = []
+        for grey in greys:
+            result = reader.recognize(grey, detail=1, allowlist=profile.whitelist or None)
+            texts.append((" ".join(item[1] for item in result), min((item[2] for item in result), default=0.0)))
+    else:
+        img_h = getattr(easyocr_module, "imgH", 64)
+        image_list = []
+        max_width = img_h
+        for index, grey in enumerate(greys):
+            height, width = grey.shape
+            # 座標の代わりに画像の番号を持たせて、結果を元の順に戻す
+            items, item_width = get_image_list([[0, width, 0, height]], [], grey, model_height=img_h,
+                                               sort_output=False)
+            image_list.extend((index, crop) for _, crop in items)
+            max_width = max(max_width, item_width)
+        if profile.whitelist:
+            ignore_char = "".join(set(reader.character) - set(profile.whitelist))
+        else:
+            ignore_char = "".join(set(reader.character) - set(reader.lang_char))
+        texts = [("", 0.0)] * len(greys)
+        if image_list:
+            # CPU でも1回の forward でまとめて推論する（Reader.recognize は CPU では1件ずつ処理する）
+            for index, text, confidence in get_text(reader.character, img_h, int(max_width), reader.recognizer,
+                                                    reader.converter, image_list, ignore_char, 'greedy', 5,
+                                                    len(image_list), 0.1, 0.5, 0.003, 0, reader.device):
+                texts[index] = (text, float(confidence))
+
+    words = []
+    for image, (text, confidence) in zip(images, texts):
+        text = text.strip()
+        words.append([(text, 0, 0, image.shape[1], image.shape[0], confidence * 100)] if text else [])
+    return words
+
+
+def set_torch_threads(threads):
+    """EasyOCR（PyTorch）が使う CPU スレッド数を設定（キャプチャ処理と CPU を取り合わないように）"""
+    try:
+        import torch
+    except ImportError:
+        return False
+    torch.set_num_threads(max(1, int(threads)))
+    return True
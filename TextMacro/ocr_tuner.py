@@ -0,0 +1,297 @@
+"""
+OCR 設定の自動調整
+領域ごとに保存した正解付きサンプル画像で、OCR エンジン・OCR 設定・前処理の組み合わせを総当たりで試し、
+サンプルを全て正しく読めた中で最も速い設定を regions.json に書き戻す
+
+    python ocr_tuner.py                     # 現在のセットの全領域を調整して結果を表示
+    python ocr_tuner.py --region 鉱物コスト --write
+    python ocr_tuner.py --set 戦闘 --repeat 3 --write
+
+サンプルは GUI の「テスト」で保存できる（samples/<セット名>/<領域名>/ に画像と labels.json）
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+# リポジトリ直下の共通モジュールを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_store import atomic_write_json
+from monitor_engine import words_confidence, words_text
+from ocr_engines import TESSERACT_AVAILABLE, configure_tesseract, easyocr_words, tesseract_words
+from region_model import (DEFAULT_OCR_PROFILE, OCR_PRESETS, RegionConfigError, compile_ocr_profile,
+                          make_ocr_profile, normalize_text, ocr_profile_settings)
+
+SAMPLES_DIR = "samples"
+LABELS_FILE = "labels.json"
+
+# 総当たりする候補
+CANDIDATE_PSMS = (6, 7, 8, 13)
+CANDIDATE_PREPROCESS = ((), ("gray",), ("gray", "binary"), ("gray", "invert", "binary"))
+CANDIDATE_SCALES = (1, 2)
+# 総当たりで変える "ocr" の項目（oem / dpi などそれ以外の項目は現在の設定のまま）
+TUNED_KEYS = ("language", "psm", "whitelist", "scale", "preprocess")
+# Tesseract の設定文字列を壊すので whitelist に使えない文字
+WHITELIST_FORBIDDEN = "'\""
+
+
+# ===== サンプル =====
+def _safe_name(name):
+    """ファイル名に使えない文字を置き換える"""
+    return "".join("_" if c in '\\/:*?"<>|' else c for c in str(name)).strip() or "_"
+
+
+def sample_dir(root, set_name, region_name):
+    """領域のサンプル保存先"""
+    return os.path.join(root, _safe_name(set_name), _safe_name(region_name))
+
+
+def save_sample(root, set_name, region_name, image, label):
+    """キャプチャ画像を正解文字列付きのサンプルとして保存し、保存したパスを返す"""
+    directory = sample_dir(root, set_name, region_name)
+    os.makedirs(directory, exist_ok=True)
+    labels = _load_labels(directory)
+    filename = time.strftime("%Y%m%d_%H%M%S") + f"_{len(labels) + 1:03d}.png"
+    Image.fromarray(image).save(os.path.join(directory, filename))
+    labels[filename] = label
+    atomic_write_json(os.path.join(directory, LABELS_FILE), labels)
+    return os.path.join(directory, filename)
+
+
+def _load_labels(directory):
+    try:
+        with open(os.path.join(directory, LABELS_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_samples(root, set_name, region_name):
+    """[(画像配列, 正解文字列), ...] を読み込む"""
+    directory = sample_dir(root, set_name, region_name)
+    samples = []
+    for filename, label in _load_labels(directory).items():
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            samples.append((np.array(Image.open(path).convert("RGB")), label))
+    return samples
+
+
+# ===== 候補 =====
+class Candidate:
+    """試す組み合わせ（エンジン + OCR 設定）"""
+
+    __slots__ = ("engine", "profile")
+
+    def __init__(self, engine, profile):
+        self.engine = engine
+        self.profile = profile
+
+    def describe(self):
+        settings = ocr_profile_settings(self.profile) or {}
+        text = " ".join(f"{key}={value}" for key, value in settings.items())
+        return f"{self.engine} {text or '(既定)'}"
+
+
+def candidate_profiles(labels, engines, language, base=DEFAULT_OCR_PROFILE):
+    """正解文字列から候補の OCR 設定を作る（TUNED_KEYS 以外は base の設定を使う）
+
+    正解に使われている文字だけを許可する whitelist と、ASCII だけなら英語のみの言語設定も試す。
+    """
+    characters = "".join(sorted({c for label in labels for c in label if not c.isspace()}))
+    usable = characters and not any(c in WHITELIST_FORBIDDEN for c in characters)
+    whitelists = ("", characters) if usable else ("",)
+    languages = (None, "eng") if characters.isascii() and language != "eng" else (None,)
+
+    candidates = []
+    seen = set()
+    for engine in engines:
+        if engine == "tesseract":
+            grid = itertools.product(languages, CANDIDATE_PSMS, whitelists, CANDIDATE_PREPROCESS, CANDIDATE_SCALES)
+        else:
+            # EasyOCR では言語と psm は使われない
+            grid = itertools.product((None,), (6,), whitelists, CANDIDATE_PREPROCESS, CANDIDATE_SCALES)
+        for lang, psm, whitelist, preprocess, scale in grid:
+            profile = make_ocr_profile(lang, psm, base.oem, whitelist, base.dpi, scale, preprocess)
+            if (engine, profile) not in seen:
+                seen.add((engine, profile))
+                candidates.append(Candidate(engine, profile))
+    return candidates
+
+
+# ===== 評価 =====
+def read_sample(words, min_confidence=0):
+    """単語リストを監視と同じ方法で文字列にする（確信度が下限未満で監視ではトリガーしない場合は None）"""
+    confidence = words_confidence(words)
+    if min_confidence and confidence is not None and confidence < min_confidence:
+        return None
+    return words_text(words)
+
+
+def evaluate(candidate, samples, recognizers, language, repeat=1, min_confidence=0):
+    """候補でサンプルを認識し (1回あたりのミリ秒, 正解率) を返す
+
+    recognizers は監視と同じ単語リストを返す関数。確信度が min_confidence 未満の読み取りは不正解とする。
+    """
+    recognize = recognizers[candidate.engine]
+    correct = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        correct = 0
+        for image, label in samples:
+            try:
+                text = read_sample(recognize(image, language, candidate.profile), min_confidence)
+            except Exception:
+                text = None
+            if text is not None and normalize_text(text) == normalize_text(label):
+                correct += 1
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(samples)) * 1000, correct / len(samples)
+
+
+def tune_region(samples, recognizers, language, repeat=1, log=print, base=DEFAULT_OCR_PROFILE, min_confidence=0):
+    """全候補を評価し、[(候補, ms/回, 正解率), ...]（速い順）を返す"""
+    labels = [label for _, label in samples]
+    results = []
+    for candidate in candidate_profiles(labels, list(recognizers), language, base):
+        ms, accuracy = evaluate(candidate, samples, recognizers, language, repeat, min_confidence)
+        results.append((candidate, ms, accuracy))
+        log(f"  {ms:8.1f} ms/回  正解率 {accuracy * 100:5.1f}%  {candidate.describe()}")
+    results.sort(key=lambda item: item[1])
+    return results
+
+
+def merge_tuned_settings(ocr, profile):
+    """領域の "ocr" 設定に、調整した項目（TUNED_KEYS）だけを上書きした新しい設定を返す"""
+    if isinstance(ocr, str):
+        ocr = {"preset": ocr}
+    merged = dict(ocr) if isinstance(ocr, dict) else {}
+    preset = merged.pop("preset", None)
+    if preset in OCR_PRESETS:
+        # プリセットが調整した項目を上書きしないよう、プリセットの内容を展開しておく
+        for key, value in OCR_PRESETS[preset].items():
+            merged.setdefault(key, value)
+    settings = ocr_profile_settings(profile) or {}
+    for key in TUNED_KEYS:
+        if key in settings:
+            merged[key] = settings[key]
+        else:
+            merged.pop(key, None)
+    return merged or None
+
+
+def best_candidate(results, engine):
+    """サンプルを全て正しく読めた候補のうち、指定エンジンで最も速いもの"""
+    for candidate, ms, accuracy in results:
+        if accuracy >= 1.0 and candidate.engine == engine:
+            return candidate, ms
+    return None, None
+
+
+def setup_recognizers():
+    """利用できる OCR エンジンの認識関数 {エンジン名: recognize(image, language, profile) -> 単語リスト}
+
+    監視（GUI の extract_words_from_image）と同じ関数を使い、調整した設定が監視中も同じように読めるようにする。
+    """
+    recognizers = {}
+    if TESSERACT_AVAILABLE:
+        try:
+            configure_tesseract()
+            recognizers["tesseract"] = tesseract_words
+        except Exception as e:
+            print(f"Tesseract設定エラー: {e}")
+    try:
+        import easyocr
+        reader = easyocr.Reader(['ja', 'en'])
+        recognizers["easyocr"] = lambda image, language, profile: easyocr_words(reader, image, profile)
+    except Exception:
+        pass
+    return recognizers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="領域ごとのOCR設定をサンプル画像から自動調整します")
+    parser.add_argument("--regions", default="regions.json", help="監視領域ファイル")
+    parser.add_argument("--config", default="config.json", help="設定ファイル（ocr_language を参照）")
+    parser.add_argument("--samples", default=SAMPLES_DIR, help="サンプルの保存先")
+    parser.add_argument("--set", dest="set_name", help="対象の領域セット（省略時は現在のセット）")
+    parser.add_argument("--region", action="append", help="対象の領域名（複数指定可、省略時は全領域）")
+    parser.add_argument("--repeat", type=int, default=1, help="速度計測の繰り返し回数")
+    parser.add_argument("--write", action="store_true", help="最速の設定を regions.json に書き戻す")
+    args = parser.parse_args()
+
+    with open(args.regions, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    language = "jpn+eng"
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            language = json.load(f).get("ocr_language", language)
+
+    set_name = args.set_name or data.get("current_set", "デフォルト")
+    regions = data.get("region_sets", {}).get(set_name)
+    if regions is None:
+        print(f"監視領域セット '{set_name}' がありません")
+        return 1
+
+    recognizers = setup_recognizers()
+    if not recognizers:
+        print("OCRエンジンが利用できません")
+        return 1
+    # 監視で使われるエンジン（GUI と同じく Tesseract を優先）
+    engine = "tesseract" if "tesseract" in recognizers else "easyocr"
+
+    changed = False
+    for region in regions:
+        name = region.get("name", "")
+        if args.region and name not in args.region:
+            continue
+        samples = load_samples(args.samples, set_name, name)
+        if not samples:
+            continue
+        try:
+            current = compile_ocr_profile(region.get("ocr"))
+        except RegionConfigError as e:
+            print(f"[{name}] 現在のOCR設定が不正です: {e}")
+            current = DEFAULT_OCR_PROFILE
+
+        print(f"[{name}] サンプル {len(samples)}件")
+        min_confidence = region.get("min_confidence", 0)
+        if isinstance(min_confidence, bool) or not isinstance(min_confidence, (int, float)):
+            min_confidence = 0
+        results = tune_region(samples, recognizers, language, args.repeat, base=current,
+                              min_confidence=min_confidence)
+        fastest = results[0] if results else None
+        candidate, ms = best_candidate(results, engine)
+        if candidate is None:
+            print(f"[{name}] 全サンプルを正しく読める設定がありませんでした\n")
+            continue
+        print(f"[{name}] 最速: {candidate.describe()} ({ms:.1f} ms/回)")
+        accurate_other = [r for r in results if r[2] >= 1.0 and r[0].engine != engine]
+        if accurate_other and accurate_other[0][1] < ms:
+            print(f"[{name}] 参考: {accurate_other[0][0].describe()} ({accurate_other[0][1]:.1f} ms/回) の方が速いですが、"
+                  f"監視では {engine} を使うため対象外です")
+        if fastest is not None and fastest[2] < 1.0 and fastest[1] < ms:
+            print(f"[{name}] 最速の候補 ({fastest[1]:.1f} ms/回) は正解率 {fastest[2] * 100:.0f}% のため除外しました")
+        if candidate.profile != current:
+            region["ocr"] = merge_tuned_settings(region.get("ocr"), candidate.profile)
+            changed = True
+        print()
+
+    if args.write and changed:
+        # 監視中の GUI は regions.json の変更を検知して再コンパイルする
+        atomic_write_json(args.regions, data)
+        print(f"{args.regions} に書き戻しました")
+    elif changed:
+        print("--write を指定すると regions.json に書き戻します")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+ピクセル条件
+領域内の点（または領域全体）の色が指定範囲にあるかを、OCR を使わずに NumPy でまとめて判定する
+
+    "pixels": {"color": [255, 0, 0], "tolerance": 40}                                   # 領域全体がほぼ赤
+    "pixels": {"space": "hsv", "min": [90, 40, 40], "max": [150, 100, 100], "ratio": 0.8}  # 8割以上が緑
+    "pixels": {"points": [[0, 0], [10, 0, [255, 255, 255]]], "color": [0, 0, 0]}        # 点ごとの色（パターン）
+"""
+
+import numpy as np
+
+from region_model import RegionConfigError
+
+COLOR_SPACES = ("rgb", "hsv")
+# 色空間ごとのチャンネルの最大値（HSV は H: 0〜360、S/V: 0〜100）
+CHANNEL_MAX = {"rgb": (255, 255, 255), "hsv": (360, 100, 100)}
+DEFAULT_TOLERANCE = 16
+
+
+def rgb_to_hsv(pixels):
+    """(n, 3) の RGB（0〜255）を HSV（H: 0〜360、S/V: 0〜100）に変換"""
+    rgb = pixels[:, :3].astype(np.float32) / 255
+    high = rgb.max(axis=1)
+    delta = high - rgb.min(axis=1)
+    r, g, b = rgb.T
+    safe = np.where(delta == 0, 1, delta)
+    hue = np.where(high == r, ((g - b) / safe) % 6,
+                   np.where(high == g, (b - r) / safe + 2, (r - g) / safe + 4)) * 60
+    hue = np.where(delta == 0, 0, hue)
+    saturation = np.where(high == 0, 0, delta / np.where(high == 0, 1, high)) * 100
+    return np.stack([hue, saturation, high * 100], axis=1)
+
+
+class PixelCheck:
+    """コンパイル済みのピクセル条件（座標は領域の左上からの相対位置）"""
+
+    __slots__ = ("xs", "ys", "low", "high", "wrap", "space", "ratio", "label")
+
+    def __init__(self, xs, ys, low, high, space, ratio, label):
+        self.xs = xs
+        self.ys = ys
+        self.low = low  # 点ごとの下限 (n, 3)
+        self.high = high  # 点ごとの上限 (n, 3)
+        # 色相が 360 をまたぐ範囲（下限 > 上限）の点
+        self.wrap = low[:, 0] > high[:, 0] if space == "hsv" else None
+        self.space = space
+        self.ratio = ratio  # 範囲内の点の割合がこれ以上なら一致
+        self.label = label
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __repr__(self):
+        return f"PixelCheck({self.label!r})"
+
+
+class PixelBatch:
+    """1枚のキャプチャに含まれる全てのピクセル条件を、色空間ごとに1回の NumPy 演算で判定する
+
+    entries は (PixelCheck, 領域の左上のフレーム内 x, y) のリスト。
+    """
+
+    def __init__(self, entries):
+        self.counts = np.array([len(check) for check, _, _ in entries], dtype=np.float64)
+        self.count = int(self.counts.sum())
+        self.width = max((dx + int(check.xs.max()) + 1 for check, dx, _ in entries), default=0)
+        self.height = max((dy + int(check.ys.max()) + 1 for check, _, dy in entries), default=0)
+        self.parts = []
+        for space in COLOR_SPACES:
+            members = [i for i, (check, _, _) in enumerate(entries) if check.space == space]
+            if not members:
+                continue
+            checks = [entries[i] for i in members]
+            ys = np.concatenate([check.ys + dy for check, _, dy in checks])
+            xs = np.concatenate([check.xs + dx for check, dx, _ in checks])
+            low = np.concatenate([check.low for check, _, _ in checks])
+            high = np.concatenate([check.high for check, _, _ in checks])
+            wrap = np.concatenate([check.wrap for check, _, _ in checks]) if space == "hsv" else None
+            # 条件ごとの点の開始位置（np.add.reduceat で条件ごとに数える）
+            starts = np.cumsum([0] + [len(check) for check, _, _ in checks[:-1]])
+            self.parts.append((space, ys, xs, low, high, wrap, starts, np.array(members)))
+
+    def evaluate(self, frame):
+        """条件ごとの範囲内の点の割合（フレームが小さすぎる場合は None）"""
+        if frame.shape[0] < self.height or frame.shape[1] < self.width:
+            return None
+        ratios = np.empty(len(self.counts))
+        for space, ys, xs, low, high, wrap, starts, members in self.parts:
+            values = frame[ys, xs, :3]
+            if space == "hsv":
+                values = rgb_to_hsv(values)
+            inside = (values >= low) & (values <= high)
+            if wrap is not None:
+                hue = values[:, 0]
+                inside[:, 0] |= wrap & ((hue >= low[:, 0]) | (hue <= high[:, 0]))
+            hits = np.add.reduceat(inside.all(axis=1), starts, dtype=np.int64)
+            ratios[members] = hits / self.counts[members]
+        return ratios
+
+
+# ===== コンパイル =====
+def _channels(value, space, where, key):
+    if not isinstance(value, (list, tuple)) or len(value) != 3 or \
+            any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in value):
+        raise RegionConfigError(f"{where}: '{key}' は3つの数値 [{', '.join(space.upper())}] で指定してください")
+    for v, maximum in zip(value, CHANNEL_MAX[space]):
+        if not 0 <= v <= maximum:
+            raise RegionConfigError(f"{where}: '{key}' の値が範囲外です（{space.upper()}: {CHANNEL_MAX[space]}）")
+    return np.array(value, dtype=np.float32)
+
+
+def _tolerance(value, where):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = [value] * 3
+    if not isinstance(value, (list, tuple)) or len(value) != 3 or \
+            any(isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0 for v in value):
+        raise RegionConfigError(f"{where}: 'tolerance' は0以上の数値（またはチャンネルごとの3つの数値）で指定してください")
+    return np.array(value, dtype=np.float32)
+
+
+def color_range(color, tolerance, space):
+    """色と許容差から (下限, 上限) を作る（HSV の色相は 360 をまたいでよい）"""
+    maximum = np.array(CHANNEL_MAX[space], dtype=np.float32)
+    low = np.clip(color - tolerance, 0, maximum)
+    high = np.clip(color + tolerance, 0, maximum)
+    if space == "hsv":
+        if tolerance[0] >= 180:
+            low[0], high[0] = 0, 360
+        else:
+            low[0] = (color[0] - tolerance[0]) % 360
+            high[0] = (color[0] + tolerance[0]) % 360
+    return low, high
+
+
+def compile_pixel_check(data, rect, where="ピクセル条件"):
+    """regions.json の "pixels" を PixelCheck に変換する（rect は領域の Rect）"""
+    if not isinstance(data, dict):
+        raise RegionConfigError(f"{where}: 形式が不正です")
+    space = str(data.get("space", "rgb")).lower()
+    if space not in COLOR_SPACES:
+        raise RegionConfigError(f"{where}: 'space' は {' / '.join(COLOR_SPACES)} で指定してください")
+
+    # 条件全体の色の範囲（点ごとに色を指定した点はそちらを使う）
+    tolerance = _tolerance(data.get("tolerance", DEFAULT_TOLERANCE), where)
+    if "min" in data or "max" in data:
+        low = _channels(data.get("min"), space, where, "min")
+        high = _channels(data.get("max"), space, where, "max")
+        if space == "rgb" and (low > high).any():
+            raise RegionConfigError(f"{where}: 'min' が 'max' より大きいチャンネルがあります")
+        if space == "hsv" and (low[1:] > high[1:]).any():
+            raise RegionConfigError(f"{where}: S / V の 'min' が 'max' より大きくなっています")
+        default_range = (low, high)
+    elif "color" in data:
+        default_range = color_range(_channels(data["color"], space, where, "color"), tolerance, space)
+    else:
+        default_range = None
+
+    points = data.get("points")
+    if points is None:
+        # 点の指定がなければ領域全体（step 間隔で間引き）
+        step = data.get("step", 1)
+        if isinstance(step, bool) or not isinstance(step, int) or step < 1:
+            raise RegionConfigError(f"{where}: 'step' は1以上の整数で指定してください")
+        grid_y, grid_x = np.mgrid[0:rect.height:step, 0:rect.width:step]
+        xs = grid_x.ravel()
+        ys = grid_y.ravel()
+        if default_range is None:
+            raise RegionConfigError(f"{where}: 'color' または 'min' / 'max' を指定してください")
+        lows = np.broadcast_to(default_range[0], (len(xs), 3))
+        highs = np.broadcast_to(default_range[1], (len(xs), 3))
+    else:
+        if not isinstance(points, list) or not points:
+            raise RegionConfigError(f"{where}: 'points' は [x, y] または [x, y, 色] のリストで指定してください")
+        xs, ys, lows, highs = [], [], [], []
+        for i, point in enumerate(points):
+            if not isinstance(point, (list, tuple)) or len(point) not in (2, 3) or \
+                    any(isinstance(v, bool) or not isinstance(v, int) for v in point[:2]):
+                raise RegionConfigError(f"{where}: 点{i + 1} は [x, y] または [x, y, 色] で指定してください")
+            x, y = point[0], point[1]
+            if not (0 <= x < rect.width and 0 <= y < rect.height):
+                raise RegionConfigError(f"{where}: 点{i + 1} ({x}, {y}) が領域の外にあります")
+            if len(point) == 3:
+                low, high = color_range(_channels(point[2], space, f"{where} 点{i + 1}", "色"), tolerance, space)
+            elif default_range is not None:
+                low, high = default_range
+            else:
+                raise RegionConfigError(f"{where}: 点{i + 1} の色がありません（'color' か点ごとの色を指定してください）")
+            xs.append(x)
+            ys.append(y)
+            lows.append(low)
+            highs.append(high)
+
+    ratio = data.get("ratio", 1.0)
+    if isinstance(ratio, bool) or not isinstance(ratio, (int, float)) or not 0 < ratio <= 1:
+        raise RegionConfigError(f"{where}: 'ratio' は0より大きく1以下で指定してください")
+
+    xs = np.asarray(xs, dtype=np.intp)
+    ys = np.asarray(ys, dtype=np.intp)
+    label = f"{space.upper()} {len(xs)}点中 {ratio * 100:g}%以上"
+    return PixelCheck(xs, ys, np.array(lows, dtype=np.float32), np.array(highs, dtype=np.float32),
+                      space, float(ratio), label)
@@ -0,0 +1,605 @@
+"""
+監視領域のコンパイル済みランタイムモデル
+regions.json の領域辞書を検証し、監視ループで毎ティック参照する軽量オブジェクトに変換する
+"""
+
+import hashlib
+import json
+import operator
+import re
+import time
+from collections import namedtuple
+from functools import partial
+
+from spatial_index import GridIndex
+
+
+class RegionConfigError(ValueError):
+    """領域設定の検証エラー"""
+
+
+# 画面上の矩形 (x, y, width, height)
+Rect = namedtuple("Rect", ("x", "y", "width", "height"))
+
+# 領域ごとの OCR 設定。language が None なら全体の ocr_language を使う。
+# preprocess は OCR 前に順に適用する処理名、scale は整数倍の拡大率。
+# config は Tesseract に渡すオプション文字列（コンパイル時に組み立て済み）
+OcrProfile = namedtuple("OcrProfile", ("language", "psm", "oem", "whitelist", "dpi", "scale", "preprocess", "config"))
+
+# OCR 前処理（ocr_engines.PREPROCESS_STEPS と対応）
+PREPROCESS_NAMES = ("gray", "invert", "binary")
+MAX_OCR_SCALE = 4
+
+# 連続一致判定で遡るフレーム数の上限
+MAX_CONFIRM_WINDOW = 64
+
+# トリガー方式（level: 一致している間は毎回、rising: 一致し始めた時、falling: 一致しなくなった時）
+# cooldown は実行後に次の実行を受け付けない秒数、max_rate は RATE_WINDOW 秒あたりの最大実行回数（None で無制限）
+TriggerPolicy = namedtuple("TriggerPolicy", ("mode", "cooldown", "max_rate"))
+TRIGGER_MODES = ("level", "rising", "falling")
+RATE_WINDOW = 60.0
+
+# OCR 結果キャッシュのキー（同じ矩形でも OCR 設定が違えば別の結果）
+ReadKey = namedtuple("ReadKey", ("rect", "profile"))
+
+# regions.json の "ocr": {"preset": "numeric"} などで使える定義済みの設定
+OCR_PRESETS = {
+    # 数字だけの1行（英語モデルのみ、数字以外の文字を出力しない）
+    "numeric": {"language": "eng", "psm": 7, "whitelist": "0123456789"},
+    # 1行のテキスト
+    "line": {"psm": 7},
+    # 1単語
+    "word": {"psm": 8},
+}
+
+
+def rect_bbox(rect):
+    """ImageGrab.grab に渡す bbox (left, top, right, bottom) を返す"""
+    return (rect.x, rect.y, rect.x + rect.width, rect.y + rect.height)
+
+
+def rect_contains(outer, inner):
+    """outer が inner を完全に含むか"""
+    return (outer.x <= inner.x and outer.y <= inner.y
+            and inner.x + inner.width <= outer.x + outer.width
+            and inner.y + inner.height <= outer.y + outer.height)
+
+
+def group_contained_rects(rects):
+    """矩形を包含関係でまとめる
+
+    重複を除いた矩形のうち、他の矩形に含まれないものを外側として
+    {外側の矩形: (含まれる矩形, ...)} を返す。入れ子の場合は一番外側にまとめる。
+    """
+    unique = list(dict.fromkeys(rects))
+    # 面積の大きい順に処理すると、最初に見つかった包含先が一番外側になる
+    ordered = sorted(unique, key=lambda r: r.width * r.height, reverse=True)
+    groups = {}
+    index = GridIndex()
+    for rect in ordered:
+        # 包含先の候補は重なっている外側の矩形だけに絞る
+        for outer in index.query(rect):
+            if rect_contains(outer, rect):
+                groups[outer].append(rect)
+                break
+        else:
+            groups[rect] = []
+            index.insert(rect)
+    return {outer: tuple(inner) for outer, inner in groups.items()}
+
+
+def make_ocr_profile(language=None, psm=6, oem=None, whitelist="", dpi=None, scale=1, preprocess=()):
+    """OcrProfile を作る（Tesseract のオプション文字列もここで組み立てる）"""
+    options = [f"--psm {psm}"]
+    if oem is not None:
+        options.append(f"--oem {oem}")
+    if dpi is not None:
+        options.append(f"--dpi {dpi}")
+    if whitelist:
+        options.append(f"-c tessedit_char_whitelist={whitelist}")
+    return OcrProfile(language, psm, oem, whitelist, dpi, scale, tuple(preprocess), " ".join(options))
+
+
+def ocr_profile_settings(profile):
+    """OcrProfile を regions.json の "ocr" 設定に戻す（既定値の項目は省く）"""
+    settings = {}
+    defaults = DEFAULT_OCR_PROFILE
+    for key in ("language", "psm", "oem", "whitelist", "dpi", "scale"):
+        value = getattr(profile, key)
+        if value != getattr(defaults, key):
+            settings[key] = value
+    if profile.preprocess:
+        settings["preprocess"] = list(profile.preprocess)
+    return settings or None
+
+
+# 従来どおりの設定（全体の言語 + --psm 6）
+DEFAULT_OCR_PROFILE = make_ocr_profile()
+
+
+def normalize_text(text):
+    """比較用に空白を畳み込み小文字化する"""
+    if not text:
+        return ""
+    return " ".join(str(text).split()).lower()
+
+
+_NUMBER_PATTERN = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def parse_number(text):
+    """文字列から最初の数値を取り出す（3桁区切りのカンマは無視、無ければ None）"""
+    if not text:
+        return None
+    match = _NUMBER_PATTERN.search(text)
+    if match is None:
+        return None
+    try:
+        return float(match.group().replace(",", ""))
+    except ValueError:
+        return None
+
+
+def config_fingerprint(data):
+    """設定データの内容ハッシュ（再コンパイル要否の判定用）"""
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class CompiledAction:
+    """実行関数を事前に束縛したアクション
+
+    steps は入力1つずつの実行関数（テキスト入力は1文字ごと）。呼び出し側はこの間で停止要求を確認できる。
+    run() は steps をまとめて実行する。
+    """
+
+    __slots__ = ("kind", "steps", "label")
+
+    def __init__(self, kind, steps, label):
+        self.kind = kind
+        self.steps = steps
+        self.label = label
+
+    def run(self):
+        for step in self.steps:
+            step()
+
+    def __repr__(self):
+        return f"CompiledAction({self.kind!r}, {self.label!r})"
+
+
+def _between(low, high, value):
+    return low <= value <= high
+
+
+class CompiledCondition:
+    """数値条件（比較関数を事前に束縛済み）
+
+    delta が真の場合は、前回の値からの変化量に対して比較する。
+    """
+
+    __slots__ = ("check", "delta", "label")
+
+    def __init__(self, check, delta, label):
+        self.check = check
+        self.delta = delta
+        self.label = label
+
+    def test(self, value, previous):
+        if self.delta:
+            if previous is None:
+                return False
+            value = value - previous
+        return self.check(value)
+
+    def __repr__(self):
+        return f"CompiledCondition({self.label!r})"
+
+
+class CompiledRegion:
+    """検証済みの監視領域"""
+
+    __slots__ = (
+        "name", "rect", "bbox", "target", "compare_rect", "compare_bbox",
+        "compare_trigger_only", "actions", "min_confidence", "profile", "key", "compare_key",
+        "confirm_frames", "confirm_window", "condition", "passive", "pixels", "trigger", "ident",
+    )
+
+    def __init__(self, name, rect, target, compare_rect, compare_trigger_only, actions, min_confidence=0,
+                 profile=DEFAULT_OCR_PROFILE, confirm_frames=1, confirm_window=1, condition=None, passive=False,
+                 pixels=None, trigger=None):
+        self.name = name
+        self.rect = rect
+        self.bbox = rect_bbox(rect)
+        self.target = target
+        self.compare_rect = compare_rect
+        self.compare_bbox = rect_bbox(compare_rect) if compare_rect else None
+        self.profile = profile
+        self.key = ReadKey(rect, profile)
+        self.compare_key = ReadKey(compare_rect, profile) if compare_rect else None
+        self.compare_trigger_only = compare_trigger_only
+        self.actions = actions
+        self.min_confidence = min_confidence  # OCR 確信度の下限（0〜100、0 で判定しない）
+        # 直近 confirm_window フレーム中 confirm_frames フレーム以上一致したら実行（1 なら毎回）
+        self.confirm_frames = confirm_frames
+        self.confirm_window = confirm_window
+        # 数値条件（指定されている場合はターゲット文字列の代わりに判定する）
+        self.condition = condition
+        # ルールから参照されるだけの領域（自身では判定せず、OCR はルールが必要とした時だけ行う）
+        self.passive = passive
+        # ピクセル条件（指定されている場合は OCR せず、色だけで判定する）
+        self.pixels = pixels
+        # トリガー方式・クールダウン・最大頻度（None なら一致している間は毎回実行）
+        self.trigger = trigger
+        # 再コンパイルしても変わらない識別子（一致履歴・前回値・トリガーの状態を引き継ぐキー）
+        # compile_region_set が (セット名, 領域名, 同名の何番目か) を設定する
+        self.ident = ("", name, 0)
+
+    def matches(self, normalized_text):
+        """正規化済みテキストにターゲット文字列が含まれるか"""
+        return bool(self.target) and self.target in normalized_text
+
+    def __repr__(self):
+        return f"CompiledRegion({self.name!r}, {tuple(self.rect)})"
+
+
+class CompiledRegionSet:
+    """コンパイル済みの監視領域セット（不変）"""
+
+    __slots__ = ("name", "regions", "fingerprint", "overlaps", "rules")
+
+    def __init__(self, name, regions, fingerprint, rules=()):
+        self.name = name
+        self.regions = regions
+        self.fingerprint = fingerprint
+        self.rules = rules  # CompiledRule のタプル（rule_engine.py）
+        self.overlaps = find_overlapping_regions(regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __iter__(self):
+        return iter(self.regions)
+
+
+def find_overlapping_regions(regions):
+    """監視矩形が重なっている領域の組 [(領域, 領域), ...]"""
+    index = GridIndex()
+    for region in regions:
+        index.insert(region.rect, region)
+    return index.overlapping_pairs()
+
+
+# ===== 検証 =====
+def _require_int(data, key, where, minimum=None):
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RegionConfigError(f"{where}: '{key}' は数値で指定してください")
+    value = int(value)
+    if minimum is not None and value < minimum:
+        raise RegionConfigError(f"{where}: '{key}' は{minimum}以上にしてください")
+    return value
+
+
+def compile_ocr_profile(data, where="OCR設定"):
+    """regions.json の "ocr" 設定を OcrProfile に変換（未指定なら既定の設定）
+
+    "numeric" のようなプリセット名の文字列、または
+    {"preset", "language", "psm", "oem", "whitelist", "dpi", "scale", "preprocess"} の辞書で指定する。
+    """
+    if not data:
+        return DEFAULT_OCR_PROFILE
+    if isinstance(data, str):
+        data = {"preset": data}
+    if not isinstance(data, dict):
+        raise RegionConfigError(f"{where}: OCR設定の形式が不正です")
+
+    options = {}
+    preset = data.get("preset")
+    if preset:
+        if preset not in OCR_PRESETS:
+            raise RegionConfigError(f"{where}: 未対応のOCRプリセットです: '{preset}'")
+        options.update(OCR_PRESETS[preset])
+    options.update({key: value for key, value in data.items() if key != "preset" and value not in (None, "")})
+
+    language = options.get("language")
+    if language is not None and not isinstance(language, str):
+        raise RegionConfigError(f"{where}: 'language' は文字列で指定してください")
+    psm = _require_int(options, "psm", where, minimum=0) if "psm" in options else 6
+    if psm > 13:
+        raise RegionConfigError(f"{where}: 'psm' は0〜13で指定してください")
+    oem = _require_int(options, "oem", where, minimum=0) if "oem" in options else None
+    if oem is not None and oem > 3:
+        raise RegionConfigError(f"{where}: 'oem' は0〜3で指定してください")
+    dpi = _require_int(options, "dpi", where, minimum=1) if "dpi" in options else None
+    whitelist = str(options.get("whitelist", ""))
+    if any(c.isspace() or c in "'\"" for c in whitelist):
+        # 空白や引用符があると pytesseract が設定文字列を正しく分割できない
+        raise RegionConfigError(f"{where}: 'whitelist' に空白や引用符（' \"）は使えません")
+    scale = _require_int(options, "scale", where, minimum=1) if "scale" in options else 1
+    if scale > MAX_OCR_SCALE:
+        raise RegionConfigError(f"{where}: 'scale' は1〜{MAX_OCR_SCALE}で指定してください")
+    preprocess = options.get("preprocess") or ()
+    if isinstance(preprocess, str):
+        preprocess = (preprocess,)
+    if not isinstance(preprocess, (list, tuple)) or any(step not in PREPROCESS_NAMES for step in preprocess):
+        raise RegionConfigError(f"{where}: 'preprocess' は {', '.join(PREPROCESS_NAMES)} のリストで指定してください")
+    return make_ocr_profile(language, psm, oem, whitelist, dpi, scale, preprocess)
+
+
+def _compile_rect(data, where):
+    if not isinstance(data, dict):
+        raise RegionConfigError(f"{where}: 座標が不正です")
+    return Rect(
+        _require_int(data, "x", where),
+        _require_int(data, "y", where),
+        _require_int(data, "width", where, minimum=1),
+        _require_int(data, "height", where, minimum=1),
+    )
+
+
+# ===== 数値条件 =====
+COMPARISON_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    "≦": operator.le,
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "≧": operator.ge,
+    ">": operator.gt,
+}
+
+_CONDITION_PATTERN = re.compile(
+    r"^\s*(?P<delta>delta|Δ)?\s*(?:(?P<op><=|>=|==|!=|<|>|=|≦|≧)\s*(?P<value>-?\d+(?:\.\d+)?)"
+    r"|(?P<low>-?\d+(?:\.\d+)?)\s*\.\.\s*(?P<high>-?\d+(?:\.\d+)?))\s*$")
+
+
+def _condition_number(data, key, where):
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RegionConfigError(f"{where}: 数値条件の '{key}' は数値で指定してください")
+    return float(value)
+
+
+def compile_trigger_policy(data, where="トリガー"):
+    """領域（またはルール）の trigger / cooldown / max_rate を TriggerPolicy に変換（既定の動作なら None）"""
+    mode = data.get("trigger") or "level"
+    if mode not in TRIGGER_MODES:
+        raise RegionConfigError(f"{where}: 'trigger' は {' / '.join(TRIGGER_MODES)} で指定してください")
+    cooldown = data.get("cooldown") or 0
+    if isinstance(cooldown, bool) or not isinstance(cooldown, (int, float)) or cooldown < 0:
+        raise RegionConfigError(f"{where}: 'cooldown' は0以上の秒数で指定してください")
+    max_rate = _require_int(data, "max_rate", where, minimum=1) if data.get("max_rate") else None
+    if mode == "level" and not cooldown and max_rate is None:
+        return None
+    return TriggerPolicy(mode, float(cooldown), max_rate)
+
+
+def compile_condition(data, where="数値条件"):
+    """regions.json の "condition" を CompiledCondition に変換（未指定なら None）
+
+    文字列 "<= 12" / "5..12" / "delta <= -3"、または
+    {"op": "<=", "value": 12} / {"op": "between", "min": 5, "max": 12} / {"op": "<=", "value": -3, "delta": true}
+    """
+    if data in (None, "", {}):
+        return None
+    if isinstance(data, str):
+        match = _CONDITION_PATTERN.match(data)
+        if match is None:
+            raise RegionConfigError(f"{where}: 数値条件を解釈できません: '{data}'")
+        data = {"delta": bool(match.group("delta"))}
+        if match.group("op"):
+            data.update(op=match.group("op"), value=float(match.group("value")))
+        else:
+            data.update(op="between", min=float(match.group("low")), max=float(match.group("high")))
+    if not isinstance(data, dict):
+        raise RegionConfigError(f"{where}: 数値条件の形式が不正です")
+
+    op = data.get("op")
+    delta = bool(data.get("delta", False))
+    prefix = "変化量 " if delta else ""
+    if op == "between":
+        low = _condition_number(data, "min", where)
+        high = _condition_number(data, "max", where)
+        if low > high:
+            raise RegionConfigError(f"{where}: 数値条件の範囲が不正です（min > max）")
+        return CompiledCondition(partial(_between, low, high), delta, f"{prefix}{low:g}〜{high:g}")
+    compare = COMPARISON_OPERATORS.get(op)
+    if compare is None:
+        raise RegionConfigError(f"{where}: 未対応の比較演算子です: '{op}'")
+    value = _condition_number(data, "value", where)
+    # compare(測定値, 基準値) の形にするため、基準値は右側に束縛する
+    return CompiledCondition(partial(_compare_with, compare, value), delta, f"{prefix}{op} {value:g}")
+
+
+def _compare_with(compare, threshold, value):
+    return compare(value, threshold)
+
+
+# ===== アクション =====
+def _bind_click(action, backend, sleep, where):
+    x = _require_int(action, "x", where)
+    y = _require_int(action, "y", where)
+    button = action.get("button", "left")
+    return partial(backend.click, x, y, button=button), f"クリック実行: ({x}, {y})"
+
+
+def _bind_key(action, backend, sleep, where):
+    key = action.get("key")
+    if not key:
+        raise RegionConfigError(f"{where}: キーが指定されていません")
+    return partial(backend.press, key), f"キー入力実行: {key}"
+
+
+def _bind_hotkey(action, backend, sleep, where):
+    keys = tuple(action.get("keys") or ())
+    if not keys:
+        raise RegionConfigError(f"{where}: ホットキーが指定されていません")
+    return partial(backend.hotkey, *keys), f"ホットキー実行: {'+'.join(keys)}"
+
+
+def _bind_type(action, backend, sleep, where):
+    text = action.get("text", "")
+    # 1文字ずつ送り、文字の間で停止できるようにする
+    return tuple(partial(backend.typewrite, char) for char in text), f"テキスト入力実行: {text}"
+
+
+def _bind_move(action, backend, sleep, where):
+    x = _require_int(action, "x", where)
+    y = _require_int(action, "y", where)
+    return partial(backend.moveTo, x, y), f"マウス移動実行: ({x}, {y})"
+
+
+def _bind_scroll(action, backend, sleep, where):
+    clicks = _require_int(action, "clicks", where) if "clicks" in action else 1
+    return partial(backend.scroll, clicks), f"スクロール実行: {clicks}"
+
+
+def _bind_wait(action, backend, sleep, where):
+    duration = action.get("duration", 1.0)
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) or duration < 0:
+        raise RegionConfigError(f"{where}: 待機時間が不正です")
+    return partial(sleep, float(duration)), f"待機実行: {duration}秒"
+
+
+ACTION_BINDERS = {
+    "click": _bind_click,
+    "key": _bind_key,
+    "hotkey": _bind_hotkey,
+    "type": _bind_type,
+    "move": _bind_move,
+    "scroll": _bind_scroll,
+    "wait": _bind_wait,
+}
+
+
+def compile_action(action, backend, sleep=time.sleep, where="アクション"):
+    """アクション辞書を CompiledAction に変換"""
+    if not isinstance(action, dict):
+        raise RegionConfigError(f"{where}: アクションの形式が不正です")
+    kind = action.get("type", "")
+    binder = ACTION_BINDERS.get(kind)
+    if binder is None:
+        raise RegionConfigError(f"{where}: 未対応のアクション種類です: '{kind}'")
+    run, label = binder(action, backend, sleep, where)
+    return CompiledAction(kind, run if isinstance(run, tuple) else (run,), label)
+
+
+# ===== 領域 =====
+def compile_region(region, backend, sleep=time.sleep, index=0, referenced=False):
+    """領域辞書を CompiledRegion に変換（無効な領域は None）
+
+    referenced はルールから参照されている領域か。検索文字などがなくても受動的な領域として残す。
+    """
+    if not isinstance(region, dict):
+        raise RegionConfigError(f"領域{index + 1}: 形式が不正です")
+    name = str(region.get("name") or f"領域_{index + 1}")
+    if not region.get("enabled", True):
+        return None
+
+    where = f"[{name}]"
+    rect = _compile_rect(region, where)
+
+    compare_rect = None
+    compare_trigger_only = bool(region.get("compare_trigger_only", False))
+    if region.get("compare_enabled", False) and region.get("compare_region"):
+        compare_rect = _compile_rect(region["compare_region"], f"{where} 比較領域")
+
+    pixels = None
+    if region.get("pixels"):
+        # ピクセル領域は色だけで判定するので、検索文字・比較領域・数値条件は使わない
+        from pixel_check import compile_pixel_check
+        pixels = compile_pixel_check(region["pixels"], rect, f"{where} ピクセル条件")
+        compare_rect = None
+        target = ""
+        condition = None
+        passive = referenced and not region.get("actions")
+    else:
+        target = normalize_text(region.get("target_text", ""))
+        condition = compile_condition(region.get("condition"), f"{where} 数値条件")
+        passive = not target and compare_rect is None and condition is None
+    if passive and not referenced:
+        # 何にも一致しない領域は毎ティックの OCR が無駄になるので監視対象から外す
+        return None
+
+    min_confidence = region.get("min_confidence", 0) or 0
+    if isinstance(min_confidence, bool) or not isinstance(min_confidence, (int, float)) \
+            or not 0 <= min_confidence <= 100:
+        raise RegionConfigError(f"{where}: 'min_confidence' は0〜100で指定してください")
+
+    profile = compile_ocr_profile(region.get("ocr"), f"{where} OCR設定")
+
+    confirm_frames = _require_int(region, "confirm_frames", where, minimum=1) if "confirm_frames" in region else 1
+    confirm_window = (_require_int(region, "confirm_window", where, minimum=1)
+                      if "confirm_window" in region else confirm_frames)
+    if confirm_frames > confirm_window or confirm_window > MAX_CONFIRM_WINDOW:
+        raise RegionConfigError(
+            f"{where}: 連続一致は confirm_frames ≦ confirm_window ≦ {MAX_CONFIRM_WINDOW} で指定してください")
+
+    actions = tuple(
+        compile_action(action, backend, sleep, f"{where} アクション{i + 1}")
+        for i, action in enumerate(region.get("actions", []))
+    )
+    return CompiledRegion(name, rect, target, compare_rect, compare_trigger_only, actions,
+                          min_confidence=float(min_confidence), profile=profile,
+                          confirm_frames=confirm_frames, confirm_window=confirm_window, condition=condition,
+                          passive=passive, pixels=pixels, trigger=compile_trigger_policy(region, where))
+
+
+def region_set_fingerprint(regions, rules=None):
+    """領域リストとルールの指紋（ルールがない場合は領域リストだけの指紋と同じ）"""
+    if not rules:
+        return config_fingerprint(regions)
+    return config_fingerprint({"regions": regions, "rules": rules})
+
+
+def compile_region_set(name, regions, backend, sleep=time.sleep, rules=None):
+    """領域リストとルールを検証して CompiledRegionSet を作る
+
+    1件でも不正な領域があれば RegionConfigError を送出し、部分的な結果は返さない。
+    """
+    from rule_engine import compile_rules, referenced_regions
+
+    if not isinstance(regions, list):
+        raise RegionConfigError(f"監視領域セット '{name}' の形式が不正です")
+    referenced = referenced_regions(rules)
+    compiled = []
+    occurrences = {}
+    for index, region in enumerate(regions):
+        item = compile_region(region, backend, sleep, index,
+                              referenced=isinstance(region, dict) and str(region.get("name")) in referenced)
+        if item is not None:
+            count = occurrences[item.name] = occurrences.get(item.name, -1) + 1
+            item.ident = (name, item.name, count)
+            compiled.append(item)
+    compiled = tuple(compiled)
+    return CompiledRegionSet(name, compiled, region_set_fingerprint(regions, rules),
+                             compile_rules(rules, compiled, backend, sleep, name))
+
+
+def compile_region_sets(region_sets, backend, sleep=time.sleep, previous=None, limit=None, rules=None):
+    """全ての監視領域セットをコンパイルする
+
+    rules には regions.json の "rules"（{セット名: [ルール, ...]}）を渡す。
+    previous に前回の結果を渡すと、内容が変わっていないセットはそのまま再利用する。
+    戻り値は ({セット名: CompiledRegionSet}, {セット名: エラーメッセージ})。
+    """
+    previous = previous or {}
+    rules = rules or {}
+    compiled = {}
+    errors = {}
+    for index, (name, regions) in enumerate(region_sets.items()):
+        if limit is not None and index >= limit:
+            errors[name] = f"監視領域セットは最大{limit}個までです"
+            continue
+        old = previous.get(name)
+        if old is not None and old.fingerprint == region_set_fingerprint(regions, rules.get(name)):
+            compiled[name] = old
+            continue
+        try:
+            compiled[name] = compile_region_set(name, regions, backend, sleep, rules.get(name))
+        except RegionConfigError as e:
+            errors[name] = str(e)
+    return compiled, errors
@@ -0,0 +1,286 @@
+"""
+ルールエンジン
+複数の領域の結果を組み合わせた条件（ルール）をコンパイルし、監視エンジンから評価する
+
+regions.json の "rules" に {セット名: [ルール, ...]} の形で書く:
+
+    {"name": "攻撃",
+     "when": {"all": [{"region": "敵", "contains": "attack"},
+                      {"region": "コスト", "condition": "> 5"},
+                      {"region": "状態", "changed": false}]},
+     "actions": [{"type": "key", "key": "space"}]}
+
+条件式は all / any / not と、領域に対する述語
+contains（部分一致）・equals（完全一致）・condition（数値条件）・changed（前回から画像が変わったか）、
+ピクセル領域に対する pixels（色が一致したか）の組み合わせ。
+同じ述語は複数のルールで1つのノードを共有する DAG にまとめ、1ティック内では1回だけ評価する。
+all / any は安い述語（画像の変化判定など）から順に評価し、結果が決まった時点で残りの OCR は行わない。
+"""
+
+from region_model import (RegionConfigError, compile_action, compile_condition, compile_trigger_policy,
+                          config_fingerprint, normalize_text)
+
+# 述語の評価コストの目安（小さいものから評価する）
+COST_CHANGED = 1
+COST_PIXELS = 1
+COST_OCR = 10
+
+
+class RuleNode:
+    """条件式のノード"""
+
+    __slots__ = ("cost",)
+
+    def compute(self, engine):
+        raise NotImplementedError
+
+
+class AllNode(RuleNode):
+    __slots__ = ("children",)
+
+    def __init__(self, children):
+        self.children = tuple(sorted(children, key=lambda node: node.cost))
+        self.cost = sum(node.cost for node in self.children)
+
+    def compute(self, engine):
+        return all(engine.rule_value(node) for node in self.children)
+
+
+class AnyNode(RuleNode):
+    __slots__ = ("children",)
+
+    def __init__(self, children):
+        self.children = tuple(sorted(children, key=lambda node: node.cost))
+        self.cost = sum(node.cost for node in self.children)
+
+    def compute(self, engine):
+        return any(engine.rule_value(node) for node in self.children)
+
+
+class NotNode(RuleNode):
+    __slots__ = ("child",)
+
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+
+    def compute(self, engine):
+        return not engine.rule_value(self.child)
+
+
+class ChangedNode(RuleNode):
+    """領域の画像が前回のティックから変わったか（OCR 不要）"""
+
+    __slots__ = ("key", "expected")
+
+    def __init__(self, key, expected):
+        self.key = key
+        self.expected = expected
+        self.cost = COST_CHANGED
+
+    def compute(self, engine):
+        return engine.changed(self.key) == self.expected
+
+
+class PixelsNode(RuleNode):
+    """ピクセル領域の色が一致したか（キャプチャ時に判定済み）"""
+
+    __slots__ = ("region", "expected")
+
+    def __init__(self, region, expected):
+        self.region = region
+        self.expected = expected
+        self.cost = COST_PIXELS
+
+    def compute(self, engine):
+        ratio = engine.pixel_ratio(self.region)
+        return (ratio is not None and ratio >= self.region.pixels.ratio) == self.expected
+
+
+class ContainsNode(RuleNode):
+    __slots__ = ("key", "text")
+
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+        self.cost = COST_OCR
+
+    def compute(self, engine):
+        return self.text in engine.read(self.key).normalized
+
+
+class EqualsNode(RuleNode):
+    __slots__ = ("key", "text")
+
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+        self.cost = COST_OCR
+
+    def compute(self, engine):
+        return engine.read(self.key).normalized == self.text
+
+
+class ConditionNode(RuleNode):
+    """数値条件（変化量は、このノードを前回評価した時の値との差）"""
+
+    __slots__ = ("key", "condition", "ident")
+
+    def __init__(self, key, condition, ident=None):
+        self.key = key
+        self.condition = condition
+        self.cost = COST_OCR
+        # 前回値を再コンパイル後も引き継ぐためのキー（同じセット・矩形・条件式なら同じ）
+        self.ident = ident if ident is not None else ("", key, id(self))
+
+    def compute(self, engine):
+        value = engine.read(self.key).number
+        previous = engine.last_value(self, value)
+        return value is not None and self.condition.test(value, previous)
+
+
+class CompiledRule:
+    """コンパイル済みのルール（on_trigger には領域と同じく name / actions を持つオブジェクトとして渡す）"""
+
+    __slots__ = ("name", "root", "actions", "keys", "trigger", "ident")
+
+    def __init__(self, name, root, actions, keys, trigger=None, ident=None):
+        self.name = name
+        self.root = root
+        self.actions = actions
+        self.keys = keys  # 参照している領域の ReadKey
+        self.trigger = trigger  # TriggerPolicy（領域と同じ trigger / cooldown / max_rate）
+        # トリガーの状態を再コンパイル後も引き継ぐためのキー（セット名, "rule", ルール名, 同名の何番目か）
+        self.ident = ident if ident is not None else ("", "rule", name, 0)
+
+    def __repr__(self):
+        return f"CompiledRule({self.name!r})"
+
+
+def walk_nodes(root):
+    """ノードとその子孫を列挙する（共有されたノードは1回だけ）"""
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        yield node
+        if isinstance(node, (AllNode, AnyNode)):
+            stack.extend(node.children)
+        elif isinstance(node, NotNode):
+            stack.append(node.child)
+
+
+# ===== コンパイル =====
+def referenced_regions(rules):
+    """ルールが参照している領域名の集合"""
+    names = set()
+
+    def walk(expr):
+        if isinstance(expr, dict):
+            if "region" in expr:
+                names.add(str(expr["region"]))
+            for value in expr.values():
+                walk(value)
+        elif isinstance(expr, list):
+            for item in expr:
+                walk(item)
+
+    for rule in rules or ():
+        if isinstance(rule, dict):
+            walk(rule.get("when"))
+    return names
+
+
+class _RuleCompiler:
+    def __init__(self, regions_by_name, set_name=""):
+        self.regions_by_name = regions_by_name
+        self.set_name = set_name
+        self.nodes = {}  # 正規化した条件式 -> ノード（同じ条件式は共有する）
+
+    def intern(self, signature, factory):
+        node = self.nodes.get(signature)
+        if node is None:
+            node = self.nodes[signature] = factory()
+        return node
+
+    def compile(self, expr, where, keys):
+        if not isinstance(expr, dict) or not expr:
+            raise RegionConfigError(f"{where}: 条件式の形式が不正です")
+        if "all" in expr or "any" in expr:
+            kind = "all" if "all" in expr else "any"
+            items = expr[kind]
+            if not isinstance(items, list) or not items:
+                raise RegionConfigError(f"{where}: '{kind}' には条件式のリストを指定してください")
+            children = [self.compile(item, where, keys) for item in items]
+            if len(children) == 1:
+                return children[0]
+            signature = (kind, frozenset(id(child) for child in children))
+            node_type = AllNode if kind == "all" else AnyNode
+            return self.intern(signature, lambda: node_type(children))
+        if "not" in expr:
+            child = self.compile(expr["not"], where, keys)
+            return self.intern(("not", id(child)), lambda: NotNode(child))
+
+        name = expr.get("region")
+        region = self.regions_by_name.get(str(name)) if name is not None else None
+        if region is None:
+            raise RegionConfigError(f"{where}: 領域 '{name}' がありません（無効な領域は参照できません）")
+        if region.pixels is not None:
+            if "pixels" not in expr:
+                raise RegionConfigError(f"{where}: ピクセル領域 '{name}' には 'pixels' の条件のみ指定できます")
+            expected = bool(expr["pixels"])
+            return self.intern(("pixels", region, expected), lambda: PixelsNode(region, expected))
+        if "pixels" in expr:
+            raise RegionConfigError(f"{where}: 領域 '{name}' はピクセル領域ではありません")
+        key = region.key
+        keys.add(key)
+        if "contains" in expr:
+            text = normalize_text(expr["contains"])
+            return self.intern(("contains", key, text), lambda: ContainsNode(key, text))
+        if "equals" in expr:
+            text = normalize_text(expr["equals"])
+            return self.intern(("equals", key, text), lambda: EqualsNode(key, text))
+        if "condition" in expr:
+            condition = compile_condition(expr["condition"], where)
+            if condition is None:
+                raise RegionConfigError(f"{where}: 数値条件が空です")
+            signature = ("condition", key, config_fingerprint(expr["condition"]))
+            return self.intern(signature, lambda: ConditionNode(key, condition, (self.set_name,) + signature))
+        if "changed" in expr:
+            expected = bool(expr["changed"])
+            return self.intern(("changed", key, expected), lambda: ChangedNode(key, expected))
+        raise RegionConfigError(f"{where}: 領域 '{name}' に対する条件（contains / equals / condition / changed）がありません")
+
+
+def compile_rules(rules, regions, backend, sleep, set_name=""):
+    """ルールのリストを CompiledRule のタプルに変換（regions はコンパイル済みの領域、set_name は識別子に使う）"""
+    if not rules:
+        return ()
+    if not isinstance(rules, list):
+        raise RegionConfigError("ルールはリストで指定してください")
+    regions_by_name = {}
+    for region in regions:
+        regions_by_name.setdefault(region.name, region)
+    compiler = _RuleCompiler(regions_by_name, set_name)
+    compiled = []
+    occurrences = {}
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise RegionConfigError(f"ルール{index + 1}: 形式が不正です")
+        if not rule.get("enabled", True):
+            continue
+        name = str(rule.get("name") or f"ルール_{index + 1}")
+        where = f"[ルール {name}]"
+        keys = set()
+        root = compiler.compile(rule.get("when"), where, keys)
+        actions = tuple(
+            compile_action(action, backend, sleep, f"{where} アクション{i + 1}")
+            for i, action in enumerate(rule.get("actions", []))
+        )
+        count = occurrences[name] = occurrences.get(name, -1) + 1
+        compiled.append(CompiledRule(name, root, actions, frozenset(keys), compile_trigger_policy(rule, where),
+                                     (set_name, "rule", name, count)))
+    return tuple(compiled)
@@ -0,0 +1,112 @@
+"""
+監視領域の空間インデックス
+矩形を一定サイズのセル（一様グリッド）に登録し、重なり検索・近接した領域のまとめ・変化矩形からの領域逆引きに使う
+矩形は (x, y, width, height) のタプル（Rect も可）
+"""
+
+from collections import defaultdict
+
+
+def rects_overlap(a, b, gap=0):
+    """2つの矩形が重なるか（gap を指定すると、その距離以内で近接している場合も含む）"""
+    return (a[0] < b[0] + b[2] + gap and b[0] < a[0] + a[2] + gap
+            and a[1] < b[1] + b[3] + gap and b[1] < a[1] + a[3] + gap)
+
+
+def bounding_box(rects):
+    """矩形群を囲む最小の矩形 (x, y, width, height)"""
+    left = min(r[0] for r in rects)
+    top = min(r[1] for r in rects)
+    right = max(r[0] + r[2] for r in rects)
+    bottom = max(r[1] + r[3] for r in rects)
+    return (left, top, right - left, bottom - top)
+
+
+class GridIndex:
+    """一様グリッドによる矩形の空間インデックス
+
+    検索は矩形が掛かるセルだけを調べるので、領域数に関係なく周辺の矩形数に比例した時間で済む。
+    """
+
+    def __init__(self, cell=128):
+        self.cell = cell
+        self._cells = defaultdict(list)
+        self._rects = []
+        self._items = []
+
+    def __len__(self):
+        return len(self._rects)
+
+    def _keys(self, rect, gap=0):
+        cell = self.cell
+        c0 = (rect[0] - gap) // cell
+        c1 = (rect[0] + rect[2] - 1 + gap) // cell
+        r0 = (rect[1] - gap) // cell
+        r1 = (rect[1] + rect[3] - 1 + gap) // cell
+        for row in range(r0, r1 + 1):
+            for col in range(c0, c1 + 1):
+                yield col, row
+
+    def insert(self, rect, item=None):
+        """矩形を登録し、登録番号を返す（item を省略すると矩形自体を返す）"""
+        number = len(self._rects)
+        self._rects.append(rect)
+        self._items.append(rect if item is None else item)
+        for key in self._keys(rect):
+            self._cells[key].append(number)
+        return number
+
+    def query_numbers(self, rect, gap=0):
+        """rect と重なる（gap 以内で近接する）登録済み矩形の登録番号（登録順）"""
+        found = set()
+        for key in self._keys(rect, gap):
+            for number in self._cells.get(key, ()):
+                if number not in found and rects_overlap(rect, self._rects[number], gap):
+                    found.add(number)
+        return sorted(found)
+
+    def query(self, rect, gap=0):
+        """rect と重なる登録済みの item（登録順）"""
+        return [self._items[number] for number in self.query_numbers(rect, gap)]
+
+    def overlapping_pairs(self):
+        """重なっている登録済み item の組 [(先に登録した item, 後に登録した item), ...]"""
+        pairs = []
+        for number, rect in enumerate(self._rects):
+            for other in self.query_numbers(rect):
+                if other > number:
+                    pairs.append((self._items[number], self._items[other]))
+        return pairs
+
+
+def cluster_rects(rects, gap=64, cell=128):
+    """近接した矩形をまとめて、少数のキャプチャ矩形にする
+
+    gap 以内で隣り合う矩形を同じクラスタにし、クラスタの外接矩形同士が重なる場合はさらにまとめる。
+    戻り値は [(外接矩形, [矩形, ...]), ...]（最初に現れた矩形の順）。
+    """
+    clusters = [(tuple(rect), [rect]) for rect in rects]
+    while True:
+        index = GridIndex(cell)
+        for bbox, _ in clusters:
+            index.insert(bbox)
+        parent = list(range(len(clusters)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for number, (bbox, _) in enumerate(clusters):
+            for other in index.query_numbers(bbox, gap):
+                a, b = find(number), find(other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        merged = {}
+        for number, (_, members) in enumerate(clusters):
+            merged.setdefault(find(number), []).extend(members)
+        if len(merged) == len(clusters):
+            return clusters
+        clusters = [(bounding_box(members), members) for members in merged.values()]
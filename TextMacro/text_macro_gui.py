@@ -5,7 +5,7 @@ AutoClickerの設計を参考にした改良版
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import numpy as np
 import pyautogui
 import pynput
@@ -13,24 +13,40 @@ from pynput import mouse, keyboard as pynput_keyboard
 import json
 import time
 import threading
-from PIL import Image, ImageGrab, ImageTk
+from PIL import ImageGrab, ImageTk
 import os
 import subprocess
 import sys
 import platform
 import datetime
 
-# Tesseractの動的インポート
-TESSERACT_AVAILABLE = False
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
+# リポジトリ直下の共通モジュールを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cancellation import StopSignal
+from json_store import DebouncedJsonWriter, atomic_write_json
+from region_model import (DEFAULT_OCR_PROFILE, RegionConfigError, compile_condition, compile_ocr_profile,
+                          compile_region, compile_region_sets, Rect, config_fingerprint, normalize_text,
+                          parse_number)
+from monitor_engine import MonitorEngine, words_confidence
+from pixel_check import PixelBatch, compile_pixel_check
+from config_watcher import ConfigWatcher
+from ocr_tuner import SAMPLES_DIR, save_sample
+from ocr_engines import (TESSERACT_AVAILABLE, configure_tesseract, easyocr_recognize_batch, easyocr_text,
+                         easyocr_words, set_torch_threads, tesseract_text, tesseract_words)
+
+# Tesseractの動的インポート（ocr_engines で実施）
+if not TESSERACT_AVAILABLE:
     print("警告: pytesseractがインストールされていません")
 
 # EasyOCRの動的インポート（代替OCRエンジン）
 EASYOCR_AVAILABLE = False
 
+# アクションとアクションの間の待機（秒、停止要求で中断できる）
+ACTION_GAP = 0.1
+# 停止時に監視スレッドの終了を待つ最長時間（秒）
+STOP_JOIN_TIMEOUT = 0.5
+
 class TextMacroGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -42,15 +58,32 @@ class TextMacroGUI:
         self.config_file = "config.json"
         self.regions_file = "regions.json"
         
+        # 領域データは連続編集をまとめてバックグラウンドで保存する（コピーは書き込み直前に UI スレッドで1回だけ取る）
+        self.regions_writer = DebouncedJsonWriter(
+            self.regions_file, self.regions_snapshot,
+            on_written=self.on_regions_written, on_error=self.on_regions_save_error,
+            call_on_ui=lambda callback: self.root.after(0, callback), on_snapshot=self.on_regions_snapshot)
+        
         # データ管理
         self.config = self.load_config()
         self.monitoring_regions = {}  # 監視領域セット
         self.current_region_set = "デフォルト"
+        self.concurrent_sets = []  # 現在のセットと同時に監視するセット
+        self.region_rules = {}  # セット名 -> 複数の領域を組み合わせたルール（regions.json の rules）
         self.max_region_sets = 20
         
         # 監視状態
         self.running = False
         self.monitoring_thread = None
+        # 緊急停止で監視ループの待機とアクションの待機をすぐに中断する
+        self.stop_signal = StopSignal()
+        self.compiled_sets = {}  # start_monitoring でコンパイルした全領域セット
+        # 監視中の再コンパイルは1つのスレッドで順に行い、まだ始まっていない古い依頼は新しい依頼で置き換える
+        # 世代番号より古い結果（start_monitoring でコンパイルし直した後など）は反映しない
+        self.recompile_condition = threading.Condition()
+        self.recompile_request = None
+        self.recompile_thread = None
+        self.compile_generation = 0
         
         # 領域選択状態
         self.selection_window = None
@@ -66,9 +99,28 @@ class TextMacroGUI:
         self.ocr_engine = None
         self.setup_ocr()
         
+        # 監視エンジン（キャプチャ・OCRキャッシュ・OCRワーカーは全セットで共有）
+        # EasyOCRのReaderはスレッドセーフではないので1ワーカーに制限する
+        ocr_workers = self.config.get("ocr_workers", 2) if self.ocr_engine == 'tesseract' else 1
+        # 他の領域に含まれる領域は外側の領域の単語位置から切り出して OCR を共有する
+        share_contained = self.config.get("share_contained_ocr", True)
+        # EasyOCR の認識のみモード: 文字検出を省略し、ティック内の全領域を1回の推論でまとめて認識する
+        recognize_batch = None
+        if self.ocr_engine == 'easyocr' and self.config.get("easyocr_recognize_only", False):
+            recognize_batch = self.recognize_batch_easyocr
+        # 領域が多い場合はフレームをタイルに分けて変化した部分の領域だけをハッシュ・OCRする
+        self.engine = MonitorEngine(self.capture_bbox, self.extract_text_from_image,
+                                    self.on_region_triggered, self.log_threadsafe, workers=ocr_workers,
+                                    recognize_words=self.extract_words_from_image if self.ocr_engine else None,
+                                    share_contained=share_contained,
+                                    tile_min_regions=self.config.get("tile_change_map_min_regions", 500),
+                                    capture_gap=self.config.get("capture_cluster_gap", 64),
+                                    recognize_batch=recognize_batch)
+        
         # pyautoguiの設定
         pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.1
+        # 入力ごとの待機は停止要求で中断できないので無効にし、アクション間の待機は run_compiled_actions で行う
+        pyautogui.PAUSE = 0
         
         # 保存された領域データを読み込み
         self.load_regions()
@@ -82,6 +134,10 @@ class TextMacroGUI:
         # データ表示を更新
         self.update_region_sets_list()
         self.update_regions_list()
+        
+        # 設定ファイルの外部変更を監視（監視中でも反映する）
+        self.config_watcher = ConfigWatcher([self.config_file, self.regions_file], self.on_config_file_changed)
+        self.config_watcher.start()
     
     def setup_shortcuts(self):
         """ショートカットキーを設定"""
@@ -93,6 +149,10 @@ class TextMacroGUI:
             keyboard.add_hotkey('f8', self.emergency_stop, suppress=True)
             keyboard.add_hotkey('ctrl+alt+x', self.emergency_stop, suppress=True)
             keyboard.add_hotkey('esc', self.emergency_stop, suppress=True)
+            # 監視領域セットの切り替え（監視中でも即時反映）
+            # Ctrl+Alt は AltGr として文字入力に使われるので、キーは握りつぶさずアプリにも渡す
+            for i in range(1, 10):
+                keyboard.add_hotkey(f'ctrl+alt+{i}', lambda index=i - 1: self.switch_region_set_by_index(index))
         except Exception as e:
             print(f"ショートカットキー設定エラー: {e}")
             
@@ -110,6 +170,8 @@ class TextMacroGUI:
             
     def emergency_stop(self):
         """緊急停止"""
+        # GUI の処理より先にワーカーを止める
+        self.stop_signal.request()
         if self.running:
             self.stop_monitoring()
         if self.is_selecting_region:
@@ -139,33 +201,18 @@ class TextMacroGUI:
     
     def setup_ocr(self):
         """OCRエンジンをセットアップ"""
-        global TESSERACT_AVAILABLE, EASYOCR_AVAILABLE
+        global TESSERACT_AVAILABLE
         
         # Tesseractの設定を試行
         if TESSERACT_AVAILABLE:
             try:
-                # Windowsでの一般的なTesseractパスを試行
-                possible_paths = [
-                    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-                    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
-                    r'C:\Users\{}\AppData\Local\Programs\Tesseract-OCR\tesseract.exe'.format(os.environ.get('USERNAME', '')),
-                ]
-                
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        pytesseract.pytesseract.tesseract_cmd = path
-                        # テスト実行
-                        test_img = Image.new('RGB', (100, 30), color='white')
-                        pytesseract.image_to_string(test_img)
-                        self.ocr_engine = 'tesseract'
-                        print(f"Tesseract を設定しました: {path}")
-                        return
-                
-                # パスが見つからない場合、デフォルトで試行
-                test_img = Image.new('RGB', (100, 30), color='white')
-                pytesseract.image_to_string(test_img)
+                # Windowsでの一般的なTesseractパスを試行し、見つからない場合はデフォルトで試行
+                path = configure_tesseract()
                 self.ocr_engine = 'tesseract'
-                print("Tesseract をデフォルト設定で使用します")
+                if path:
+                    print(f"Tesseract を設定しました: {path}")
+                else:
+                    print("Tesseract をデフォルト設定で使用します")
                 return
                 
             except Exception as e:
@@ -176,6 +223,8 @@ class TextMacroGUI:
         try:
             import easyocr
             try:
+                # PyTorch のスレッド数（既定は CPU コア数の半分。画面キャプチャ側の CPU を残す）
+                set_torch_threads(self.config.get("easyocr_threads", max(1, (os.cpu_count() or 2) // 2)))
                 self.easyocr_reader = easyocr.Reader(['ja', 'en'])
                 self.ocr_engine = 'easyocr'
                 print("EasyOCR を使用します")
@@ -210,6 +259,8 @@ class TextMacroGUI:
                     data = json.load(f)
                     self.monitoring_regions = data.get('region_sets', {})
                     self.current_region_set = data.get('current_set', "デフォルト")
+                    self.concurrent_sets = data.get('concurrent_sets', [])
+                    self.region_rules = data.get('rules', {})
                     print(f"監視領域データを読み込みました: {len(self.monitoring_regions)}セット")
         except Exception as e:
             print(f"監視領域データ読み込みエラー: {e}")
@@ -220,23 +271,39 @@ class TextMacroGUI:
         """設定ファイルを保存"""
         # ウィンドウサイズも保存
         self.config["window_geometry"] = self.root.geometry()
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, ensure_ascii=False, indent=2)
+        atomic_write_json(self.config_file, self.config)
+        if hasattr(self, 'config_watcher'):
+            self.config_watcher.mark_written(self.config_file)
     
     def save_regions(self):
-        """監視領域データを保存"""
-        try:
-            data = {
-                'region_sets': self.monitoring_regions,
-                'current_set': self.current_region_set,
-                'last_saved': datetime.datetime.now().isoformat()
-            }
-            with open(self.regions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"監視領域データを保存しました: {len(self.monitoring_regions)}セット")
-        except Exception as e:
-            print(f"監視領域データ保存エラー: {e}")
-            messagebox.showerror("エラー", f"データの保存に失敗しました: {e}")
+        """監視領域データを保存（少し待ってからバックグラウンドで書き込み、監視中ならエンジンにも反映する）"""
+        self.regions_writer.schedule()
+    
+    def regions_snapshot(self):
+        """regions.json に書き込む内容"""
+        return {
+            'region_sets': self.monitoring_regions,
+            'current_set': self.current_region_set,
+            'concurrent_sets': self.concurrent_sets,
+            'rules': self.region_rules,
+            'last_saved': datetime.datetime.now().isoformat()
+        }
+    
+    def on_regions_snapshot(self, data):
+        """保存用のコピーを取った時に UI スレッドで呼ばれ、同じコピーで監視中のエンジンを再コンパイルする"""
+        if self.running:
+            self.request_recompile(data['region_sets'], data['current_set'], data['rules'])
+    
+    def on_regions_written(self, path):
+        """領域データの書き込み完了（保存スレッドから呼ばれる）"""
+        if hasattr(self, 'config_watcher'):
+            self.config_watcher.mark_written(path)
+        print(f"監視領域データを保存しました: {len(self.monitoring_regions)}セット")
+    
+    def on_regions_save_error(self, error):
+        """領域データの書き込み失敗（保存スレッドから呼ばれる）"""
+        print(f"監視領域データ保存エラー: {error}")
+        self.root.after(0, lambda: messagebox.showerror("エラー", f"データの保存に失敗しました: {error}"))
     
     def get_current_regions(self):
         """現在選択中の監視領域リストを取得"""
@@ -335,7 +402,8 @@ class TextMacroGUI:
         shortcuts_frame = ttk.LabelFrame(parent, text="ショートカットキー", padding="10")
         shortcuts_frame.grid(row=row, column=0, columnspan=2, pady=(0, 15), sticky=(tk.W, tk.E))
         
-        shortcuts_text = """F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止  |  Ctrl+Alt+X: 緊急停止  |  ESC: 緊急停止"""
+        shortcuts_text = """F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止  |  Ctrl+Alt+X: 緊急停止  |  ESC: 緊急停止
+Ctrl+Alt+1〜9: 監視領域セットを切り替え（一覧の順番）"""
         
         ttk.Label(shortcuts_frame, text=shortcuts_text, font=("Arial", 10, "bold")).pack()
     
@@ -399,22 +467,26 @@ class TextMacroGUI:
         ttk.Button(buttons_frame, text="セットを削除", 
                   command=self.delete_selected_region_set).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(buttons_frame, text="現在の領域をクリア", 
-                  command=self.clear_current_regions).pack(side=tk.LEFT)
+                  command=self.clear_current_regions).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="同時監視を切り替え", 
+                  command=self.toggle_concurrent_set).pack(side=tk.LEFT)
         
         # セットリスト
         list_frame = ttk.Frame(sets_frame)
         list_frame.pack(fill=tk.BOTH, expand=True)
         
-        columns = ("セット名", "領域数", "作成日時")
+        columns = ("セット名", "領域数", "作成日時", "同時監視")
         self.sets_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=4)
         
         self.sets_tree.heading("セット名", text="セット名")
         self.sets_tree.heading("領域数", text="領域数")
         self.sets_tree.heading("作成日時", text="作成日時")
+        self.sets_tree.heading("同時監視", text="同時監視")
         
         self.sets_tree.column("セット名", width=200)
         self.sets_tree.column("領域数", width=80)
         self.sets_tree.column("作成日時", width=150)
+        self.sets_tree.column("同時監視", width=80)
         
         self.sets_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
@@ -538,6 +610,7 @@ class TextMacroGUI:
 
 ⚡ ショートカットキー:
 F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
+Ctrl+Alt+1〜9: 監視領域セット切り替え
         """
         
         ttk.Label(help_frame, text=help_text, justify=tk.LEFT, 
@@ -555,6 +628,10 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         self.log_text.see(tk.END)
         self.root.update_idletasks()
         
+    def log_threadsafe(self, message):
+        """ワーカースレッドからログを表示"""
+        self.root.after(0, lambda: self.log(message))
+        
     def clear_log(self):
         """ログをクリア"""
         self.log_text.delete('1.0', tk.END)
@@ -580,7 +657,8 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
             region_count = len(regions)
             # 作成日時は仮の値（実際は保存時に記録）
             created_at = "未記録"
-            self.sets_tree.insert("", tk.END, values=(set_name, region_count, created_at))
+            concurrent = "有効" if set_name in self.concurrent_sets else ""
+            self.sets_tree.insert("", tk.END, values=(set_name, region_count, created_at, concurrent))
     
     def update_regions_list(self):
         """現在の監視領域リストを更新"""
@@ -641,15 +719,35 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         set_name = self.sets_tree.item(item, "values")[0]
         
         if set_name in self.monitoring_regions:
-            self.current_region_set = set_name
-            self.current_set_label.config(text=set_name)
-            
-            self.update_regions_list()
+            if not self.switch_region_set(set_name):
+                messagebox.showerror("エラー", f"監視領域セット '{set_name}' に切り替えできません（設定エラー）")
+                return
+            self.refresh_current_set_view()
             self.log(f"監視領域セット '{set_name}' を読み込みました")
             messagebox.showinfo("成功", f"監視領域セット '{set_name}' を読み込みました")
         else:
             messagebox.showerror("エラー", "選択されたセットが見つかりません")
     
+    def toggle_concurrent_set(self):
+        """選択されたセットを同時監視に追加/解除"""
+        selected = self.sets_tree.selection()
+        if not selected:
+            messagebox.showerror("エラー", "同時監視を切り替えるセットを選択してください")
+            return
+        
+        set_name = self.sets_tree.item(selected[0], "values")[0]
+        if set_name in self.concurrent_sets:
+            self.concurrent_sets.remove(set_name)
+            self.log(f"監視領域セット '{set_name}' を同時監視から外しました")
+        else:
+            self.concurrent_sets.append(set_name)
+            self.log(f"監視領域セット '{set_name}' を同時監視に追加しました")
+        
+        if self.running:
+            self.engine.set_concurrent([n for n in self.concurrent_sets if n in self.compiled_sets])
+        self.update_region_sets_list()
+        self.save_regions()
+    
     def delete_selected_region_set(self):
         """選択されたセットを削除"""
         selected = self.sets_tree.selection()
@@ -663,6 +761,8 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         if messagebox.askyesno("確認", f"監視領域セット '{set_name}' を削除しますか？"):
             if set_name in self.monitoring_regions:
                 del self.monitoring_regions[set_name]
+                if set_name in self.concurrent_sets:
+                    self.concurrent_sets.remove(set_name)
                 
                 # 現在のセットが削除された場合、デフォルトに戻す
                 if self.current_region_set == set_name:
@@ -756,20 +856,35 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
             region = current_regions[region_index]
             
             try:
-                # 主領域をキャプチャ
+                if region.get("pixels"):
+                    self.test_pixel_region(region)
+                    return
+                # 主領域をキャプチャ（領域の OCR 設定で認識）
+                profile = compile_ocr_profile(region.get("ocr"), f"[{region['name']}] OCR設定")
+                language = self.config.get("ocr_language", "jpn+eng")
                 image = self.capture_region(region["x"], region["y"], region["width"], region["height"])
-                text = self.extract_text_from_image(image)
+                text = self.extract_text_from_image(image, language, profile)
 
                 result = f"領域: {region['name']}\n"
                 result += f"座標: ({region['x']}, {region['y']}, {region['width']}, {region['height']})\n"
                 result += f"検索文字: '{region.get('target_text', '')}'\n"
                 result += f"検出された文字: '{text}'\n"
+                if self.ocr_engine:
+                    confidence = words_confidence(self.extract_words_from_image(image, language, profile))
+                    if confidence is not None:
+                        result += f"確信度: {confidence:.0f} (下限: {region.get('min_confidence', 0)})\n"
+                condition = compile_condition(region.get("condition"), f"[{region['name']}] 数値条件")
+                if condition is not None:
+                    number = parse_number(normalize_text(text))
+                    satisfied = number is not None and not condition.delta and condition.test(number, None)
+                    result += f"読み取った数値: {number if number is not None else 'なし'} / 条件: {condition.label}"
+                    result += f" / 判定: {'はい' if satisfied else 'いいえ'}\n" if not condition.delta else "\n"
 
                 # 比較領域が設定されている場合は追加で比較
                 if region.get('compare_enabled') and region.get('compare_region'):
                     cr = region['compare_region']
                     cmp_img = self.capture_region(cr['x'], cr['y'], cr['width'], cr['height'])
-                    cmp_text = self.extract_text_from_image(cmp_img)
+                    cmp_text = self.extract_text_from_image(cmp_img, language, profile)
                     match = self.compare_texts(text, cmp_text)
                     result += f"比較領域の検出文字: '{cmp_text}'\n"
                     result += f"主領域と比較領域の一致: {'はい' if match else 'いいえ'}\n"
@@ -779,10 +894,41 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
 
                 messagebox.showinfo("テスト結果", result)
                 self.log(f"テスト実行: {region['name']} - 検出文字: '{text}'")
+                self.offer_ocr_sample(region['name'], image, text)
 
             except Exception as e:
                 messagebox.showerror("エラー", f"テストに失敗しました: {e}")
     
+    def test_pixel_region(self, region):
+        """ピクセル領域をテスト（範囲内の点の割合を表示）"""
+        rect = Rect(region["x"], region["y"], region["width"], region["height"])
+        check = compile_pixel_check(region["pixels"], rect, f"[{region['name']}] ピクセル条件")
+        image = self.capture_region(rect.x, rect.y, rect.width, rect.height)
+        ratio = PixelBatch([(check, 0, 0)]).evaluate(image)
+        if ratio is None:
+            raise ValueError("キャプチャした画像が領域より小さいため判定できません")
+        ratio = float(ratio[0])
+        result = f"領域: {region['name']}\n"
+        result += f"ピクセル条件: {check.label}\n"
+        result += f"範囲内の点: {ratio * 100:.1f}%\n"
+        result += f"一致: {'はい' if ratio >= check.ratio else 'いいえ'}"
+        messagebox.showinfo("テスト結果", result)
+        self.log(f"テスト実行: {region['name']} - 範囲内の点 {ratio * 100:.1f}%")
+    
+    def offer_ocr_sample(self, region_name, image, text):
+        """テストのキャプチャを OCR 設定の自動調整（ocr_tuner.py）用のサンプルとして保存"""
+        if not messagebox.askyesno("サンプル保存", "このキャプチャをOCR調整用のサンプルとして保存しますか？"):
+            return
+        label = simpledialog.askstring("サンプル保存", "正しい文字列を入力してください:",
+                                       initialvalue=text, parent=self.root)
+        if label is None:
+            return
+        try:
+            path = save_sample(SAMPLES_DIR, self.current_region_set, region_name, image, label)
+            self.log(f"OCRサンプルを保存しました: {path}")
+        except Exception as e:
+            messagebox.showerror("エラー", f"サンプルの保存に失敗しました: {e}")
+    
     def preview_region(self):
         """選択された監視領域をプレビュー"""
         selected = self.regions_tree.selection()
@@ -814,7 +960,37 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
             if not messagebox.askyesno("確認", "OCRエンジンが設定されていません。簡易モードで続行しますか？"):
                 return
         
+        # 全セットをコンパイルしておき、監視中はホットキーで即座に切り替えられるようにする
+        compiled, errors = compile_region_sets(self.monitoring_regions, pyautogui,
+                                               sleep=self.stop_signal.sleep, previous=self.compiled_sets,
+                                               limit=self.max_region_sets, rules=self.region_rules)
+        if self.current_region_set in errors:
+            messagebox.showerror("エラー", f"監視領域の設定が不正です: {errors[self.current_region_set]}")
+            return
+        for set_name, error in errors.items():
+            self.log(f"監視領域セット '{set_name}' は切り替え対象外です: {error}")
+        concurrent = [n for n in self.concurrent_sets if n in compiled]
+        if not any(compiled[n].regions for n in [self.current_region_set] + concurrent):
+            messagebox.showwarning("警告", "有効な監視領域がありません")
+            return
+        with self.recompile_condition:
+            self.compile_generation += 1
+            self.compiled_sets = compiled
+            self.engine.load(compiled, self.current_region_set, concurrent)
+        for set_name in [self.current_region_set] + concurrent:
+            overlaps = compiled[set_name].overlaps
+            if overlaps:
+                shown = ", ".join(f"{a.name}×{b.name}" for a, b in overlaps[:5])
+                more = f" 他{len(overlaps) - 5}組" if len(overlaps) > 5 else ""
+                self.log(f"セット '{set_name}': 重なっている領域 {len(overlaps)}組 ({shown}{more})")
+            if compiled[set_name].rules:
+                self.log(f"セット '{set_name}': ルール {len(compiled[set_name].rules)}件")
+        captures = len(self.engine.current_plan().captures)
+        if captures > 1:
+            self.log(f"画面キャプチャを{captures}か所に分けて行います")
+        
         self.running = True
+        self.stop_signal.reset()
         self.monitoring_thread = threading.Thread(target=self.monitor_worker)
         self.monitoring_thread.daemon = True
         self.monitoring_thread.start()
@@ -833,9 +1009,31 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
             self.log("監視は実行されていません")
             return
         
+        self.stop_signal.request()
         self.running = False
         if self.monitoring_thread:
-            self.monitoring_thread.join(timeout=2)
+            self.monitoring_thread.join(timeout=STOP_JOIN_TIMEOUT)
+            if self.monitoring_thread.is_alive():
+                self.log(f"監視スレッドが {STOP_JOIN_TIMEOUT} 秒以内に止まりませんでした（実行中の OCR の完了後に停止します）")
+        latency = self.stop_signal.stop_latency()
+        if latency is not None:
+            self.log(f"停止遅延: {latency * 1000:.1f} ms（停止要求から最後の入力まで）")
+        
+        # OCRとセットごとの統計
+        stats = self.engine.stats
+        self.log(f"OCR: 実行 {stats['ocr_calls']}回 / キャッシュ {stats['cache_hits']}回 / 領域の共有で削減 {stats['ocr_saved']}回"
+                 f" / タイル比較で省略 {stats['tile_skips']}回 / 否定キャッシュ {stats['negative_hits']}回"
+                 f" / 低確信度で不実行 {stats['low_confidence']}回"
+                 + (f" / 一括認識 {stats['batches']}回" if stats['batches'] else "")
+                 + (f" / 失敗 {stats['ocr_errors']}回" if stats['ocr_errors'] else "")
+                 + (f" / 連続一致待ち {stats['unconfirmed']}回" if stats['unconfirmed'] else "")
+                 + (f" / ルールで遅延実行 {stats['lazy_ocr']}回・省略 {stats['lazy_skips']}回"
+                    if stats['lazy_ocr'] or stats['lazy_skips'] else "")
+                 + (f" / ピクセル判定 {stats['pixel_points']}点" if stats['pixel_points'] else ""))
+        self.log(f"トリガー: 実行 {stats['fires']}回 / 一致継続で抑止 {stats['suppressed']}回"
+                 f" / クールダウン中 {stats['cooldowns']}回 / 最大頻度超過 {stats['rate_limited']}回")
+        for set_name, stats in self.engine.set_stats.items():
+            self.log(f"セット '{set_name}': 判定 {stats['evaluations']}回 / 実行 {stats['triggers']}回")
         
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
@@ -845,79 +1043,158 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         self.log("監視を停止しました")
         self.show_notification("監視を停止しました")
     
+    def switch_region_set(self, set_name):
+        """監視領域セットを切り替える（監視中は次のティックから反映、どのスレッドからも呼べる）"""
+        if set_name not in self.monitoring_regions:
+            return False
+        if self.running and not self.engine.switch(set_name):
+            self.log_threadsafe(f"監視領域セット '{set_name}' はコンパイルされていないため切り替えできません")
+            return False
+        self.current_region_set = set_name
+        # 現在のセットは regions.json にも保存する（次回起動時もこのセットから始める）
+        self.save_regions()
+        return True
+    
+    def switch_region_set_by_index(self, index):
+        """一覧の順番で監視領域セットを切り替える（ホットキー用）"""
+        names = list(self.monitoring_regions)
+        if 0 <= index < len(names) and self.switch_region_set(names[index]):
+            self.root.after(0, self.refresh_current_set_view)
+    
+    def refresh_current_set_view(self):
+        """現在のセット表示を更新"""
+        self.current_set_label.config(text=self.current_region_set)
+        self.update_regions_list()
+    
+    def request_recompile(self, region_sets, active, rules=None, concurrent_sets=None):
+        """再コンパイルを専用スレッドに依頼する（concurrent_sets を渡すと差し替え後に同時監視セットも設定）"""
+        with self.recompile_condition:
+            self.compile_generation += 1
+            self.recompile_request = (self.compile_generation, region_sets, active, rules, concurrent_sets)
+            if self.recompile_thread is None:
+                self.recompile_thread = threading.Thread(target=self.recompile_worker, daemon=True)
+                self.recompile_thread.start()
+            self.recompile_condition.notify()
+    
+    def recompile_worker(self):
+        """再コンパイルの依頼を順に処理する（待っている間に来た依頼は最新のものだけ処理する）"""
+        while True:
+            with self.recompile_condition:
+                while self.recompile_request is None:
+                    self.recompile_condition.wait()
+                request, self.recompile_request = self.recompile_request, None
+            try:
+                self.recompile_and_swap(*request)
+            except Exception as e:
+                self.log_threadsafe(f"監視領域の再コンパイルエラー: {e}")
+    
+    def recompile_and_swap(self, generation, region_sets, active, rules=None, concurrent_sets=None):
+        """領域セットを再コンパイルしてエンジンに差し替える（再コンパイル用のスレッドで実行）"""
+        previous = self.compiled_sets
+        compiled, errors = compile_region_sets(region_sets, pyautogui, sleep=self.stop_signal.sleep,
+                                               previous=previous, limit=self.max_region_sets, rules=rules)
+        with self.recompile_condition:
+            if generation != self.compile_generation:
+                # コンパイル中に新しい依頼が来た（またはコンパイルし直された）ので古い結果は捨てる
+                return
+            for set_name, error in errors.items():
+                if set_name in previous:
+                    # 不正な設定は反映せず、前の設定で監視を継続する
+                    compiled[set_name] = previous[set_name]
+                self.log_threadsafe(f"監視領域セット '{set_name}' の再読み込みに失敗しました: {error}")
+            self.compiled_sets = compiled
+            self.engine.swap(compiled, active if active in compiled else None)
+            if concurrent_sets is not None:
+                self.engine.set_concurrent([n for n in concurrent_sets if n in compiled])
+    
+    def on_config_file_changed(self, path):
+        """設定ファイルが外部で変更された（ファイル監視スレッドから呼ばれる）"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            # 書き込み途中の可能性があるので次の変更を待つ
+            self.log_threadsafe(f"設定ファイルの読み込みに失敗しました: {os.path.basename(path)}: {e}")
+            return
+        
+        if os.path.abspath(path) == os.path.abspath(self.config_file):
+            self.root.after(0, lambda: self.apply_reloaded_config(data))
+            return
+        
+        region_sets = data.get('region_sets', {})
+        set_name = data.get('current_set', self.current_region_set)
+        concurrent_sets = data.get('concurrent_sets', [])
+        rules = data.get('rules', {})
+        # 未保存の編集がある場合や自分で書き込んだ内容と同じ場合は反映しない
+        if self.regions_writer.pending:
+            return
+        if set_name == self.current_region_set and concurrent_sets == self.concurrent_sets and \
+                config_fingerprint(region_sets) == config_fingerprint(self.monitoring_regions) and \
+                config_fingerprint(rules) == config_fingerprint(self.region_rules):
+            return
+        if self.running:
+            self.request_recompile(region_sets, set_name, rules, concurrent_sets)
+        self.root.after(0, lambda: self.apply_reloaded_regions(region_sets, set_name, concurrent_sets, rules))
+    
+    def apply_reloaded_config(self, data):
+        """再読み込みした config.json を反映"""
+        for key in ("check_interval", "ocr_language"):
+            if key in data:
+                self.config[key] = data[key]
+        self.interval_var.set(self.config.get("check_interval", 1.0))
+        self.language_var.set(self.config.get("ocr_language", "jpn+eng"))
+        self.log("config.json の変更を反映しました")
+    
+    def apply_reloaded_regions(self, region_sets, set_name, concurrent_sets, rules=None):
+        """再読み込みした regions.json を反映"""
+        self.monitoring_regions = region_sets
+        self.current_region_set = set_name
+        self.concurrent_sets = concurrent_sets
+        self.region_rules = rules or {}
+        self.current_set_label.config(text=set_name)
+        self.update_region_sets_list()
+        self.update_regions_list()
+        self.log("regions.json の変更を反映しました")
+    
     def monitor_worker(self):
         """監視のメインループ"""
-        self.log("監視ループを開始しました")
+        self.log_threadsafe("監視ループを開始しました")
         
-        while self.running:
+        while self.running and not self.stop_signal.stopped:
             try:
-                current_regions = self.get_current_regions()
-                for region in current_regions:
-                    if not self.running:
-                        break
-                    
-                    # 無効な領域はスキップ
-                    if not region.get('enabled', True):
-                        continue
-                    
-                    name = region["name"]
-                    x, y = region["x"], region["y"]
-                    width, height = region["width"], region["height"]
-                    target_text = region["target_text"]
-                    actions = region.get("actions", [])
-                    
-                    # 領域をキャプチャ
-                    image = self.capture_region(x, y, width, height)
-                    
-                    # 文字を抽出
-                    detected_text = self.extract_text_from_image(
-                        image, 
-                        self.config.get("ocr_language", "jpn+eng")
-                    )
-                    
-                    # 比較領域が設定されている場合は、両方をOCRして一致判定
-                    compare_cfg = region.get('compare_region')
-                    compare_enabled = region.get('compare_enabled', False)
-                    compare_trigger_only = region.get('compare_trigger_only', False)
-
-                    should_trigger = False
-                    if compare_enabled and compare_cfg:
-                        try:
-                            cmp_img = self.capture_region(compare_cfg['x'], compare_cfg['y'], compare_cfg['width'], compare_cfg['height'])
-                            cmp_text = self.extract_text_from_image(cmp_img, self.config.get("ocr_language", "jpn+eng"))
-
-                            # 比較のみでトリガーするオプションがある場合は一致のみで判定
-                            if detected_text and self.compare_texts(detected_text, cmp_text):
-                                should_trigger = True
-                                self.root.after(0, lambda: self.log(f"[{name}] 比較領域と一致: '{detected_text}' == '{cmp_text}' -> アクション実行"))
-                            elif not compare_trigger_only:
-                                # 比較は有効だがターゲット文字列も指定されている場合はそれでも判定する
-                                if detected_text and self.check_text_match(detected_text, target_text):
-                                    should_trigger = True
-                                    self.root.after(0, lambda: self.log(f"[{name}] 文字が一致: '{detected_text}' → アクション実行"))
-                        except Exception as e:
-                            self.root.after(0, lambda: self.log(f"[{name}] 比較領域OCRエラー: {e}"))
-                    else:
-                        # 通常のターゲット文字列照合
-                        if detected_text and self.check_text_match(detected_text, target_text):
-                            should_trigger = True
-                            self.root.after(0, lambda: self.log(f"[{name}] 文字が一致: '{detected_text}' → アクション実行"))
-
-                    if should_trigger:
-                        for action in actions:
-                            if not self.running:
-                                break
-                            self.execute_action(action)
-                            time.sleep(0.1)
+                self.engine.tick(self.config.get("ocr_language", "jpn+eng"),
+                                 lambda: self.running and not self.stop_signal.stopped)
                 
-                # 次のチェックまで待機
-                time.sleep(self.config.get("check_interval", 1.0))
+                # 次のチェックまで待機（停止要求ですぐに抜ける）
+                self.stop_signal.sleep(self.config.get("check_interval", 1.0))
                 
             except Exception as e:
-                self.root.after(0, lambda: self.log(f"監視エラー: {e}"))
-                time.sleep(1)
+                self.log_threadsafe(f"監視エラー: {e}")
+                self.stop_signal.sleep(1)
         
-        self.root.after(0, lambda: self.log("監視ループを終了しました"))
+        self.log_threadsafe("監視ループを終了しました")
+    
+    def on_region_triggered(self, region):
+        """領域のトリガー条件が成立した"""
+        self.run_compiled_actions(region.actions)
+    
+    def run_compiled_actions(self, actions):
+        """コンパイル済みアクションを順に実行"""
+        for action in actions:
+            try:
+                for step in action.steps:
+                    # 入力を送る直前に停止要求を確認する（テキスト入力は1文字ごと）
+                    if not self.running or self.stop_signal.stopped:
+                        return
+                    step()
+                    if action.kind != "wait":
+                        self.stop_signal.input_sent()
+                self.log_threadsafe(action.label)
+            except Exception as e:
+                self.log_threadsafe(f"アクション実行エラー: {e}")
+            # アクション間の待機（停止要求ですぐに抜ける）
+            if self.stop_signal.sleep(ACTION_GAP):
+                break
     
     # ===== 基本機能（実装が必要な関数群） =====
     def capture_region(self, x, y, width, height):
@@ -928,27 +1205,44 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         except Exception as e:
             raise Exception(f"画面キャプチャエラー: {e}")
     
-    def extract_text_from_image(self, image, language="jpn+eng"):
-        """画像から文字を抽出"""
+    def capture_bbox(self, bbox):
+        """事前計算済みの bbox (left, top, right, bottom) でキャプチャ"""
+        try:
+            return np.array(ImageGrab.grab(bbox=bbox))
+        except Exception as e:
+            raise Exception(f"画面キャプチャエラー: {e}")
+    
+    def extract_text_from_image(self, image, language="jpn+eng", profile=DEFAULT_OCR_PROFILE):
+        """画像から文字を抽出（profile は領域ごとの OCR 設定）"""
         if self.ocr_engine == 'tesseract':
             try:
-                pil_image = Image.fromarray(image)
-                text = pytesseract.image_to_string(pil_image, lang=language, config='--psm 6')
-                return text.strip()
+                return tesseract_text(image, language, profile)
             except Exception as e:
                 return f"OCRエラー: {e}"
         
         elif self.ocr_engine == 'easyocr':
             try:
-                result = self.easyocr_reader.readtext(image)
-                text = ' '.join([item[1] for item in result])
-                return text.strip()
+                return easyocr_text(self.easyocr_reader, image, profile)
             except Exception as e:
                 return f"OCRエラー: {e}"
         
         else:
             return "OCRエンジンが設定されていません"
     
+    def extract_words_from_image(self, image, language="jpn+eng", profile=DEFAULT_OCR_PROFILE):
+        """画像から単語・位置・確信度 [(文字列, left, top, width, height, 確信度0〜100), ...] を抽出"""
+        if self.ocr_engine == 'tesseract':
+            return tesseract_words(image, language, profile)
+        
+        elif self.ocr_engine == 'easyocr':
+            return easyocr_words(self.easyocr_reader, image, profile)
+        
+        return []
+    
+    def recognize_batch_easyocr(self, images, language="jpn+eng", profile=DEFAULT_OCR_PROFILE):
+        """EasyOCR の認識器だけで複数の領域画像をまとめて認識（言語は Reader 作成時に固定）"""
+        return easyocr_recognize_batch(self.easyocr_reader, images, profile)
+    
     def check_text_match(self, detected_text, target_text):
         """文字の一致をチェック"""
         if not detected_text or not target_text:
@@ -971,46 +1265,6 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         except Exception:
             return False
     
-    def execute_action(self, action):
-        """アクションを実行"""
-        try:
-            action_type = action.get("type", "")
-            
-            if action_type == "click":
-                x = action.get("x", 0)
-                y = action.get("y", 0)
-                pyautogui.click(x, y)
-                self.log(f"クリック実行: ({x}, {y})")
-                
-            elif action_type == "key":
-                key = action.get("key", "")
-                pyautogui.press(key)
-                self.log(f"キー入力実行: {key}")
-                
-            elif action_type == "hotkey":
-                keys = action.get("keys", [])
-                pyautogui.hotkey(*keys)
-                self.log(f"ホットキー実行: {'+'.join(keys)}")
-                
-            elif action_type == "type":
-                text = action.get("text", "")
-                pyautogui.typewrite(text)
-                self.log(f"テキスト入力実行: {text}")
-                
-            elif action_type == "move":
-                x = action.get("x", 0)
-                y = action.get("y", 0)
-                pyautogui.moveTo(x, y)
-                self.log(f"マウス移動実行: ({x}, {y})")
-                
-            elif action_type == "wait":
-                duration = action.get("duration", 1.0)
-                time.sleep(duration)
-                self.log(f"待機実行: {duration}秒")
-                
-        except Exception as e:
-            self.log(f"アクション実行エラー: {e}")
-    
     # ===== 残りの未実装メソッド =====
     def show_region_config_dialog(self, region_data=None, region_index=None):
         """監視領域設定ダイアログを表示"""
@@ -1111,19 +1365,124 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
         target_text_var = tk.StringVar(value=region_data["target_text"])
         ttk.Entry(text_frame, textvariable=target_text_var, width=50).pack(fill=tk.X, pady=2)
         
+        # 数値条件: 検索文字の代わりに読み取った数値で判定（例: "<= 12"、"5..12"、"delta <= -3"）
+        condition_frame = ttk.Frame(text_frame)
+        condition_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(condition_frame, text="数値条件 (例: <= 12, 5..12, delta <= -3):").pack(side=tk.LEFT, padx=(0, 10))
+        condition_data = region_data.get("condition") or ""
+        condition_var = tk.StringVar(value=condition_data if isinstance(condition_data, str) else "")
+        ttk.Entry(condition_frame, textvariable=condition_var, width=20).pack(side=tk.LEFT)
+        
+        confidence_frame = ttk.Frame(text_frame)
+        confidence_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(confidence_frame, text="最低確信度 (0〜100、0で無効):").pack(side=tk.LEFT, padx=(0, 10))
+        min_confidence_var = tk.DoubleVar(value=region_data.get("min_confidence", 0))
+        ttk.Entry(confidence_frame, textvariable=min_confidence_var, width=8).pack(side=tk.LEFT)
+        # 一瞬だけ表示されるアニメーション等での誤動作を防ぐ（直近Mフレーム中Nフレーム一致で実行）
+        ttk.Label(confidence_frame, text="連続一致 N / M フレーム:").pack(side=tk.LEFT, padx=(20, 10))
+        confirm_frames_var = tk.IntVar(value=region_data.get("confirm_frames", 1))
+        ttk.Entry(confidence_frame, textvariable=confirm_frames_var, width=4).pack(side=tk.LEFT)
+        ttk.Label(confidence_frame, text="/").pack(side=tk.LEFT, padx=2)
+        confirm_window_var = tk.IntVar(value=region_data.get("confirm_window", region_data.get("confirm_frames", 1)))
+        ttk.Entry(confidence_frame, textvariable=confirm_window_var, width=4).pack(side=tk.LEFT)
+        
+        # トリガー方式: 一致している間ずっと実行し続けないように、一致し始めた時だけ実行する等を選べる
+        trigger_frame = ttk.Frame(text_frame)
+        trigger_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(trigger_frame, text="トリガー:").pack(side=tk.LEFT, padx=(0, 4))
+        trigger_var = tk.StringVar(value=region_data.get("trigger") or "level")
+        ttk.Combobox(trigger_frame, textvariable=trigger_var, values=["level", "rising", "falling"],
+                     width=8, state="readonly").pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(trigger_frame, text="クールダウン (秒):").pack(side=tk.LEFT, padx=(0, 4))
+        cooldown_var = tk.DoubleVar(value=region_data.get("cooldown") or 0)
+        ttk.Entry(trigger_frame, textvariable=cooldown_var, width=6).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(trigger_frame, text="最大回数/分 (0で無制限):").pack(side=tk.LEFT, padx=(0, 4))
+        max_rate_var = tk.IntVar(value=region_data.get("max_rate") or 0)
+        ttk.Entry(trigger_frame, textvariable=max_rate_var, width=5).pack(side=tk.LEFT)
+        
+        # 領域ごとの OCR 設定（空欄は全体の設定）。数字だけの領域は "numeric" で1行・数字のみ・英語で認識
+        ocr_data = region_data.get("ocr") or {}
+        if isinstance(ocr_data, str):
+            ocr_data = {"preset": ocr_data}
+        ocr_frame = ttk.Frame(text_frame)
+        ocr_frame.pack(fill=tk.X, pady=2)
+        ocr_vars = {}
+        for label, key, width in [("OCRプリセット:", "preset", 10), ("言語:", "language", 10),
+                                  ("PSM:", "psm", 4), ("使用文字:", "whitelist", 14)]:
+            ttk.Label(ocr_frame, text=label).pack(side=tk.LEFT, padx=(0, 4))
+            ocr_vars[key] = tk.StringVar(value=str(ocr_data.get(key, "")))
+            if key == "preset":
+                ttk.Combobox(ocr_frame, textvariable=ocr_vars[key], values=["", "numeric", "line", "word"],
+                             width=width, state="readonly").pack(side=tk.LEFT, padx=(0, 8))
+            else:
+                ttk.Entry(ocr_frame, textvariable=ocr_vars[key], width=width).pack(side=tk.LEFT, padx=(0, 8))
+        
+        def current_ocr_settings():
+            """入力された OCR 設定（未指定の項目は含めない）"""
+            # ダイアログに無い項目（oem / dpi）は regions.json の値をそのまま残す
+            settings = {key: ocr_data[key] for key in ("oem", "dpi") if key in ocr_data}
+            for key, var in ocr_vars.items():
+                value = var.get().strip()
+                if value:
+                    settings[key] = int(value) if key == "psm" else value
+            return settings or None
+        
         # OCRテストボタン
         def test_ocr_region():
             try:
                 x, y = coord_vars["x"].get(), coord_vars["y"].get()
                 w, h = coord_vars["width"].get(), coord_vars["height"].get()
                 image = self.capture_region(x, y, w, h)
-                text = self.extract_text_from_image(image)
+                profile = compile_ocr_profile(current_ocr_settings())
+                text = self.extract_text_from_image(image, self.config.get("ocr_language", "jpn+eng"), profile)
                 messagebox.showinfo("OCRテスト結果", f"検出されたテキスト:\n'{text}'")
             except Exception as e:
                 messagebox.showerror("エラー", f"OCRテストに失敗しました: {e}")
         
         ttk.Button(text_frame, text="OCRテスト", command=test_ocr_region).pack(pady=5)
 
+        # ピクセル条件: 指定すると OCR せずに色だけで判定する（点の指定や HSV は regions.json で設定）
+        pixel_frame = ttk.LabelFrame(dialog, text="ピクセル条件（オプション、OCRの代わりに色で判定）", padding="15")
+        pixel_frame.pack(fill=tk.X, padx=10, pady=5)
+        pixel_data = region_data.get("pixels") or {}
+        pixel_row = ttk.Frame(pixel_frame)
+        pixel_row.pack(fill=tk.X, pady=2)
+        ttk.Label(pixel_row, text="色 (R,G,B):").pack(side=tk.LEFT, padx=(0, 4))
+        color = pixel_data.get("color")
+        pixel_color_var = tk.StringVar(value=",".join(str(c) for c in color) if isinstance(color, list) else "")
+        ttk.Entry(pixel_row, textvariable=pixel_color_var, width=14).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(pixel_row, text="許容差:").pack(side=tk.LEFT, padx=(0, 4))
+        tolerance = pixel_data.get("tolerance", 16)
+        pixel_tolerance_var = tk.StringVar(value=str(tolerance) if not isinstance(tolerance, list) else "16")
+        ttk.Entry(pixel_row, textvariable=pixel_tolerance_var, width=5).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(pixel_row, text="割合 (%):").pack(side=tk.LEFT, padx=(0, 4))
+        pixel_ratio_var = tk.DoubleVar(value=pixel_data.get("ratio", 1.0) * 100)
+        ttk.Entry(pixel_row, textvariable=pixel_ratio_var, width=5).pack(side=tk.LEFT, padx=(0, 8))
+
+        def pick_pixel_color():
+            """領域の平均色を取得して色に設定"""
+            try:
+                image = self.capture_region(coord_vars["x"].get(), coord_vars["y"].get(),
+                                            coord_vars["width"].get(), coord_vars["height"].get())
+                mean = image[:, :, :3].reshape(-1, 3).mean(axis=0)
+                pixel_color_var.set(",".join(str(int(round(c))) for c in mean))
+            except Exception as e:
+                messagebox.showerror("エラー", f"色の取得に失敗しました: {e}")
+
+        ttk.Button(pixel_row, text="領域の色を取得", command=pick_pixel_color).pack(side=tk.LEFT)
+
+        def current_pixel_settings():
+            """入力されたピクセル条件（色が空欄なら regions.json の点・範囲指定をそのまま残す）"""
+            text = pixel_color_var.get().strip()
+            if not text:
+                return pixel_data if pixel_data and "color" not in pixel_data else None
+            settings = {key: value for key, value in pixel_data.items()
+                        if key not in ("color", "tolerance", "ratio", "min", "max", "space")}
+            settings["color"] = [int(c) for c in text.replace("、", ",").split(",")]
+            settings["tolerance"] = float(pixel_tolerance_var.get())
+            settings["ratio"] = pixel_ratio_var.get() / 100
+            return settings
+
         # 比較領域設定
         compare_frame = ttk.LabelFrame(dialog, text="比較領域設定（オプション）", padding="15")
         compare_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -1209,6 +1568,17 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
                     "width": coord_vars["width"].get(),
                     "height": coord_vars["height"].get(),
                     "target_text": target_text_var.get(),
+                    "min_confidence": min_confidence_var.get(),
+                    "ocr": current_ocr_settings(),
+                    # 辞書形式で書かれた数値条件はダイアログでは編集せずそのまま残す
+                    "condition": (condition_var.get().strip() or None) if isinstance(condition_data, str)
+                                 else condition_data,
+                    "confirm_frames": confirm_frames_var.get(),
+                    "confirm_window": confirm_window_var.get(),
+                    "pixels": current_pixel_settings(),
+                    "trigger": trigger_var.get(),
+                    "cooldown": cooldown_var.get(),
+                    "max_rate": max_rate_var.get() or None,
                     "enabled": enabled_var.get(),
                     "compare_enabled": compare_enabled_var.get(),
                     "compare_trigger_only": compare_trigger_only_var.get(),
@@ -1224,6 +1594,8 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
                         'y': coord_vars["y"].get() + coord_vars["height"].get() // 2
                     }])
                 }
+                # 監視開始時と同じコンパイルで検証し、設定の誤りは保存前に知らせる
+                compile_region(new_region, pyautogui, referenced=True)
                 
                 # 現在のセットを取得・更新
                 current_regions = self.get_current_regions()
@@ -1250,6 +1622,8 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
                 dialog.destroy()
                 messagebox.showinfo("成功", "領域設定を保存しました")
                 
+            except RegionConfigError as e:
+                messagebox.showerror("設定エラー", str(e), parent=dialog)
             except Exception as e:
                 messagebox.showerror("エラー", f"設定の保存に失敗しました: {e}")
         
@@ -1899,6 +2273,11 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
                     'height': compare_coord_vars_add['height'].get()
                 } if compare_enabled_var_add.get() else None)
             }
+            try:
+                compile_region(new_region, pyautogui, referenced=True)
+            except RegionConfigError as e:
+                messagebox.showerror("設定エラー", str(e), parent=dialog)
+                return
             
             # 現在のセットに追加
             if self.current_region_set not in self.monitoring_regions:
@@ -1955,6 +2334,7 @@ F6: 監視開始/停止  |  F7: 領域追加  |  F8: 緊急停止
 F6: 監視開始/停止
 F7: 新しい領域追加
 F8: 緊急停止
+Ctrl+Alt+1〜9: 監視領域セット切り替え（監視中も即時反映）
         """
         
         help_window = tk.Toplevel(self.root)
@@ -1985,10 +2365,13 @@ AutoClickerの設計を参考にした
         """アプリケーション終了時の処理"""
         if self.running:
             self.stop_monitoring()
+        self.config_watcher.stop()
+        self.engine.shutdown()
         
-        # 設定を保存
+        # 設定を保存（予約中の領域データもここで書き出す）
         self.save_config()
         self.save_regions()
+        self.regions_writer.close()
         
         self.root.destroy()
     
@@ -0,0 +1,62 @@
+"""
+停止シグナル
+ワーカースレッドの待機を緊急停止で即座に中断するための共有イベントと、停止遅延の計測
+"""
+
+import threading
+import time
+
+
+class StopSignal:
+    """ワーカーと停止ボタン・ホットキーで共有する停止要求
+
+    ワーカーは入力を送る直前に stopped を確認し、待機は sleep() / wait_until() で行う
+    （time.sleep と違い、停止要求があればすぐに戻る）。
+    request() から停止後に送られた最後の入力までの時間を停止遅延として記録する。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.requested_at = None  # 停止要求の時刻（time.perf_counter）
+        self.last_input_at = None  # 最後に入力を送り終えた時刻
+
+    def reset(self):
+        """新しい実行を始める前に呼ぶ"""
+        with self._lock:
+            self._event.clear()
+            self.requested_at = None
+            self.last_input_at = None
+
+    def request(self):
+        """停止を要求する（ホットキーのコールバックから、GUI の処理より先に呼ぶ）"""
+        with self._lock:
+            if self.requested_at is None:
+                self.requested_at = time.perf_counter()
+        self._event.set()
+
+    @property
+    def stopped(self):
+        return self._event.is_set()
+
+    def sleep(self, seconds):
+        """seconds 秒待つ。停止要求があれば即座に戻り True を返す"""
+        if seconds <= 0:
+            return self._event.is_set()
+        return self._event.wait(seconds)
+
+    def wait_until(self, deadline):
+        """time.perf_counter() が deadline になるまで待つ。停止要求があれば True"""
+        return self.sleep(deadline - time.perf_counter())
+
+    def input_sent(self):
+        """入力を1つ送り終えた直後に呼ぶ（停止遅延の計測用）"""
+        self.last_input_at = time.perf_counter()
+
+    def stop_latency(self):
+        """停止要求から最後の入力までの秒数（停止後に入力がなければ 0、停止していなければ None）"""
+        requested = self.requested_at
+        if requested is None:
+            return None
+        last = self.last_input_at
+        return max(0.0, last - requested) if last is not None else 0.0
@@ -1,10 +1,11 @@
 import ctypes
+import sys
 import time
 import threading
-from ctypes import wintypes
 
-# Windows API関数の定義
-user32 = ctypes.WinDLL('user32', use_last_error=True)
+from cancellation import StopSignal
+from linux_input import UInputDevice, XTestDisplay, key_entry, pack_key_frames
+from pacing import PacingScheduler, format_report
 
 # キーコード
 VK_RETURN = 0x0D
@@ -13,13 +14,142 @@ VK_RETURN = 0x0D
 KEYEVENTF_EXTENDEDKEY = 0x0001
 KEYEVENTF_KEYUP = 0x0002
 
-# keybd_event関数
-keybd_event = user32.keybd_event
-keybd_event.argtypes = [wintypes.BYTE, wintypes.BYTE, wintypes.DWORD, ctypes.POINTER(wintypes.ULONG)]
-keybd_event.restype = None
+if sys.platform == "win32":
+    from ctypes import wintypes
 
-# 停止フラグ
-stop_flag = False
+    # Windows API関数の定義
+    user32 = ctypes.WinDLL('user32', use_last_error=True)
+
+    # keybd_event関数
+    keybd_event = user32.keybd_event
+    keybd_event.argtypes = [wintypes.BYTE, wintypes.BYTE, wintypes.DWORD, ctypes.POINTER(wintypes.ULONG)]
+    keybd_event.restype = None
+
+
+# ===== Linux: uinput / XTest で直接キーを送る =====
+# uinput で1フレーム（SYN_REPORT の間）に入れるキーイベントの数の既定値（1 なら1イベントごとに区切る）
+DEFAULT_EVENTS_PER_FRAME = 1
+
+
+class _UInputKeys:
+    """uinput の仮想キーボード（入力はまとめた input_event の並びを1回の write で送る）"""
+
+    name = "uinput"
+
+    def __init__(self, entries, events_per_frame):
+        self.codes = {key: code for key, (code, _) in entries.items()}
+        self.device = UInputDevice(self.codes.values(), name="KeyClicker virtual keyboard")
+        self.events_per_frame = events_per_frame
+        self.presses = {key: pack_key_frames([(code, 1), (code, 0)]) for key, code in self.codes.items()}
+
+    def press(self, key):
+        self.device.write(self.presses[key])
+
+    def compile(self, events):
+        return pack_key_frames([(self.codes[key], int(down)) for key, down in events], self.events_per_frame)
+
+    def send(self, burst):
+        self.device.write(burst)
+
+    def close(self):
+        self.device.close()
+
+
+class _XTestKeys:
+    """XTest で押下と解放を送り、1回の XFlush でまとめて X サーバーに届ける"""
+
+    name = "xtest"
+
+    def __init__(self, entries, events_per_frame):
+        self.display = XTestDisplay()
+        self.keycodes = {}
+        for key, (_, keysym) in entries.items():
+            keycode = self.display.keycode(keysym)
+            if not keycode:
+                self.display.close()
+                raise OSError(f"キー '{key}' が今のキー配列に割り当てられていません")
+            self.keycodes[key] = keycode
+
+    def press(self, key):
+        keycode = self.keycodes[key]
+        self.display.key(keycode, True)
+        self.display.key(keycode, False)
+        self.display.flush()
+
+    def compile(self, events):
+        return tuple((self.keycodes[key], bool(down)) for key, down in events)
+
+    def send(self, burst):
+        key = self.display.key
+        for keycode, down in burst:
+            key(keycode, down)
+        self.display.flush()
+
+    def close(self):
+        self.display.close()
+
+
+FAST_BACKENDS = {"uinput": _UInputKeys, "xtest": _XTestKeys}
+
+
+class FastKeySender:
+    """Linux で pyautogui を通さずにキーを送る（KeyClicker の最高速モード用）
+
+    keys（pyautogui と同じキー名）のキーコードは作成時に1回だけ解決する。
+    backend は auto / uinput / xtest（auto は uinput、使えなければ XTest）。使えなければ OSError。
+    多数の押下は compile_burst() で1つのバッファにまとめておき、send() で1回で送れる
+    （uinput では events_per_frame 個ごとに SYN_REPORT で区切る）。
+    """
+
+    def __init__(self, keys, backend="auto", events_per_frame=DEFAULT_EVENTS_PER_FRAME):
+        if not sys.platform.startswith("linux"):
+            raise OSError("FastKeySender は Linux でのみ使えます")
+        if backend != "auto" and backend not in FAST_BACKENDS:
+            raise ValueError(f"backend は auto / {' / '.join(FAST_BACKENDS)} で指定してください")
+        if events_per_frame < 1:
+            raise ValueError("events_per_frame は1以上で指定してください")
+        entries = {key: key_entry(key) for key in keys}
+        errors = []
+        for candidate in FAST_BACKENDS if backend == "auto" else (backend,):
+            try:
+                self._backend = FAST_BACKENDS[candidate](entries, events_per_frame)
+                break
+            except OSError as e:
+                errors.append(f"{candidate}: {e}")
+        else:
+            raise OSError(" / ".join(errors))
+        self.backend = self._backend.name
+        self.keys = frozenset(entries)
+
+    def press(self, key):
+        """キーを1回押して離す（key は作成時に渡したもの）"""
+        self._backend.press(key)
+
+    def compile_events(self, events):
+        """(キー, 押下なら True) の列を send() で送れる形にまとめる"""
+        events = list(events)
+        unknown = {key for key, _ in events} - self.keys
+        if unknown:
+            raise ValueError(f"作成時に渡していないキーです: {', '.join(sorted(unknown))}")
+        return self._backend.compile(events)
+
+    def compile_burst(self, keys, repeat=1):
+        """keys を順に押して離すことを repeat 回繰り返す入力をまとめる"""
+        return self.compile_events([(key, down) for key in keys for down in (True, False)] * repeat)
+
+    def send(self, burst):
+        """compile_events() / compile_burst() でまとめた入力を1回で送る"""
+        self._backend.send(burst)
+
+    def press_burst(self, keys, repeat=1):
+        self.send(self.compile_burst(keys, repeat))
+
+    def close(self):
+        self._backend.close()
+
+
+# 停止要求（待機中でもすぐに抜ける）
+stop_signal = StopSignal()
 # 合計押下回数（全サイクル通算）
 total_presses = 0
 # 現在サイクル内の押下回数
@@ -28,23 +158,29 @@ cycle_presses = 0
 MAX_PRESSES = 10000
 # クールダウン時間（秒）
 COOLDOWN_SECONDS = 45
+# 1秒間に200回 = 0.005秒間隔
+TARGET_INTERVAL = 0.005
+# 押下のペース配分（開始時刻からの絶対的な締め切りで刻むので、長時間でも速度がずれない）
+pacer = PacingScheduler(TARGET_INTERVAL, stop_signal)
+# Linux では FastKeySender で送る（main() で開く）
+enter_sender = None
 # カウント用ロック
 press_lock = threading.Lock()
 
 def press_enter_fast():
     """1秒間に約200回のペースでEnterキーを連打（サイクル内で MAX_PRESSES 回で終了）"""
-    global stop_flag, total_presses, cycle_presses
+    global total_presses, cycle_presses
 
-    # 1秒間に200回 = 0.005秒間隔
-    target_interval = 0.005
-
-    while not stop_flag:
-        start = time.perf_counter()
-
-        # キーダウン
-        keybd_event(VK_RETURN, 0, KEYEVENTF_EXTENDEDKEY, None)
-        # キーアップ
-        keybd_event(VK_RETURN, 0, KEYEVENTF_EXTENDEDKEY | KEYEVENTF_KEYUP, None)
+    pacer.start()
+    while pacer.wait():
+        if enter_sender is not None:
+            enter_sender.press("enter")
+        else:
+            # キーダウン
+            keybd_event(VK_RETURN, 0, KEYEVENTF_EXTENDEDKEY, None)
+            # キーアップ
+            keybd_event(VK_RETURN, 0, KEYEVENTF_EXTENDEDKEY | KEYEVENTF_KEYUP, None)
+        stop_signal.input_sent()
 
         # カウントをインクリメント（サイクルと合計）
         with press_lock:
@@ -54,30 +190,31 @@ def press_enter_fast():
             if cycle_presses >= MAX_PRESSES:
                 break
 
-        # 次の押下まで待機
-        elapsed = time.perf_counter() - start
-        sleep_time = target_interval - elapsed
-        if sleep_time > 0:
-            time.sleep(sleep_time)
-
 def monitor_stats():
     """統計情報を表示（合計押下回数と現在速度/平均を表示）"""
-    global total_presses, stop_flag
     start_time = time.time()
     last_count = 0
 
-    while not stop_flag:
-        time.sleep(1)
+    while not stop_signal.sleep(1):
         current_count = total_presses
         elapsed = time.time() - start_time
         pps = (current_count - last_count)  # 1秒あたりの押下回数
         total_pps = current_count / elapsed if elapsed > 0 else 0
+        pacing = format_report(pacer.snapshot())
 
-        print(f"\r合計押下回数: {current_count:,} | 現在速度: {pps:,} press/sec | 平均: {total_pps:,.1f} press/sec", end="", flush=True)
+        print(f"\r合計押下回数: {current_count:,} | 現在速度: {pps:,} press/sec | 平均: {total_pps:,.1f} press/sec"
+              f" | {pacing}", end="", flush=True)
         last_count = current_count
 
 def main():
-    global stop_flag, total_presses, cycle_presses
+    global cycle_presses, enter_sender
+
+    if sys.platform != "win32":
+        try:
+            enter_sender = FastKeySender(["enter"])
+        except OSError as e:
+            print(f"キーを送る準備ができません: {e}")
+            return
 
     print("=" * 70)
     print("Enter連打ツール (1秒間に約200回)")
@@ -97,13 +234,14 @@ def main():
 
     # シングルスレッドで実行（速度制限のため）
     num_threads = 1
+    threads = []
 
     # 統計モニタースレッド
     stats_thread = threading.Thread(target=monitor_stats, daemon=True)
     stats_thread.start()
 
     try:
-        while not stop_flag:
+        while not stop_signal.stopped:
             # サイクル用カウンタをリセット
             with press_lock:
                 cycle_presses = 0
@@ -114,13 +252,12 @@ def main():
                 t.start()
                 threads.append(t)
 
-            # サイクル内スレッドが完了するまで待機
+            # サイクル内スレッドが完了するまで待機（Ctrl+C を受け付けるよう短く区切る）
             while any(t.is_alive() for t in threads):
-                time.sleep(0.1)
-                if stop_flag:
+                if stop_signal.sleep(0.1):
                     break
 
-            if stop_flag:
+            if stop_signal.stopped:
                 break
 
             print(f"\n[サイクル完了] {MAX_PRESSES:,} 回押しました。クールダウン {COOLDOWN_SECONDS} 秒...\n")
@@ -128,20 +265,25 @@ def main():
             # クールダウン（Ctrl+C を許容）
             remaining = COOLDOWN_SECONDS
             try:
-                while remaining > 0 and not stop_flag:
-                    time.sleep(1)
+                while remaining > 0 and not stop_signal.sleep(1):
                     remaining -= 1
             except KeyboardInterrupt:
-                stop_flag = True
+                stop_signal.request()
                 break
 
     except KeyboardInterrupt:
         print("\n\n[停止] ユーザによる割り込みを受けました。終了します...")
-        stop_flag = True
+        stop_signal.request()
     finally:
-        # 少し待ってスレッドを落ち着かせる
-        time.sleep(0.5)
+        # 連打スレッドは停止要求ですぐに抜ける
+        for t in threads:
+            t.join(timeout=0.5)
+        if enter_sender is not None:
+            enter_sender.close()
         print(f"\n最終結果: 合計 {total_presses:,} 回のEnter押下を実行しました")
+        latency = stop_signal.stop_latency()
+        if latency is not None:
+            print(f"停止遅延: {latency * 1000:.1f} ms（停止要求から最後の入力まで）")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
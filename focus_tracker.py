@@ -0,0 +1,196 @@
+"""
+アクティブウィンドウの追跡
+アクティブウィンドウの変化を専用のスレッドで受け取り、(変化の回数, ウィンドウ) として公開する。
+送信ループは入力のたびにウィンドウを問い合わせる代わりに、この値を読むだけでよい
+
+X11 ではルートウィンドウの _NET_ACTIVE_WINDOW の PropertyNotify を待つ（問い合わせは変化した時だけ）。
+それ以外の環境では、渡された関数で一定間隔ごとに問い合わせる。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+
+# 問い合わせ方式の間隔（秒）
+POLL_INTERVAL = 0.05
+# X11 のイベント待ちを停止要求の確認のために区切る間隔（秒）
+X11_WAIT = 0.1
+
+# X11 の定数
+PROPERTY_CHANGE_MASK = 1 << 22
+PROPERTY_NOTIFY = 28
+ANY_PROPERTY_TYPE = 0
+
+
+class _XPropertyEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("window", ctypes.c_ulong),
+        ("atom", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+        ("state", ctypes.c_int),
+    ]
+
+
+class _XEvent(ctypes.Union):
+    _fields_ = [("type", ctypes.c_int), ("xproperty", _XPropertyEvent), ("pad", ctypes.c_long * 24)]
+
+
+class _X11ActiveWindow:
+    """X11 の _NET_ACTIVE_WINDOW を読む（専用の接続を開く。使えなければ OSError）"""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux") or not os.environ.get("DISPLAY"):
+            raise OSError("X11 のディスプレイがありません")
+        path = ctypes.util.find_library("X11")
+        if not path:
+            raise OSError("libX11 が見つかりません")
+        x11 = self.x11 = ctypes.CDLL(path)
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        x11.XInternAtom.restype = ctypes.c_ulong
+        x11.XSelectInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_long]
+        x11.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        x11.XPending.argtypes = [ctypes.c_void_p]
+        x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XEvent)]
+        x11.XFlush.argtypes = [ctypes.c_void_p]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XGetWindowProperty.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long, ctypes.c_long, ctypes.c_int,
+            ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p),
+        ]
+
+        self.display = x11.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("X ディスプレイに接続できません")
+        self.root = x11.XDefaultRootWindow(self.display)
+        self.atom = x11.XInternAtom(self.display, b"_NET_ACTIVE_WINDOW", False)
+        x11.XSelectInput(self.display, self.root, PROPERTY_CHANGE_MASK)
+        x11.XFlush(self.display)
+        self.fd = x11.XConnectionNumber(self.display)
+        self.event = _XEvent()
+
+    def active_window(self):
+        """アクティブウィンドウの ID（なければ None）"""
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        count = ctypes.c_ulong()
+        remaining = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        status = self.x11.XGetWindowProperty(
+            self.display, self.root, self.atom, 0, 1, False, ANY_PROPERTY_TYPE,
+            ctypes.byref(actual_type), ctypes.byref(actual_format), ctypes.byref(count),
+            ctypes.byref(remaining), ctypes.byref(data))
+        if status != 0 or not data.value:
+            return None
+        try:
+            if count.value < 1 or actual_format.value != 32:
+                return None
+            return ctypes.cast(data, ctypes.POINTER(ctypes.c_ulong))[0] or None
+        finally:
+            self.x11.XFree(data)
+
+    def wait_change(self, timeout):
+        """_NET_ACTIVE_WINDOW が変わるまで最大 timeout 秒待つ（変わったら True）"""
+        changed = False
+        if not self.x11.XPending(self.display):
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return False
+        while self.x11.XPending(self.display):
+            self.x11.XNextEvent(self.display, ctypes.byref(self.event))
+            if self.event.type == PROPERTY_NOTIFY and self.event.xproperty.atom == self.atom:
+                changed = True
+        return changed
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+class FocusTracker:
+    """アクティブウィンドウの変化を専用スレッドで追跡する
+
+    state は (start() 以降の変化の回数, 今のウィンドウ) のタプルで、送信ループから何度読んでもよい
+    （タプルごと差し替えるので、回数とウィンドウが食い違うことはない）。
+    アクティブウィンドウがない状態（None）は変化として数えず、前後のウィンドウが違う場合だけ1回と数える。
+    poll は X11 が使えない場合に今のウィンドウ（比較できる値）を返す関数。
+    """
+
+    def __init__(self, poll=None):
+        self.poll = poll
+        self.state = (0, None)
+        self._last = None  # 最後に見えたウィンドウ（None を除く）
+        self.method = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """追跡を始める（最初のウィンドウを読んでから戻る。どの方式も使えなければ OSError）"""
+        self.stop()
+        self._stop.clear()
+        try:
+            source = _X11ActiveWindow()
+        except OSError as e:
+            if self.poll is None:
+                raise
+            print(f"アクティブウィンドウは {POLL_INTERVAL * 1000:.0f} ms ごとの問い合わせで追跡します: {e}")
+            source = None
+        if source is not None:
+            self.method = "x11"
+            self.state = (0, source.active_window())
+            target = self._run_x11
+        else:
+            self.method = "poll"
+            self.state = (0, self._poll())
+            target = self._run_poll
+        self._last = self.state[1]
+        self._thread = threading.Thread(target=target, args=(source,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _publish(self, window):
+        changes = self.state[0]
+        if window is not None:
+            if self._last is not None and window != self._last:
+                changes += 1
+            self._last = window
+        if (changes, window) != self.state:
+            self.state = (changes, window)
+
+    def _poll(self):
+        try:
+            return self.poll()
+        except Exception:
+            return None
+
+    def _run_x11(self, source):
+        try:
+            while not self._stop.is_set():
+                if source.wait_change(X11_WAIT):
+                    self._publish(source.active_window())
+        except Exception as e:
+            print(f"アクティブウィンドウの追跡エラー: {e}")
+        finally:
+            source.close()
+
+    def _run_poll(self, _source):
+        while not self._stop.wait(POLL_INTERVAL):
+            self._publish(self._poll())
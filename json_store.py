@@ -0,0 +1,174 @@
+"""
+JSON 保存ユーティリティ
+一時ファイルへ書き込んでから置き換える原子的な保存と、連続編集をまとめて1回で書き込む遅延保存
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """一時ファイル + os.replace でファイルを置き換える（書き込み途中で落ちても元のファイルは壊れない）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data, indent=2):
+    """JSON を原子的に保存"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+class DebouncedJsonWriter:
+    """短時間の連続保存要求を1回の書き込みにまとめるライター
+
+    schedule() は変更があったことを記録するだけで、最後の要求から delay 秒経過した時点で
+    call_on_ui(関数) を通じて UI スレッド（データを編集するスレッド）で producer() の内容を1回だけコピーし、
+    バックグラウンドスレッドでそのコピーを整形して原子的に書き込む。書き込みスレッドは編集中のデータに触れない。
+    on_snapshot(コピー) はコピーを取った直後に UI スレッドで呼ばれる（同じコピーを他の処理と共有する場合に使う。変更しないこと）。
+    call_on_ui を省略すると書き込みスレッドで producer() を呼ぶので、その場合 producer はスレッドセーフにすること。
+    """
+
+    def __init__(self, path, producer, delay=0.5, indent=2, on_written=None, on_error=None,
+                 call_on_ui=None, on_snapshot=None):
+        self.path = path
+        self.producer = producer
+        self.delay = delay
+        self.indent = indent
+        self.on_written = on_written
+        self.on_error = on_error
+        self.call_on_ui = call_on_ui
+        self.on_snapshot = on_snapshot
+
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._deadline = None
+        self._requested = False  # UI スレッドにコピーを依頼して待っている
+        self._data = None  # UI スレッドで取ったコピー (版, データ)
+        self._version = 0  # schedule() ごとに増える番号（古いコピーで新しい保存を上書きしない）
+        self._written = 0
+        self._closed = False
+        self._thread = None
+
+    def schedule(self):
+        """保存を予約（delay 秒以内に再度呼ばれたら延長）"""
+        with self._cond:
+            if self._closed:
+                return
+            self._version += 1
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    @property
+    def pending(self):
+        """未保存の変更があるか"""
+        return self._deadline is not None or self._requested or self._data is not None
+
+    def snapshot(self):
+        """producer() の内容をコピーする（UI スレッドで呼ぶ）"""
+        with self._cond:
+            version = self._version
+        data = copy.deepcopy(self.producer())
+        if self.on_snapshot is not None:
+            self.on_snapshot(data)
+        return version, data
+
+    def flush(self):
+        """予約中の保存をすぐに実行する（UI スレッドで呼び、呼び出し元スレッドで書き込む）"""
+        with self._cond:
+            if self._deadline is None and not self._requested and self._data is None:
+                return
+            self._deadline = None
+            self._requested = False
+            self._data = None
+        self._write(*self.snapshot())
+
+    def _deliver(self):
+        # call_on_ui から UI スレッドで呼ばれ、コピーを書き込みスレッドに渡す（call_on_ui がなければ書き込みスレッドで呼ぶ）
+        with self._cond:
+            if not self._requested:
+                return  # flush() で書き込み済み
+        pending = self.snapshot()
+        with self._cond:
+            if not self._requested:
+                return
+            self._requested = False
+            self._data = pending
+            self._cond.notify()
+
+    def close(self):
+        """予約中の保存を書き出してスレッドを終了"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if self._data is None:
+                    if self._deadline is None or self._requested:
+                        self._cond.wait()
+                        continue
+                    remaining = self._deadline - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    self._deadline = None
+                    self._requested = True
+                    self._cond.release()
+                    try:
+                        if self.call_on_ui is not None:
+                            # コピーは UI スレッドで取り、届いたら書き込む
+                            self.call_on_ui(self._deliver)
+                        else:
+                            self._deliver()
+                    except Exception as e:
+                        self._requested = False
+                        self._report(e)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                pending, self._data = self._data, None
+                self._cond.release()
+                try:
+                    self._write(*pending)
+                finally:
+                    self._cond.acquire()
+
+    def _report(self, error):
+        if self.on_error is not None:
+            self.on_error(error)
+        else:
+            print(f"保存エラー: {self.path}: {error}")
+
+    def _write(self, version, data):
+        with self._write_lock:
+            if version <= self._written:
+                return
+            try:
+                atomic_write_text(self.path, json.dumps(data, ensure_ascii=False, indent=self.indent))
+            except Exception as e:
+                self._report(e)
+                return
+            self._written = version
+            if self.on_written is not None:
+                self.on_written(self.path)
@@ -0,0 +1,126 @@
+"""
+キープログラム
+KeyClicker のキー欄に書いた手順を、開始からの時刻ごとの押下・解放イベントの列に1回だけコンパイルする。
+再生時はまとめたイベントを PacingScheduler の締め切りで送るだけなので、複雑な手順でも1キーの連打と同じ手間で済む
+
+    a, space, enter      キーを順に押す（手順の間は連打間隔）
+    ctrl+c               同時押し（順に押して、逆順に離す）
+    a*5                  5回繰り返す
+    a:0.1                0.1秒押し続けてから離す
+    a:0.1:0.3            0.1秒押し続け、離してから次の手順まで0.3秒（省略時は連打間隔）
+    a:0.1:0.3*5          上を5回繰り返す
+    wait 0.5 / ~0.5      0.5秒待つ
+"""
+
+from collections import namedtuple
+
+# 1つの手順（keys は同時押しするキー、hold / gap は None なら既定値）
+KeyStep = namedtuple("KeyStep", ("keys", "hold", "gap", "repeat", "delay"))
+
+
+def _seconds(text, step, what):
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"手順 '{step}': {what}は秒数で指定してください") from None
+    if value < 0:
+        raise ValueError(f"手順 '{step}': {what}は0以上で指定してください")
+    return value
+
+
+def parse_key_program(text):
+    """キー欄の文字列を KeyStep のタプルに変換（書式の誤りは ValueError）"""
+    steps = []
+    for raw in text.split(","):
+        step = raw.strip()
+        if not step:
+            continue
+        lowered = step.lower()
+        if lowered.startswith("~") or lowered.startswith("wait"):
+            value = step[1:] if lowered.startswith("~") else step[4:]
+            steps.append(KeyStep((), None, None, 1, _seconds(value.strip(), step, "待ち時間")))
+            continue
+
+        # 繰り返しは a*5 / a:0.1*5 / a*5:0.1 のどこに書いてもよい
+        head, _, tail = step.partition("*")
+        count, separator, rest = tail.partition(":")
+        body = head + separator + rest
+        repeat = 1
+        if count:
+            if not count.strip().isdigit() or int(count) < 1:
+                raise ValueError(f"手順 '{step}': 繰り返し回数は1以上の整数で指定してください")
+            repeat = int(count)
+        chord, *times = body.split(":")
+        if len(times) > 2:
+            raise ValueError(f"手順 '{step}': 'キー:押す秒数:離してからの秒数' の形で指定してください")
+        keys = tuple(key.strip().lower() for key in chord.split("+"))
+        if not all(keys):
+            raise ValueError(f"手順 '{step}': キー名が空です")
+        hold = _seconds(times[0], step, "押す時間") if len(times) >= 1 else None
+        gap = _seconds(times[1], step, "離してからの時間") if len(times) == 2 else None
+        steps.append(KeyStep(keys, hold, gap, repeat, 0.0))
+    if not any(step.keys for step in steps):
+        raise ValueError("有効なキーを入力してください")
+    return tuple(steps)
+
+
+class KeyProgram:
+    """コンパイル済みのキープログラム
+
+    events は (開始からの秒数, キー名, 押下なら True) の時刻順のタプル、period は1巡の長さ（秒）。
+    """
+
+    __slots__ = ("events", "period", "keys")
+
+    def __init__(self, events, period):
+        self.events = events
+        self.period = period
+        self.keys = tuple(dict.fromkeys(key for _, key, _ in events))
+
+    def __len__(self):
+        return len(self.events)
+
+    def frames(self, compile_frame=tuple):
+        """同じ時刻のイベントをまとめ、(次のフレームまでの秒数, compile_frame(イベント), 押したままのキー) のリストにする
+
+        compile_frame は (キー, 押下) のリストを送信方式ごとの形に変換する（FastKeySender.compile_events など）。
+        最後のフレームの秒数は次の巡の最初のイベントまでの時間。押したままのキーは停止時に離すのに使う。
+        """
+        groups = []
+        for offset, key, down in self.events:
+            if groups and groups[-1][0] == offset:
+                groups[-1][1].append((key, down))
+            else:
+                groups.append((offset, [(key, down)]))
+        frames = []
+        held = set()
+        for i, (offset, events) in enumerate(groups):
+            # 最後のフレームは次の巡の先頭（先頭の待ち時間を含む）まで待つ
+            following = groups[i + 1][0] if i + 1 < len(groups) else self.period + groups[0][0]
+            for key, down in events:
+                if down:
+                    held.add(key)
+                else:
+                    held.discard(key)
+            frames.append((following - offset, compile_frame(events), frozenset(held)))
+        return frames
+
+
+def compile_key_program(steps, gap):
+    """KeyStep の列をイベントの列にコンパイルする（gap は手順の間の既定の秒数）"""
+    events = []
+    now = 0.0
+    for step in steps:
+        if not step.keys:
+            now += step.delay
+            continue
+        hold = step.hold or 0.0
+        after = gap if step.gap is None else step.gap
+        for _ in range(step.repeat):
+            for key in step.keys:
+                events.append((now, key, True))
+            now += hold
+            for key in reversed(step.keys):
+                events.append((now, key, False))
+            now += after
+    return KeyProgram(tuple(events), now)
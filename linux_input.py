@@ -0,0 +1,229 @@
+"""
+Linux の低レベル入力
+XTest（X サーバーへの擬似入力）と uinput（カーネルの仮想入力デバイス）に ctypes / os.write で直接送る。
+接続・デバイスは最初に1回だけ開き、入力ごとには Python の層を挟まずにまとめて送る。
+AutoClicker のクリック送信と fast_input のキー送信で共通に使う
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+
+# fcntl は Unix のみ（Windows から読み込んでも uinput が使えないだけにする）
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ===== XTest =====
+class XTestDisplay:
+    """XTest 拡張で擬似入力を送る X サーバーへの接続（開けなければ OSError）
+
+    送った入力は flush() まで Xlib のバッファに溜まるので、まとめて1回で送れる。
+    """
+
+    def __init__(self, display_name=None):
+        if not sys.platform.startswith("linux"):
+            raise OSError("XTest は Linux（X11）でのみ使えます")
+        x11_path = ctypes.util.find_library("X11")
+        xtst_path = ctypes.util.find_library("Xtst")
+        if not x11_path or not xtst_path:
+            raise OSError("libX11 / libXtst が見つかりません")
+        self.x11 = ctypes.CDLL(x11_path)
+        self.xtst = ctypes.CDLL(xtst_path)
+        self.x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.x11.XOpenDisplay.restype = ctypes.c_void_p
+        self.x11.XFlush.argtypes = [ctypes.c_void_p]
+        self.x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.x11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        self.x11.XStringToKeysym.restype = ctypes.c_ulong
+        self.x11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        self.x11.XKeysymToKeycode.restype = ctypes.c_ubyte
+        self.xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                                   ctypes.c_ulong]
+        self.xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+        self.xtst.XTestFakeKeyEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+
+        name = display_name.encode() if display_name else None
+        self.display = self.x11.XOpenDisplay(name)
+        if not self.display:
+            raise OSError(f"X ディスプレイ {display_name or os.environ.get('DISPLAY', '')!r} に接続できません")
+
+    def keycode(self, name):
+        """キー名（X の keysym 名、例: a / Return / space）のキーコード（割り当てがなければ 0）"""
+        keysym = self.x11.XStringToKeysym(name.encode())
+        return self.x11.XKeysymToKeycode(self.display, keysym) if keysym else 0
+
+    def move(self, x, y):
+        self.xtst.XTestFakeMotionEvent(self.display, -1, int(x), int(y), 0)
+
+    def button(self, button, down):
+        self.xtst.XTestFakeButtonEvent(self.display, button, int(down), 0)
+
+    def key(self, keycode, down):
+        self.xtst.XTestFakeKeyEvent(self.display, keycode, int(down), 0)
+
+    def flush(self):
+        self.x11.XFlush(self.display)
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+# ===== 入力イベントのコード =====
+# linux/input-event-codes.h
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+ABS_X = 0x00
+ABS_Y = 0x01
+BTN_LEFT = 0x110
+BTN_RIGHT = 0x111
+BTN_MIDDLE = 0x112
+
+
+# ===== キー名 =====
+# キー名（pyautogui と同じ名前）-> (evdev のキーコード, X の keysym 名)
+KEYS = {}
+for _name, _code in zip("1234567890", range(2, 12)):
+    KEYS[_name] = (_code, _name)
+for _row, _start in (("qwertyuiop", 16), ("asdfghjkl", 30), ("zxcvbnm", 44)):
+    for _offset, _name in enumerate(_row):
+        KEYS[_name] = (_start + _offset, _name)
+for _offset in range(10):
+    KEYS[f"f{_offset + 1}"] = (59 + _offset, f"F{_offset + 1}")
+KEYS.update({
+    "f11": (87, "F11"), "f12": (88, "F12"),
+    "esc": (1, "Escape"), "escape": (1, "Escape"),
+    "-": (12, "minus"), "minus": (12, "minus"), "=": (13, "equal"), "equal": (13, "equal"),
+    "backspace": (14, "BackSpace"), "tab": (15, "Tab"),
+    "[": (26, "bracketleft"), "]": (27, "bracketright"),
+    "enter": (28, "Return"), "return": (28, "Return"),
+    "ctrl": (29, "Control_L"), "ctrlleft": (29, "Control_L"), "ctrlright": (97, "Control_R"),
+    ";": (39, "semicolon"), "'": (40, "apostrophe"), "`": (41, "grave"),
+    "shift": (42, "Shift_L"), "shiftleft": (42, "Shift_L"), "shiftright": (54, "Shift_R"),
+    "\\": (43, "backslash"), ",": (51, "comma"), ".": (52, "period"), "/": (53, "slash"),
+    "alt": (56, "Alt_L"), "altleft": (56, "Alt_L"), "altright": (100, "Alt_R"),
+    "space": (57, "space"), " ": (57, "space"), "capslock": (58, "Caps_Lock"),
+    "home": (102, "Home"), "up": (103, "Up"), "pageup": (104, "Prior"), "pgup": (104, "Prior"),
+    "left": (105, "Left"), "right": (106, "Right"), "end": (107, "End"), "down": (108, "Down"),
+    "pagedown": (109, "Next"), "pgdn": (109, "Next"), "insert": (110, "Insert"),
+    "delete": (111, "Delete"), "del": (111, "Delete"),
+    "win": (125, "Super_L"), "winleft": (125, "Super_L"),
+})
+
+
+def key_entry(name):
+    """キー名の (evdev のキーコード, X の keysym 名)（未対応のキーは ValueError）"""
+    entry = KEYS.get(name.lower())
+    if entry is None:
+        raise ValueError(f"未対応のキーです: {name}")
+    return entry
+
+
+# ===== uinput =====
+# linux/uinput.h の ioctl
+UI_DEV_CREATE = 0x5501
+UI_DEV_DESTROY = 0x5502
+UI_SET_EVBIT = 0x40045564
+UI_SET_KEYBIT = 0x40045565
+UI_SET_ABSBIT = 0x40045567
+
+UINPUT_PATHS = ("/dev/uinput", "/dev/input/uinput")
+ABS_CNT = 64
+BUS_VIRTUAL = 0x06
+
+# struct input_event（time は 0 のままでよい。カーネルが設定する）
+INPUT_EVENT = struct.Struct("llHHi")
+
+
+def pack_events(events):
+    """(type, code, value) の列を input_event の並びにまとめる（1回の write で送れる）"""
+    return b"".join(INPUT_EVENT.pack(0, 0, event_type, code, value) for event_type, code, value in events)
+
+
+SYN = (EV_SYN, SYN_REPORT, 0)
+_SYN_BYTES = INPUT_EVENT.pack(0, 0, *SYN)
+
+
+def pack_key_frames(events, events_per_frame=1):
+    """(キーコード, 押下なら1 / 解放なら0) の列を、SYN_REPORT で区切った1つのバッファにまとめる
+
+    1フレーム（SYN_REPORT の間）には events_per_frame 個までのイベントを入れる。
+    同じキーの押下と解放が同じフレームに入ると受け取る側でまとめられてしまうので、その場合はフレームを分ける。
+    """
+    events_per_frame = max(1, int(events_per_frame))
+    parts = []
+    frame = set()
+    for code, value in events:
+        if len(frame) >= events_per_frame or code in frame:
+            parts.append(_SYN_BYTES)
+            frame.clear()
+        parts.append(INPUT_EVENT.pack(0, 0, EV_KEY, code, value))
+        frame.add(code)
+    if frame:
+        parts.append(_SYN_BYTES)
+    return b"".join(parts)
+
+
+class UInputDevice:
+    """uinput の仮想入力デバイス（開けなければ OSError）
+
+    keys は送るキー / ボタンのコード、abs_size は絶対座標 (幅, 高さ)（マウス用、不要なら None）。
+    """
+
+    def __init__(self, keys, abs_size=None, name="KeyClicker virtual input"):
+        self.fd = None
+        if fcntl is None:
+            raise OSError("uinput は Linux でのみ使えます")
+        last_error = None
+        for path in UINPUT_PATHS:
+            try:
+                self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as e:
+                last_error = e
+        if self.fd is None:
+            raise OSError(f"uinput を開けません（/dev/uinput への書き込み権限が必要です）: {last_error}")
+        try:
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_SYN)
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_KEY)
+            for code in sorted(set(keys)):
+                fcntl.ioctl(self.fd, UI_SET_KEYBIT, code)
+            absmax = [0] * ABS_CNT
+            if abs_size is not None:
+                fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_ABS)
+                fcntl.ioctl(self.fd, UI_SET_ABSBIT, ABS_X)
+                fcntl.ioctl(self.fd, UI_SET_ABSBIT, ABS_Y)
+                absmax[ABS_X] = max(1, int(abs_size[0]) - 1)
+                absmax[ABS_Y] = max(1, int(abs_size[1]) - 1)
+            # struct uinput_user_dev（名前, input_id, ff_effects_max, absmax / absmin / absfuzz / absflat）
+            zeros = [0] * ABS_CNT
+            setup = struct.pack(f"80sHHHHi{ABS_CNT * 4}i", name.encode()[:79], BUS_VIRTUAL, 0x1, 0x1, 1, 0,
+                                *absmax, *zeros, *zeros, *zeros)
+            os.write(self.fd, setup)
+            fcntl.ioctl(self.fd, UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            self.fd = None
+            raise
+        # デバイスを作ってすぐの入力はデスクトップ側が認識する前に捨てられることがある
+        time.sleep(0.1)
+
+    def write(self, data):
+        """pack_events() でまとめた入力を1回で送る"""
+        os.write(self.fd, data)
+
+    def close(self):
+        if self.fd is not None:
+            try:
+                fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+            finally:
+                os.close(self.fd)
+                self.fd = None
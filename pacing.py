@@ -0,0 +1,165 @@
+"""
+ペース配分スケジューラ
+入力ループを一定間隔で刻むための共通部品。前回の処理時間から待ち時間を計算する代わりに
+開始時刻からの絶対的な締め切りで待つので、長時間動かしても間隔がずれていかない
+"""
+
+import math
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+# 締め切りの直前はスリープせずに待つ秒数（Windows のスリープは精度が粗いので長めにする）
+DEFAULT_SPIN = 0.016 if sys.platform == "win32" else 0.002
+
+# 処理が止まって締め切りを過ぎた場合の扱い
+# catch_up: 遅れた分を続けて実行して取り戻す（max_catch_up 回を超える遅れは捨てる）
+# skip: 遅れた分は実行せず、次の締め切りから再開する
+POLICIES = ("catch_up", "skip")
+
+# ジッタの統計に使う遅れの記録数（これより古いものは捨てて、メモリを一定に保つ）
+LATENESS_SAMPLES = 10000
+
+# snapshot() / summary() の結果（rate は回/秒、ジッタは締め切りからの遅れの秒数）
+PacingReport = namedtuple("PacingReport", ("ticks", "rate", "jitter_mean", "jitter_p99", "jitter_max", "skipped"))
+
+
+class PacingScheduler:
+    """絶対時刻の締め切りで一定間隔の処理を刻むスケジューラ
+
+    締め切りの spin 秒前まではスリープし（stop_signal があれば停止要求で中断）、
+    残りは時刻を見ながら待つ。interval が 0 なら待たずに CPU を譲るだけ。
+    """
+
+    def __init__(self, interval, stop_signal=None, spin=DEFAULT_SPIN, policy="skip", max_catch_up=10,
+                 clock=time.perf_counter):
+        if policy not in POLICIES:
+            raise ValueError(f"policy は {' / '.join(POLICIES)} で指定してください")
+        self.interval = max(0.0, float(interval))
+        self.stop_signal = stop_signal
+        self.spin = max(0.0, float(spin))
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """計測と締め切りを今の時刻から始める"""
+        now = self.clock()
+        with self._lock:
+            self._next = now
+            self._started = now
+            self._ticks = 0
+            self._skipped = 0
+            self._lateness = deque(maxlen=LATENESS_SAMPLES)  # 前回の snapshot() 以降の締め切りからの遅れ
+            self._recent = deque(maxlen=LATENESS_SAMPLES)  # summary() 用の直近の遅れ
+            self._window_start = now
+            self._window_ticks = 0
+            self._window_skipped = 0
+
+    def resync(self):
+        """次の締め切りを今の時刻に合わせ直す（意図的に休止した後の取り戻しを防ぐ。統計はそのまま）"""
+        self._next = self.clock()
+
+    def set_interval(self, interval):
+        """間隔を変更する（次の締め切りから反映）"""
+        self.interval = max(0.0, float(interval))
+
+    def _stopped(self):
+        return self.stop_signal is not None and self.stop_signal.stopped
+
+    def _sleep(self, seconds):
+        if self.stop_signal is not None:
+            return self.stop_signal.sleep(seconds)
+        time.sleep(seconds)
+        return False
+
+    def wait(self, interval=None):
+        """次の締め切りまで待つ。停止要求があれば False を返す
+
+        interval を渡すと、その次の締め切りまでの間隔をこの回だけ変える（間隔が一定でない再生用）。
+        """
+        deadline = self._next
+        if self.interval <= 0:
+            # 最高速: 締め切りは設けず他のスレッドに CPU を譲るだけ
+            time.sleep(0)
+            if self._stopped():
+                return False
+            self._record(0.0, 0)
+            return True
+
+        remaining = deadline - self.clock()
+        if remaining > self.spin and self._sleep(remaining - self.spin):
+            return False
+        while True:
+            now = self.clock()
+            if now >= deadline:
+                break
+            if self._stopped():
+                return False
+        if self._stopped():
+            return False
+
+        lateness = now - deadline
+        skipped = 0
+        step = self.interval if interval is None else max(0.0, interval)
+        next_deadline = deadline + step
+        if step > 0 and now >= next_deadline:
+            # 締め切りを1回以上飛ばすほど遅れた
+            missed = int((now - deadline) // step)
+            if self.policy == "skip" or missed > self.max_catch_up:
+                skipped = missed
+                next_deadline = deadline + (missed + 1) * step
+        self._next = next_deadline
+        self._record(lateness, skipped)
+        return True
+
+    def _record(self, lateness, skipped):
+        with self._lock:
+            self._ticks += 1
+            self._window_ticks += 1
+            self._skipped += skipped
+            self._window_skipped += skipped
+            self._lateness.append(lateness)
+            self._recent.append(lateness)
+
+    def snapshot(self):
+        """前回の snapshot() 以降の速度とジッタ（1秒ごとの表示更新用、別スレッドから呼べる）"""
+        now = self.clock()
+        with self._lock:
+            lateness = list(self._lateness)
+            self._lateness.clear()
+            elapsed = now - self._window_start
+            ticks, skipped = self._window_ticks, self._window_skipped
+            self._window_start = now
+            self._window_ticks = 0
+            self._window_skipped = 0
+        return _report(ticks, elapsed, lateness, skipped)
+
+    def summary(self):
+        """start() 以降の全体の速度（ジッタの平均・p99・最大はどれも直近 LATENESS_SAMPLES 回分）"""
+        now = self.clock()
+        with self._lock:
+            ticks, skipped, lateness = self._ticks, self._skipped, list(self._recent)
+            elapsed = now - self._started
+        return _report(ticks, elapsed, lateness, skipped)
+
+
+def _report(ticks, elapsed, lateness, skipped):
+    rate = ticks / elapsed if elapsed > 0 else 0.0
+    if not lateness:
+        return PacingReport(ticks, rate, 0.0, 0.0, 0.0, skipped)
+    ordered = sorted(lateness)
+    p99 = ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.99) - 1)]
+    return PacingReport(ticks, rate, sum(ordered) / len(ordered), p99, ordered[-1], skipped)
+
+
+def format_report(report):
+    """表示用の文字列（例: "200.0 回/秒 / ジッタ 平均 0.02 ms・p99 0.08 ms・最大 0.30 ms"）"""
+    text = (f"{report.rate:.1f} 回/秒 / ジッタ 平均 {report.jitter_mean * 1000:.2f} ms"
+            f"・p99 {report.jitter_p99 * 1000:.2f} ms・最大 {report.jitter_max * 1000:.2f} ms")
+    if report.skipped:
+        text += f" / 遅れで省略 {report.skipped}回"
+    return text
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各ツールのモジュールは同じフォルダのモジュールを直接 import するため、フォルダごとにパスを通す
+for path in (ROOT, os.path.join(ROOT, "TextMacro"), os.path.join(ROOT, "AutoClicker")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
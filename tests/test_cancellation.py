@@ -0,0 +1,43 @@
+import threading
+import time
+
+from cancellation import StopSignal
+
+
+def test_sleep_returns_immediately_after_request():
+    signal = StopSignal()
+    signal.request()
+    start = time.perf_counter()
+    assert signal.sleep(5)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_request_wakes_a_sleeping_worker():
+    signal = StopSignal()
+    woke = []
+    thread = threading.Thread(target=lambda: woke.append(signal.sleep(5)))
+    thread.start()
+    signal.request()
+    thread.join(2)
+    assert not thread.is_alive()
+    assert woke == [True]
+
+
+def test_stop_latency():
+    signal = StopSignal()
+    assert signal.stop_latency() is None
+    signal.input_sent()
+    signal.request()
+    # 停止要求の後に入力を送っていなければ 0
+    assert signal.stop_latency() == 0.0
+    signal.last_input_at = signal.requested_at + 0.004
+    assert abs(signal.stop_latency() - 0.004) < 1e-9
+
+
+def test_reset_clears_the_request():
+    signal = StopSignal()
+    signal.request()
+    signal.reset()
+    assert not signal.stopped
+    assert signal.stop_latency() is None
+    assert not signal.sleep(0)
@@ -0,0 +1,49 @@
+import numpy as np
+
+from change_map import TileChangeMap
+
+WIDTH, HEIGHT = 128, 64
+
+
+def frame():
+    return np.arange(HEIGHT * WIDTH * 3, dtype=np.uint32).astype(np.uint8).reshape(HEIGHT, WIDTH, 3)
+
+
+def test_first_frame_and_size_change_are_not_compared():
+    change_map = TileChangeMap(WIDTH, HEIGHT, [(0, 0, 10, 10)])
+    assert change_map.update(frame()) is None
+    assert change_map.update(frame()[:32]) is None
+    # サイズが違うフレームの後は次のフレームが基準になる
+    assert change_map.update(frame()) is None
+    assert not change_map.update(frame()).any()
+
+
+def test_only_rects_over_changed_tiles_are_reported():
+    rects = [(0, 0, 10, 10), (40, 0, 10, 10), (30, 20, 10, 10), (100, 40, 20, 20)]
+    change_map = TileChangeMap(WIDTH, HEIGHT, rects)
+    change_map.update(frame())
+    changed = frame()
+    changed[5, 45] += 1  # タイル (0, 1) だけ変える
+    tiles = change_map.update(changed)
+    assert tiles.sum() == 1
+    # (30, 20, 10, 10) は列 0〜1 にまたがるのでタイル (0, 1) に掛かる
+    assert change_map.changed_rects(tiles).tolist() == [False, True, True, False]
+
+
+def test_swapped_pixels_inside_a_tile_are_detected():
+    change_map = TileChangeMap(WIDTH, HEIGHT, [(0, 0, 32, 32)])
+    base = frame()
+    change_map.update(base)
+    swapped = base.copy()
+    swapped[[0, 1]] = swapped[[1, 0]]
+    assert change_map.changed_rects(change_map.update(swapped)).tolist() == [True]
+
+
+def test_partial_tiles_at_the_frame_edge():
+    width, height = 100, 50  # タイルで割り切れない
+    change_map = TileChangeMap(width, height, [(90, 40, 10, 10)])
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    change_map.update(base)
+    changed = base.copy()
+    changed[49, 99] = 255
+    assert change_map.changed_rects(change_map.update(changed)).tolist() == [True]
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+import focus_tracker
+from focus_tracker import FocusTracker
+
+
+@pytest.fixture
+def poll_only(monkeypatch):
+    """X11 を使えない環境として、問い合わせ方式で追跡させる"""
+
+    def no_x11():
+        raise OSError("no display")
+
+    monkeypatch.setattr(focus_tracker, "_X11ActiveWindow", no_x11)
+    monkeypatch.setattr(focus_tracker, "POLL_INTERVAL", 0.001)
+
+
+def wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def test_counts_window_changes(poll_only):
+    windows = ["editor"]
+    tracker = FocusTracker(lambda: windows[-1])
+    tracker.start()
+    try:
+        assert tracker.method == "poll"
+        assert tracker.state == (0, "editor")
+        windows.append("game")
+        assert wait_for(lambda: tracker.state == (1, "game"))
+        windows.append("editor")
+        assert wait_for(lambda: tracker.state == (2, "editor"))
+    finally:
+        tracker.stop()
+
+
+def test_poll_errors_are_treated_as_no_window(poll_only):
+    def broken():
+        raise RuntimeError("window closed")
+
+    tracker = FocusTracker(broken)
+    tracker.start()
+    tracker.stop()
+    assert tracker.state == (0, None)
+
+
+def test_stopping_one_tracker_leaves_another_running(poll_only):
+    windows = ["a"]
+    old = FocusTracker(lambda: windows[-1])
+    new = FocusTracker(lambda: windows[-1])
+    old.start()
+    new.start()
+    old.stop()
+    try:
+        windows.append("b")
+        assert wait_for(lambda: new.state == (1, "b"))
+        assert old.state == (0, "a")
+    finally:
+        new.stop()
+
+
+def test_start_without_any_method_raises(poll_only):
+    with pytest.raises(OSError):
+        FocusTracker().start()
+
+
+def test_no_active_window_is_not_a_change(poll_only):
+    windows = [None]
+    tracker = FocusTracker(lambda: windows[-1])
+    tracker.start()
+    try:
+        # 最初にウィンドウが見えた時は変化として数えない
+        windows.append("editor")
+        assert wait_for(lambda: tracker.state == (0, "editor"))
+        # ウィンドウがない状態を挟んでも、同じウィンドウに戻れば変化なし
+        windows.append(None)
+        assert wait_for(lambda: tracker.state == (0, None))
+        windows.append("editor")
+        assert wait_for(lambda: tracker.state == (0, "editor"))
+        # 別のウィンドウへは None を挟んでも1回
+        windows.append(None)
+        assert wait_for(lambda: tracker.state == (0, None))
+        windows.append("game")
+        assert wait_for(lambda: tracker.state == (1, "game"))
+    finally:
+        tracker.stop()
@@ -0,0 +1,95 @@
+import json
+import threading
+
+from json_store import DebouncedJsonWriter, atomic_write_json
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_atomic_write_json_replaces_file(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write_json(str(path), {"a": 1})
+    atomic_write_json(str(path), {"a": 2})
+    assert read(path) == {"a": 2}
+    assert [p.name for p in tmp_path.iterdir()] == ["data.json"]
+
+
+def test_snapshot_is_taken_once_on_the_ui_thread_at_the_deadline(tmp_path):
+    path = tmp_path / "regions.json"
+    data = {"regions": [1]}
+    calls, shared, queued = [], [], []
+    written = threading.Event()
+
+    def producer():
+        calls.append(threading.get_ident())
+        return data
+
+    writer = DebouncedJsonWriter(str(path), producer, delay=0.01, call_on_ui=queued.append,
+                                 on_snapshot=shared.append, on_written=lambda _: written.set())
+    for n in range(2, 6):
+        data["regions"].append(n)
+        writer.schedule()
+    # schedule() ではコピーせず、期限が来たら UI スレッドにコピーを依頼する
+    assert calls == []
+    for _ in range(500):
+        if queued:
+            break
+        threading.Event().wait(0.01)
+    assert len(queued) == 1 and calls == [] and writer.pending
+    queued.pop()()  # UI スレッドの after で実行された想定
+    assert written.wait(5)
+    writer.close()
+    assert calls == [threading.get_ident()]
+    assert read(path) == {"regions": [1, 2, 3, 4, 5]}
+    # 同じコピーを再コンパイルにも渡せる（編集中のデータとは別のオブジェクト）
+    assert shared == [{"regions": [1, 2, 3, 4, 5]}] and shared[0]["regions"] is not data["regions"]
+    assert not writer.pending
+
+
+def test_flush_writes_the_latest_edit(tmp_path):
+    path = tmp_path / "regions.json"
+    data = {"regions": [1, 2]}
+    writer = DebouncedJsonWriter(str(path), lambda: data, delay=60)
+    writer.flush()
+    assert not path.exists()
+    writer.schedule()
+    data["regions"].append(3)
+    writer.flush()
+    assert read(path) == {"regions": [1, 2, 3]}
+    writer.close()
+
+
+def test_consecutive_saves_are_coalesced(tmp_path):
+    path = tmp_path / "positions.json"
+    written = threading.Event()
+    writes = []
+
+    def on_written(written_path):
+        writes.append(read(written_path))
+        written.set()
+
+    data = {"n": 0}
+    writer = DebouncedJsonWriter(str(path), lambda: data, delay=0.05, on_written=on_written)
+    for n in range(1, 6):
+        data["n"] = n
+        writer.schedule()
+    assert written.wait(5)
+    writer.close()
+    assert writes == [{"n": 5}]
+    assert not writer.pending
+
+
+def test_stale_copy_does_not_overwrite_newer_save(tmp_path):
+    path = tmp_path / "data.json"
+    data = {"n": 1}
+    writer = DebouncedJsonWriter(str(path), lambda: data, delay=60)
+    writer.schedule()
+    data["n"] = 2
+    writer.schedule()
+    writer.flush()
+    writer._write(1, {"n": 1})
+    assert read(path) == {"n": 2}
+    writer.close()
@@ -0,0 +1,45 @@
+import pytest
+
+from key_program import compile_key_program, parse_key_program
+
+
+def test_parse_steps():
+    steps = parse_key_program("ctrl+c, a:0.1:0.3*5, ~0.5")
+    assert steps[0].keys == ("ctrl", "c")
+    assert (steps[1].keys, steps[1].hold, steps[1].gap, steps[1].repeat) == (("a",), 0.1, 0.3, 5)
+    assert (steps[2].keys, steps[2].delay) == ((), 0.5)
+
+
+@pytest.mark.parametrize("text", ["", "wait 1", "a*0", "a:-1", "a:1:2:3", "ctrl+"])
+def test_parse_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_key_program(text)
+
+
+def test_chord_releases_in_reverse_order():
+    program = compile_key_program(parse_key_program("ctrl+c:0.1"), 0.05)
+    assert program.events == (
+        (0.0, "ctrl", True), (0.0, "c", True), (0.1, "c", False), (0.1, "ctrl", False))
+    assert program.period == pytest.approx(0.15)
+
+
+def test_frames_group_simultaneous_events():
+    frames = compile_key_program(parse_key_program("a, b:0.1"), 0.05).frames()
+    delays = [delay for delay, _, _ in frames]
+    assert delays == pytest.approx([0.05, 0.1, 0.05])
+    assert frames[0][1] == (("a", True), ("a", False))
+    assert frames[1][2] == frozenset({"b"})
+    assert frames[2][2] == frozenset()
+
+
+def test_leading_wait_is_kept_on_every_cycle():
+    program = compile_key_program(parse_key_program("wait 0.5, a"), 0.05)
+    assert program.period == pytest.approx(0.55)
+    frames = program.frames()
+    assert len(frames) == 1
+    assert frames[0][0] == pytest.approx(0.55)
+
+
+def test_frame_delays_sum_to_period():
+    program = compile_key_program(parse_key_program("~0.2, a*3, ctrl+c:0.01, ~0.1"), 0.05)
+    assert sum(delay for delay, _, _ in program.frames()) == pytest.approx(program.period)
@@ -0,0 +1,197 @@
+import numpy as np
+import pytest
+
+from monitor_engine import MonitorEngine, TriggerState
+from region_model import TriggerPolicy, compile_region_set, compile_region_sets
+
+
+def make_set(*regions):
+    return compile_region_set("set", list(regions), backend=None)
+
+
+def region(name, x, target, **extra):
+    return dict(name=name, x=x, y=0, width=10, height=10, target_text=target, **extra)
+
+
+class FakeOCR:
+    """矩形の x 座標ごとに単語を返し、failing に含まれる x では例外を送出する"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.failing = set()
+
+    def __call__(self, image, language, profile):
+        raise AssertionError("recognize_words を使うこと")
+
+    def words(self, image, language, profile):
+        x = int(image[0, 0]) % 1000
+        if x in self.failing:
+            raise RuntimeError("tesseract crashed")
+        return [(self.texts[x], 0, 0, 10, 10, 95.0)]
+
+
+def make_engine(ocr, compiled, workers=1, clock=None):
+    fired, logs = [], []
+    frames = [0]
+
+    def capture(bbox):
+        # 各画素に x 座標を書き込み、切り出した画像からどの領域かわかるようにする（千の位はフレーム番号）
+        left, top, right, bottom = bbox
+        frames[0] += 1
+        return np.tile(np.arange(left, right, dtype=np.int32) + 1000 * frames[0], (bottom - top, 1))
+
+    engine = MonitorEngine(capture, ocr, lambda region: fired.append(region.name), logs.append,
+                           workers=workers, recognize_words=ocr.words, capture_gap=None,
+                           **({"clock": clock} if clock is not None else {}))
+    engine.load({"set": compiled}, "set")
+    return engine, fired, logs
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ocr_error_only_skips_its_region(workers):
+    ocr = FakeOCR({0: "start", 100: "go"})
+    ocr.failing.add(0)
+    engine, fired, logs = make_engine(ocr, make_set(region("A", 0, "start"), region("B", 100, "go")), workers)
+
+    engine.tick("eng", lambda: True)
+    engine.tick("eng", lambda: True)
+
+    assert fired == ["B", "B"]
+    assert engine.stats["ocr_errors"] == 2
+    assert len([line for line in logs if "OCRエラー" in line]) == 1
+
+    ocr.failing.clear()
+    engine.tick("eng", lambda: True)
+    assert fired[-2:] in (["A", "B"], ["B", "A"])
+
+
+def test_ocr_error_keeps_confirm_history_and_negative_cache():
+    ocr = FakeOCR({0: "start"})
+    compiled = make_set(region("A", 0, "start", confirm_frames=2, confirm_window=3))
+    engine, fired, _ = make_engine(ocr, compiled)
+    state = engine._states
+
+    engine.tick("eng", lambda: True)
+    assert fired == []
+    negatives = len(state[compiled.regions[0].key].negatives)
+
+    ocr.failing.add(0)
+    engine.tick("eng", lambda: True)
+    assert fired == []
+    assert engine._history[compiled.regions[0].ident] == 0b1
+    assert len(state[compiled.regions[0].key].negatives) == negatives
+
+    ocr.failing.clear()
+    engine.tick("eng", lambda: True)
+    assert fired == ["A"]
+
+
+def run_trigger(policy, levels, step=1.0):
+    state = TriggerState()
+    return [state.step(policy, matched, i * step) for i, matched in enumerate(levels)]
+
+
+def test_trigger_edges():
+    levels = [False, True, True, False, True]
+    assert run_trigger(TriggerPolicy("level", 0, None), levels) == [None, "fire", "fire", None, "fire"]
+    assert run_trigger(TriggerPolicy("rising", 0, None), levels) == [None, "fire", "suppress", None, "fire"]
+    assert run_trigger(TriggerPolicy("falling", 0, None), levels) == [None, "suppress", "suppress", "fire", "suppress"]
+
+
+def test_trigger_cooldown_and_rate_limit():
+    levels = [True, False] * 4
+    assert run_trigger(TriggerPolicy("rising", 3.0, None), levels) == \
+        ["fire", None, "cooldown", None, "fire", None, "cooldown", None]
+    assert run_trigger(TriggerPolicy("rising", 0, 2), levels) == \
+        ["fire", None, "fire", None, "rate_limited", None, "rate_limited", None]
+    # 最大頻度は RATE_WINDOW 秒ごとに数え直す
+    assert run_trigger(TriggerPolicy("level", 0, 1), [True, True], step=60.0) == ["fire", "fire"]
+
+
+def reload(engine, regions):
+    """regions.json を編集した時と同じく、前回の結果を渡して再コンパイルし差し替える"""
+    sets, errors = compile_region_sets({"set": regions}, None, previous=engine.sets)
+    assert not errors
+    engine.swap(sets)
+
+
+def test_reload_keeps_cooldown_of_unedited_regions():
+    now = [0.0]
+    ocr = FakeOCR({0: "go", 100: "idle"})
+    regions = [region("A", 0, "go", cooldown=600), region("B", 100, "stop")]
+    engine, fired, _ = make_engine(ocr, compile_region_sets({"set": regions}, None)[0]["set"],
+                                   clock=lambda: now[0])
+    engine.tick("eng", lambda: True)
+    assert fired == ["A"]
+
+    # B だけを編集しても A のクールダウンは続く
+    reload(engine, [regions[0], dict(regions[1], target_text="pause")])
+    now[0] = 10.0
+    engine.tick("eng", lambda: True)
+    assert engine.stats["swaps"] == 1
+    assert fired == ["A"]
+    assert engine.stats["cooldowns"] == 1
+
+    # A 自身を別の領域名に変えた場合は別の領域として扱う
+    reload(engine, [dict(regions[0], name="A2"), regions[1]])
+    engine.tick("eng", lambda: True)
+    assert fired == ["A", "A2"]
+
+
+def test_reload_keeps_confirm_history_of_unedited_regions():
+    ocr = FakeOCR({0: "go", 100: "idle"})
+    regions = [region("A", 0, "go", confirm_frames=2, confirm_window=2), region("B", 100, "stop")]
+    engine, fired, _ = make_engine(ocr, compile_region_sets({"set": regions}, None)[0]["set"])
+    engine.tick("eng", lambda: True)
+    assert fired == []
+
+    reload(engine, [regions[0], dict(regions[1], target_text="pause")])
+    engine.tick("eng", lambda: True)
+    assert fired == ["A"]
+
+
+def test_reload_keeps_previous_value_for_delta_conditions():
+    ocr = FakeOCR({0: "10", 100: "idle"})
+    regions = [region("A", 0, "", condition="delta <= -3"), region("B", 100, "stop")]
+    engine, fired, _ = make_engine(ocr, compile_region_sets({"set": regions}, None)[0]["set"])
+    engine.tick("eng", lambda: True)
+    assert fired == []
+
+    # 再読み込みをまたいだ 10 -> 6 の減少を検出する
+    reload(engine, [regions[0], dict(regions[1], target_text="pause")])
+    ocr.texts[0] = "6"
+    engine.tick("eng", lambda: True)
+    assert fired == ["A"]
+
+
+def test_changed_tiles_only_visit_the_regions_under_them():
+    ocr = FakeOCR({0: "a", 40: "b", 80: "c"})
+    calls = []
+    words = ocr.words
+
+    def counting_words(image, language, profile):
+        calls.append(int(image[0, 0]))
+        return words(image, language, profile)
+
+    screen = np.tile(np.arange(0, 90, dtype=np.uint8), (10, 1))
+    compiled = make_set(region("A", 0, "x"), region("B", 40, "x"), region("C", 80, "x"))
+    engine = MonitorEngine(lambda bbox: screen[bbox[1]:bbox[3], bbox[0]:bbox[2]].copy(), ocr,
+                           lambda region: None, lambda message: None, recognize_words=counting_words,
+                           tile_min_regions=1, capture_gap=64)
+    engine.load({"set": compiled}, "set")
+    keys = [r.key for r in compiled.regions]
+
+    engine.tick("eng", lambda: True)
+    capture, = engine.current_plan().captures
+    engine.tick("eng", lambda: True)
+    assert sorted(calls) == [0, 40, 80]
+    # 変化がなくなったティックでは、どの矩形も調べない
+    engine.tick("eng", lambda: True)
+    assert capture.visited == set()
+    skips = engine.stats["tile_skips"]
+
+    screen[5, 45] += 1  # B が掛かるタイルだけを変える
+    engine.tick("eng", lambda: True)
+    assert capture.visited == {keys[1]}
+    assert engine.stats["tile_skips"] == skips + 2
+    assert sorted(calls) == [0, 40, 40, 80]
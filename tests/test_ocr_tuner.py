@@ -0,0 +1,34 @@
+import numpy as np
+
+from ocr_tuner import Candidate, best_candidate, evaluate, read_sample, tune_region
+from region_model import DEFAULT_OCR_PROFILE
+
+SAMPLES = [(np.zeros((4, 4), dtype=np.uint8), "Level 12")]
+
+
+def test_read_sample_joins_words_like_the_engine():
+    words = [("Level", 0, 0, 5, 5, 90.0), ("12", 6, 0, 5, 5, 80.0)]
+    assert read_sample(words) == "Level 12"
+    assert read_sample(words, min_confidence=80) == "Level 12"
+    assert read_sample(words, min_confidence=85) is None
+
+
+def test_low_confidence_reads_are_not_counted_as_correct():
+    recognizers = {"tesseract": lambda image, language, profile: [("Level", 0, 0, 5, 5, 90.0),
+                                                                   ("12", 6, 0, 5, 5, 40.0)]}
+    candidate = Candidate("tesseract", DEFAULT_OCR_PROFILE)
+    assert evaluate(candidate, SAMPLES, recognizers, "eng")[1] == 1.0
+    assert evaluate(candidate, SAMPLES, recognizers, "eng", min_confidence=50)[1] == 0.0
+
+
+def test_tuner_picks_a_profile_that_reads_every_sample():
+    def recognize(image, language, profile):
+        if profile.psm == 7:
+            return [("Level", 0, 0, 5, 5, 95.0), ("12", 6, 0, 5, 5, 95.0)]
+        # 1単語として読むと空白が失われる
+        return [("Level12", 0, 0, 10, 5, 95.0)]
+
+    results = tune_region(SAMPLES, {"tesseract": recognize}, "eng", log=lambda message: None)
+    candidate, _ = best_candidate(results, "tesseract")
+    assert candidate.profile.psm == 7
+    assert all(accuracy == 0.0 for c, _, accuracy in results if c.profile.psm != 7)
@@ -0,0 +1,109 @@
+import pytest
+
+from pacing import PacingScheduler, format_report
+
+
+class FakeClock:
+    """時刻を手で進める時計と、その時計で眠る停止シグナル"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.stopped = False
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        return self.stopped
+
+
+def make_scheduler(interval, **kwargs):
+    clock = FakeClock()
+    return PacingScheduler(interval, clock, spin=0, clock=clock, **kwargs), clock
+
+
+def test_deadlines_do_not_drift_with_work_time():
+    scheduler, clock = make_scheduler(0.01)
+    times = []
+    for _ in range(5):
+        assert scheduler.wait()
+        times.append(clock.now)
+        clock.now += 0.003  # 入力の送信にかかる時間
+    assert times == pytest.approx([100.0, 100.01, 100.02, 100.03, 100.04])
+    assert scheduler.summary().jitter_max == pytest.approx(0.0)
+
+
+def test_skip_policy_drops_missed_deadlines():
+    scheduler, clock = make_scheduler(0.01, policy="skip")
+    scheduler.wait()
+    clock.now += 0.035
+    # 100.01 の締め切りに 25 ms 遅れ、100.02 / 100.03 は実行しない
+    scheduler.wait()
+    assert scheduler.summary().skipped == 2
+    assert scheduler.summary().jitter_max == pytest.approx(0.025)
+    scheduler.wait()
+    assert clock.now == pytest.approx(100.04)
+
+
+def test_catch_up_policy_runs_missed_deadlines_back_to_back():
+    scheduler, clock = make_scheduler(0.01, policy="catch_up")
+    scheduler.wait()
+    clock.now += 0.035
+    start = clock.now
+    # 100.01 / 100.02 / 100.03 の締め切りは待たずに続けて実行する
+    for _ in range(3):
+        scheduler.wait()
+    assert clock.now == start
+    assert scheduler.summary().skipped == 0
+    scheduler.wait()
+    assert clock.now == pytest.approx(100.04)
+
+
+def test_catch_up_is_limited_to_max_catch_up():
+    scheduler, clock = make_scheduler(0.01, policy="catch_up", max_catch_up=2)
+    scheduler.wait()
+    clock.now += 0.055
+    scheduler.wait()
+    assert scheduler.summary().skipped == 4
+
+
+def test_resync_does_not_catch_up_a_pause():
+    scheduler, clock = make_scheduler(0.01)
+    scheduler.wait()
+    clock.now += 1.0
+    scheduler.resync()
+    scheduler.wait()
+    assert scheduler.summary().skipped == 0
+    assert scheduler.summary().jitter_max == pytest.approx(0.0)
+
+
+def test_per_call_interval_overrides_the_next_step():
+    scheduler, clock = make_scheduler(0.01)
+    scheduler.wait(0.5)
+    scheduler.wait()
+    assert clock.now == pytest.approx(100.5)
+
+
+def test_stop_request_interrupts_the_wait():
+    scheduler, clock = make_scheduler(0.01)
+    scheduler.wait()
+    clock.stopped = True
+    assert not scheduler.wait()
+
+
+def test_snapshot_reports_the_rate_since_the_previous_snapshot():
+    scheduler, clock = make_scheduler(0.01)
+    for _ in range(100):
+        scheduler.wait()
+    clock.now += 0.01
+    report = scheduler.snapshot()
+    assert report.ticks == 100
+    assert report.rate == pytest.approx(100.0)
+    assert scheduler.snapshot().ticks == 0
+    assert "100.0 回/秒" in format_report(report)
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(ValueError):
+        PacingScheduler(0.01, policy="burst")
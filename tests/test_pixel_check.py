@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from pixel_check import PixelBatch, compile_pixel_check, rgb_to_hsv
+from region_model import Rect, RegionConfigError
+
+RECT = Rect(0, 0, 4, 2)
+
+
+def test_rgb_to_hsv():
+    hsv = rgb_to_hsv(np.array([[255, 0, 0], [0, 255, 0], [0, 0, 0]], dtype=np.uint8))
+    assert np.allclose(hsv, [[0, 100, 100], [120, 100, 100], [0, 0, 0]])
+
+
+def test_batch_evaluates_every_check_over_one_frame():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    frame[0:2, 0:4] = (250, 5, 5)
+    frame[5, 6] = (255, 255, 255)
+    red = compile_pixel_check({"color": [255, 0, 0]}, RECT)
+    pattern = compile_pixel_check({"points": [[0, 0], [1, 0, [255, 255, 255]]], "color": [0, 0, 0]}, RECT)
+    hsv = compile_pixel_check({"space": "hsv", "color": [0, 100, 100], "tolerance": [10, 20, 20]}, RECT)
+    batch = PixelBatch([(red, 0, 0), (pattern, 5, 5), (hsv, 0, 0)])
+    assert batch.count == len(red) + len(pattern) + len(hsv)
+    assert batch.evaluate(frame).tolist() == pytest.approx([1.0, 1.0, 1.0])
+
+    frame[0, 0] = (0, 0, 255)
+    assert batch.evaluate(frame).tolist() == pytest.approx([7 / 8, 1.0, 7 / 8])
+
+
+def test_hue_range_wraps_around_360():
+    check = compile_pixel_check({"space": "hsv", "color": [355, 100, 100], "tolerance": [10, 10, 10]}, Rect(0, 0, 2, 1))
+    frame = np.array([[[255, 0, 10], [255, 20, 0]]], dtype=np.uint8)
+    assert PixelBatch([(check, 0, 0)]).evaluate(frame).tolist() == [1.0]
+
+
+def test_frame_too_small_is_not_evaluated():
+    check = compile_pixel_check({"color": [0, 0, 0]}, RECT)
+    assert PixelBatch([(check, 8, 8)]).evaluate(np.zeros((5, 5, 3), dtype=np.uint8)) is None
+
+
+@pytest.mark.parametrize("data", [
+    {"color": [256, 0, 0]},
+    {"points": [[4, 0]], "color": [0, 0, 0]},
+    {"points": [[0, 0]]},
+    {"min": [10, 0, 0], "max": [0, 0, 0]},
+    {"color": [0, 0, 0], "ratio": 0},
+])
+def test_invalid_pixel_settings(data):
+    with pytest.raises(RegionConfigError):
+        compile_pixel_check(data, RECT)
@@ -0,0 +1,82 @@
+import pytest
+
+from region_model import RegionConfigError, compile_action, compile_condition, normalize_text, parse_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("112", 112.0),
+    ("hp 1,234 / 2,000", 1234.0),
+    ("1,234.5", 1234.5),
+    ("-7", -7.0),
+    ("lv.12", 12.0),
+    ("3.25 sec", 3.25),
+    ("no digits", None),
+    ("", None),
+])
+def test_parse_number(text, expected):
+    assert parse_number(normalize_text(text)) == expected
+
+
+@pytest.mark.parametrize("condition, value, expected", [
+    ("<= 12", 112, False),
+    ("<= 12", 12, True),
+    ("≦ 12", 11, True),
+    ("> 5", 5, False),
+    ("!= 0", 1, True),
+    ("= 3", 3, True),
+    ("5..12", 12, True),
+    ("5..12", 4.5, False),
+    ("-10..-5", -7, True),
+    ({"op": ">=", "value": 100}, 100, True),
+    ({"op": "between", "min": 1, "max": 2}, 3, False),
+])
+def test_conditions(condition, value, expected):
+    assert compile_condition(condition).test(value, None) is expected
+
+
+@pytest.mark.parametrize("condition", ["delta <= -3", "Δ <= -3", "Δ<=-3", {"op": "<=", "value": -3, "delta": True}])
+def test_delta_conditions_compare_the_change(condition):
+    compiled = compile_condition(condition)
+    assert compiled.delta
+    assert not compiled.test(5, None)  # 前回値がなければ判定しない
+    assert compiled.test(5, 8)
+    assert not compiled.test(6, 8)
+
+
+@pytest.mark.parametrize("condition", [None, "", {}])
+def test_empty_condition(condition):
+    assert compile_condition(condition) is None
+
+
+@pytest.mark.parametrize("condition", ["12", "<<= 3", "delta", "12..5", {"op": "~", "value": 1},
+                                       {"op": "<="}, ["<=", 3]])
+def test_invalid_conditions(condition):
+    with pytest.raises(RegionConfigError):
+        compile_condition(condition)
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.sent = []
+
+    def typewrite(self, text):
+        self.sent.append(text)
+
+    def click(self, x, y, button="left"):
+        self.sent.append((x, y, button))
+
+
+def test_type_action_sends_one_character_per_step():
+    backend = RecordingBackend()
+    action = compile_action({"type": "type", "text": "ok!"}, backend)
+    assert len(action.steps) == 3
+    # 呼び出し側が文字の間で止めた場合は残りを送らない
+    action.steps[0]()
+    assert backend.sent == ["o"]
+    action.run()
+    assert backend.sent == ["o", "o", "k", "!"]
+    # 他のアクションは1ステップ
+    click = compile_action({"type": "click", "x": 1, "y": 2}, backend)
+    assert len(click.steps) == 1
+    click.run()
+    assert backend.sent[-1] == (1, 2, "left")
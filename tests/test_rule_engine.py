@@ -0,0 +1,153 @@
+import numpy as np
+
+from monitor_engine import MonitorEngine
+from region_model import compile_region_sets
+
+
+class Screen:
+    """100px ごとの区画に文字か色を表示する偽の画面（区画の内容を変えると画像も変わる）"""
+
+    def __init__(self):
+        self.texts = {}
+        self.colors = {}
+        self.versions = {}
+        self.reads = []
+
+    def show(self, x, text):
+        self.texts[x] = text
+        self.versions[x] = self.versions.get(x, 0) + 1
+
+    def paint(self, x, color):
+        self.colors[x] = color
+
+    def capture(self, bbox):
+        left, top, right, bottom = bbox
+        columns = np.arange(left, right)
+        blocks = columns - columns % 100
+        values = columns + 1000 * np.array([self.versions.get(int(b), 0) for b in blocks])
+        frame = np.repeat(np.tile(values, (bottom - top, 1))[:, :, None], 3, axis=2).astype(np.int32)
+        for x, color in self.colors.items():
+            frame[:, (blocks == x)] = color
+        return frame
+
+    def words(self, image, language, profile):
+        x = int(image[0, 0, 0]) % 1000
+        self.reads.append(x)
+        return [(self.texts.get(x, ""), 0, 0, 10, 10, 95.0)]
+
+
+def region(name, x, **extra):
+    return {"name": name, "x": x, "y": 0, "width": 10, "height": 10, "target_text": "", **extra}
+
+
+def make_engine(screen, regions, rules, clock=None):
+    fired = []
+    sets, errors = compile_region_sets({"set": regions}, None, rules={"set": rules})
+    assert not errors
+    engine = MonitorEngine(screen.capture, None, lambda owner: fired.append(owner.name), lambda message: None,
+                           recognize_words=screen.words, capture_gap=None,
+                           **({"clock": clock} if clock is not None else {}))
+    engine.load(sets, "set")
+    return engine, fired
+
+
+def tick(engine):
+    engine.tick("eng", lambda: True)
+
+
+def test_identical_predicates_share_one_node_and_one_read():
+    screen = Screen()
+    screen.show(0, "go now")
+    when = {"region": "A", "contains": "go"}
+    engine, fired = make_engine(screen, [region("A", 0)], [
+        {"name": "r1", "when": when},
+        {"name": "r2", "when": {"all": [when, {"not": {"region": "A", "equals": "stop"}}]}},
+    ])
+    rules = engine.sets["set"].rules
+    assert any(child is rules[0].root for child in rules[1].root.children)
+    tick(engine)
+    assert fired == ["r1", "r2"]
+    assert screen.reads == [0]
+
+
+def test_cheap_changed_predicate_skips_ocr():
+    screen = Screen()
+    screen.show(0, "hp")
+    screen.show(100, "go")
+    engine, fired = make_engine(screen, [region("A", 0), region("B", 100)], [
+        {"name": "r", "when": {"all": [{"region": "B", "contains": "go"}, {"region": "A", "changed": True}]}},
+    ])
+    tick(engine)  # 最初のティックは A が変化したとみなす
+    assert fired == ["r"]
+    assert screen.reads == [100]
+    skips = engine.stats["lazy_skips"]
+
+    screen.show(100, "go!")  # B は変わったが A は変わっていない
+    tick(engine)
+    assert fired == ["r"]
+    assert screen.reads == [100]
+    # A（changed だけで参照）と B の遅延した OCR はどちらも行わなかった
+    assert engine.stats["lazy_skips"] == skips + 2
+
+    screen.show(0, "hp2")
+    tick(engine)
+    assert fired == ["r", "r"]
+    assert screen.reads == [100, 100]
+
+
+def test_cheap_pixel_predicate_skips_ocr():
+    screen = Screen()
+    screen.show(100, "go")
+    screen.paint(200, (0, 0, 255))
+    engine, fired = make_engine(screen, [region("B", 100), region("P", 200, pixels={"color": [255, 0, 0]})], [
+        {"name": "r", "when": {"all": [{"region": "B", "contains": "go"}, {"region": "P", "pixels": True}]}},
+    ])
+    tick(engine)
+    assert fired == []
+    assert screen.reads == []
+    assert engine.stats["lazy_ocr"] == 0
+
+    screen.paint(200, (255, 0, 0))
+    tick(engine)
+    assert fired == ["r"]
+    assert screen.reads == [100]
+    assert engine.stats["lazy_ocr"] == 1
+
+
+def test_shared_delta_condition_sees_the_same_previous_value():
+    screen = Screen()
+    screen.show(0, "10")
+    when = {"region": "A", "condition": "delta <= -3"}
+    engine, fired = make_engine(screen, [region("A", 0)], [
+        {"name": "r1", "when": when},
+        {"name": "r2", "when": {"any": [when, {"region": "A", "equals": "0"}]}},
+    ])
+    tick(engine)
+    assert fired == []
+    screen.show(0, "6")
+    tick(engine)
+    assert fired == ["r1", "r2"]
+    # 同じ値が続けば変化量は 0
+    screen.show(0, "6 ")
+    tick(engine)
+    assert fired == ["r1", "r2"]
+
+
+def test_rule_cooldown_survives_an_unrelated_edit():
+    now = [0.0]
+    screen = Screen()
+    screen.show(0, "go")
+    regions = [region("A", 0), region("B", 100, target_text="stop")]
+    rules = [{"name": "r", "when": {"region": "A", "contains": "go"}, "cooldown": 600}]
+    engine, fired = make_engine(screen, regions, rules, clock=lambda: now[0])
+    tick(engine)
+    assert fired == ["r"]
+
+    sets, _ = compile_region_sets({"set": [regions[0], dict(regions[1], target_text="pause")]}, None,
+                                  previous=engine.sets, rules={"set": rules})
+    assert sets["set"].rules[0] is not engine.sets["set"].rules[0]
+    engine.swap(sets)
+    now[0] = 10.0
+    tick(engine)
+    assert fired == ["r"]
+    assert engine.stats["cooldowns"] == 1
@@ -0,0 +1,51 @@
+from spatial_index import GridIndex, bounding_box, cluster_rects, rects_overlap
+
+
+def test_rects_overlap_with_gap():
+    assert rects_overlap((0, 0, 10, 10), (5, 5, 10, 10))
+    # 辺が接しているだけの矩形は重ならない
+    assert not rects_overlap((0, 0, 10, 10), (10, 0, 10, 10))
+    assert rects_overlap((0, 0, 10, 10), (15, 0, 10, 10), gap=6)
+    assert not rects_overlap((0, 0, 10, 10), (15, 0, 10, 10), gap=5)
+
+
+def test_query_returns_items_in_insertion_order_once():
+    index = GridIndex(cell=16)
+    index.insert((0, 0, 100, 10), "wide")  # 複数のセルに登録される
+    index.insert((40, 0, 10, 10), "middle")
+    index.insert((200, 200, 10, 10), "far")
+    index.insert((-30, -30, 10, 10))
+
+    assert len(index) == 4
+    assert index.query((30, 0, 40, 5)) == ["wide", "middle"]
+    assert index.query((150, 150, 10, 10)) == []
+    assert index.query((150, 150, 10, 10), gap=45) == ["far"]
+    # item を省略した矩形は矩形自体が返る（負の座標も扱える）
+    assert index.query((-25, -25, 1, 1)) == [(-30, -30, 10, 10)]
+
+
+def test_overlapping_pairs():
+    index = GridIndex(cell=16)
+    for name, rect in [("a", (0, 0, 20, 20)), ("b", (10, 10, 20, 20)), ("c", (100, 0, 5, 5)), ("d", (25, 25, 5, 5))]:
+        index.insert(rect, name)
+    assert index.overlapping_pairs() == [("a", "b"), ("b", "d")]
+
+
+def test_cluster_rects_groups_nearby_rects():
+    rects = [(0, 0, 10, 10), (500, 0, 10, 10), (30, 0, 10, 10), (1000, 1000, 5, 5)]
+    clusters = cluster_rects(rects, gap=64)
+    assert clusters == [
+        ((0, 0, 40, 10), [(0, 0, 10, 10), (30, 0, 10, 10)]),
+        ((500, 0, 10, 10), [(500, 0, 10, 10)]),
+        ((1000, 1000, 5, 5), [(1000, 1000, 5, 5)]),
+    ]
+    assert cluster_rects(rects, gap=0) == [(rect, [rect]) for rect in rects]
+
+
+def test_cluster_rects_merges_again_with_the_bounding_box():
+    # 3つ目はどちらの矩形とも近接していないが、最初の2つをまとめた外接矩形とは近接する
+    rects = [(0, 0, 10, 10), (12, 12, 10, 10), (24, 0, 5, 5), (200, 0, 10, 10)]
+    assert cluster_rects(rects[:3:2], gap=5) == [(rect, [rect]) for rect in rects[:3:2]]
+    clusters = cluster_rects(rects, gap=5)
+    assert clusters == [((0, 0, 29, 22), rects[:3]), ((200, 0, 10, 10), [(200, 0, 10, 10)])]
+    assert bounding_box(rects) == (0, 0, 210, 22)